@@ -4,12 +4,20 @@ from flask import Flask
 from flask_cors import CORS
 
 from auth import init_jwt
+from cache import init_cache
+from catalog import get_catalog, init_catalog
 from config import Config
-from models import db, FartType
-from routes import register_blueprints
-
+from metrics import init_metrics
+from migrations import migrate
+from slow_queries import init_slow_query_log
 
-PRESET_FART_TYPES = ["响屁", "闷屁", "连环屁", "无声屁", "喷射屁"]
+from models import db
+from rollups import init_rollups
+from search import init_search
+from routes import register_blueprints
+from sqlite_profile import configure_engine_options, init_sqlite
+from startup import import_deferred
+from timezones import init_timezones, resume_rebucketing
 
 
 def _ensure_sqlite_dir(app: Flask) -> None:
@@ -26,39 +34,33 @@ def _ensure_sqlite_dir(app: Flask) -> None:
         os.makedirs(directory, exist_ok=True)
 
 
-def _seed_preset_fart_types() -> None:
-    existing = {
-        ft.name
-        for ft in FartType.query.filter(FartType.name.in_(PRESET_FART_TYPES)).all()
-    }
-    to_add = []
-    for name in PRESET_FART_TYPES:
-        if name in existing:
-            continue
-        ft = FartType()
-        ft.name = name
-        ft.is_preset = True
-        to_add.append(ft)
-    if not to_add:
-        return
-    db.session.add_all(to_add)
-    db.session.commit()
-
-
 def create_app(config_object=None):
     app = Flask(__name__)
     app.config.from_object(config_object or Config)
 
     init_jwt(app)
+    init_cache(app)
+    init_catalog(app)
 
     _ensure_sqlite_dir(app)
 
     CORS(app, resources={r"/api/*": {"origins": "*"}})
+    configure_engine_options(app)
     db.init_app(app)
+    init_sqlite(app)
+    init_metrics(app)
+    init_slow_query_log(app)
     register_blueprints(app)
+    init_rollups(app)
+    init_search(app)
+    init_timezones(app)
 
     with app.app_context():
-        db.create_all()
-        _seed_preset_fart_types()
+        migrate(db.engine)
+        get_catalog().load()
+        resume_rebucketing()
+
+    if not app.config.get("LAZY_IMPORTS", True):
+        import_deferred()
 
     return app
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from functools import wraps
 from typing import Any, Callable, TypeVar, cast
 
 import bcrypt
-from flask import jsonify
+from flask import current_app, jsonify, request
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
@@ -12,48 +16,214 @@ from flask_jwt_extended import (
     jwt_required,
 )
 
-from models import User
+from models import User, db
 
 
 T = TypeVar("T", bound=Callable[..., Any])
 
+_USER_ID_KEY = "fart_steward.user_id"
+_USER_KEY = "fart_steward.user"
 
-def error_response(message: str, code: str, status_code: int):
-    return jsonify({"error": message, "code": code}), status_code
 
+class LiveUserCache:
+    """Thread-safe map of user ids recently confirmed to exist, with a TTL.
 
-def hash_password(password: str) -> str:
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
-    return hashed.decode("utf-8")
+    Lets ``current_user_id`` trust a valid token without reading ``users``
+    on every request, and keeps each user's ``timezone`` alongside for the
+    write and analytics paths. A deleted user or changed zone is picked up
+    at most ``ttl`` seconds later by other workers, immediately by the worker
+    that calls ``forget_user``.
+    """
 
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: dict[int, tuple[float, str]] = {}
+        self._lock = threading.Lock()
 
-def verify_password(password: str, password_hash: str) -> bool:
+    def timezone(self, user_id: int) -> str | None:
+        """The cached zone name, or ``None`` if the user is not cached."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[1]
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.timezone(user_id) is not None
+
+    def add(self, user_id: int, timezone: str) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, timezone)
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class PasswordHasherBusy(Exception):
+    """The password hashing pool is saturated; the client should retry later."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated pool with admission control.
+
+    At most ``workers`` hashes run at once and ``queue_size`` more may wait.
+    A request beyond that, or one whose hash does not finish within
+    ``timeout`` seconds, raises ``PasswordHasherBusy`` straight away, so a
+    login burst cannot tie up every request thread and starve cheap calls.
+    """
+
+    def __init__(self, rounds: int, workers: int, queue_size: int, timeout: float):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot stays taken until bcrypt finishes, even after a timeout.
+        future.add_done_callback(lambda _future: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy() from None
+
+    def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(self.rounds)
+        hashed = self._run(bcrypt.hashpw, password.encode("utf-8"), salt)
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self._run(_checkpw, password, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when the hash was made with a cost other than ``rounds``."""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+
+def _checkpw(password: str, password_hash: str) -> bool:
     try:
         return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
     except ValueError:
         return False
 
 
+def error_response(message: str, code: str, status_code: int):
+    return jsonify({"error": message, "code": code}), status_code
+
+
+def _password_hasher() -> PasswordHasher:
+    return current_app.extensions["password_hasher"]
+
+
+def hash_password(password: str) -> str:
+    return _password_hasher().hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return _password_hasher().verify(password, password_hash)
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    return _password_hasher().needs_rehash(password_hash)
+
+
 def create_token_for_user(user: User) -> str:
     return cast(str, create_access_token(identity=str(user.id)))
 
 
-def get_current_user() -> User | None:
-    user_id = get_jwt_identity()
-    if not user_id:
+def _identity_user_id() -> int | None:
+    identity = get_jwt_identity()
+    if not identity:
         return None
     try:
-        user_id_int = int(user_id)
+        return int(identity)
     except (TypeError, ValueError):
         return None
-    return User.query.get(user_id_int)
+
+
+def _live_users() -> LiveUserCache | None:
+    return current_app.extensions.get("live_users")
+
+
+def forget_user(user_id: int) -> None:
+    """Drop a user from this worker's live-user cache, e.g. after deletion or
+    a time zone change."""
+    live_users = _live_users()
+    if live_users is not None:
+        live_users.discard(user_id)
+
+
+def current_user_id() -> int | None:
+    """The authenticated user's id, resolved at most once per request.
+
+    Only reads ``users`` when the id is not in the live-user cache.
+    """
+    environ = request.environ
+    if _USER_ID_KEY not in environ:
+        user_id = _identity_user_id()
+        live_users = _live_users()
+        if user_id is not None and live_users is not None and user_id in live_users:
+            environ[_USER_ID_KEY] = user_id
+        else:
+            get_current_user()
+    return environ[_USER_ID_KEY]
+
+
+def get_current_user() -> User | None:
+    """The authenticated ``User``, loaded at most once per request."""
+    environ = request.environ
+    if _USER_KEY not in environ:
+        user_id = environ.get(_USER_ID_KEY, _identity_user_id())
+        user = db.session.get(User, user_id) if user_id is not None else None
+        if user is None:
+            if user_id is not None:
+                forget_user(user_id)
+            environ[_USER_ID_KEY] = None
+        else:
+            assert user_id is not None
+            live_users = _live_users()
+            if live_users is not None:
+                live_users.add(user_id, user.timezone)
+            environ[_USER_ID_KEY] = user_id
+        environ[_USER_KEY] = user
+    return environ[_USER_KEY]
+
+
+def user_timezone(user_id: int) -> str | None:
+    """The user's zone name; only reads ``users`` when not in the live-user cache."""
+    live_users = _live_users()
+    name = live_users.timezone(user_id) if live_users is not None else None
+    if name is None:
+        name = db.session.query(User.timezone).filter(User.id == user_id).scalar()
+        if name is not None and live_users is not None:
+            live_users.add(user_id, name)
+    return name
 
 
 def auth_required(fn: T) -> T:
     @wraps(fn)
     @jwt_required()
     def wrapper(*args: Any, **kwargs: Any):
-        if get_current_user() is None:
+        if current_user_id() is None:
             return error_response("Unauthorized", "UNAUTHORIZED", 401)
         return fn(*args, **kwargs)
 
@@ -62,17 +232,20 @@ def auth_required(fn: T) -> T:
 
 def init_jwt(app) -> JWTManager:
     jwt = JWTManager(app)
+    ttl = float(app.config.get("AUTH_USER_CACHE_TTL", 60))
+    app.extensions["live_users"] = LiveUserCache(ttl) if ttl > 0 else None
+    workers = int(app.config.get("PASSWORD_HASH_WORKERS", 1))
+    app.extensions["password_hasher"] = PasswordHasher(
+        rounds=int(app.config.get("BCRYPT_ROUNDS", 12)),
+        workers=workers,
+        queue_size=int(app.config.get("PASSWORD_HASH_QUEUE_SIZE", workers)),
+        timeout=float(app.config.get("PASSWORD_HASH_TIMEOUT", 10)),
+    )
 
-    @jwt.user_lookup_loader
-    def _user_lookup_callback(_jwt_header, jwt_data):
-        identity = jwt_data.get("sub")
-        if identity is None:
-            return None
-        try:
-            identity_int = int(identity)
-        except (TypeError, ValueError):
-            return None
-        return User.query.get(identity_int)
+    @app.errorhandler(PasswordHasherBusy)
+    def _hasher_busy(_error: PasswordHasherBusy):
+        body, status = error_response("Server busy, retry later", "SERVER_BUSY", 503)
+        return body, status, {"Retry-After": "1"}
 
     @jwt.unauthorized_loader
     def _unauthorized(_reason: str):
@@ -99,7 +272,7 @@ def init_jwt(app) -> JWTManager:
         return False
 
     _ = (
-        _user_lookup_callback,
+        _hasher_busy,
         _unauthorized,
         _invalid_token,
         _expired_token,
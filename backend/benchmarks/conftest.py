@@ -0,0 +1,192 @@
+"""Fixtures for the pytest-benchmark suite.
+
+The suite is excluded from the default test run; select it with the
+``benchmark`` marker:
+
+    cd backend
+    python -m pytest -m benchmark
+    BENCHMARK_RECORDS=1000000 python -m pytest -m benchmark
+
+Every benchmark runs against one user owning ``BENCHMARK_RECORDS``
+synthetic records (see ``synthetic.py``). The loaded database is cached
+under ``.pytest_cache`` and copied for each session, so only the first
+run of a day (or after a schema change) pays for loading it.
+
+Results are compared with the baseline stored in ``baselines/`` for the
+same dataset size, and the run fails when a benchmark's median regresses by
+more than ``BENCHMARK_MAX_REGRESSION``. Baselines are keyed only by platform
+and interpreter, which cannot tell a laptop from a CI runner, so on a
+machine much slower than the one that recorded them either set
+``BENCHMARK_COMPARE=0`` or record a local baseline with
+``--benchmark-save=baseline-100k`` (the size suffix must match). Passing
+``--benchmark-compare`` or ``--benchmark-compare-fail`` overrides either.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app import create_app
+from benchmarks.synthetic import load_records
+from config import TestingConfig
+from migrations import LATEST_VERSION
+from models import FartType, User, db
+
+
+RECORDS = int(os.environ.get("BENCHMARK_RECORDS", "100000"))
+COMPARE = os.environ.get("BENCHMARK_COMPARE", "1") != "0"
+MAX_REGRESSION = os.environ.get("BENCHMARK_MAX_REGRESSION", "median:35%")
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+
+USERNAME = "bench"
+PASSWORD = "Test123!"
+
+
+def _size_label(count: int) -> str:
+    if count % 1_000_000 == 0:
+        return f"{count // 1_000_000}m"
+    if count % 1000 == 0:
+        return f"{count // 1000}k"
+    return str(count)
+
+
+def _benchmarks_selected(config) -> bool:
+    markexpr = config.getoption("markexpr") or ""
+    return "benchmark" in markexpr and "not benchmark" not in markexpr
+
+
+def pytest_configure(config):
+    # Runs before pytest-benchmark reads its options (conftests are
+    # registered later, so their hooks are called first).
+    if not _benchmarks_selected(config):
+        return
+    if config.getoption("benchmark_storage") == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{BASELINES_DIR}"
+    if not COMPARE or (
+        config.getoption("benchmark_compare")
+        or config.getoption("benchmark_compare_fail")
+    ):
+        return
+    baseline = f"*_baseline-{_size_label(RECORDS)}"
+    if any((BASELINES_DIR / get_machine_id()).glob(f"{baseline}.json")):
+        config.option.benchmark_compare = baseline
+        config.option.benchmark_compare_fail = [parse_compare_fail(MAX_REGRESSION)]
+
+
+def _bench_config(db_path: Path):
+    return type(
+        "BenchConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            # Every analytics request should reach the database.
+            "ANALYTICS_CACHE_BACKEND": "none",
+        },
+    )
+
+
+def _dispose(app) -> None:
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _schema_fingerprint() -> str:
+    dialect = sqlite.dialect()
+    # Migrations also create what the metadata does not describe (FTS, triggers).
+    ddl = [f"schema_version {LATEST_VERSION}"]
+    for table in db.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        ddl.extend(str(CreateIndex(i).compile(dialect=dialect)) for i in table.indexes)
+    return hashlib.sha1("\n".join(ddl).encode()).hexdigest()[:12]
+
+
+def _build_dataset(path: Path) -> None:
+    building = path.with_suffix(".building")
+    for stale in building.parent.glob(building.name + "*"):
+        stale.unlink()
+    app = create_app(_bench_config(building))
+    client = app.test_client()
+    res = client.post(
+        "/api/auth/register", json={"username": USERNAME, "password": PASSWORD}
+    )
+    assert res.status_code == 201, res.get_json()
+    with app.app_context():
+        user_id = db.session.query(User.id).filter_by(username=USERNAME).scalar()
+        type_ids = [t.id for t in FartType.query.order_by(FartType.id)]
+        load_records(user_id, RECORDS, type_ids)
+        # Fold the WAL into the main file so a plain copy is complete.
+        db.session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    _dispose(app)
+    building.rename(path)
+
+
+@pytest.fixture(scope="session")
+def bench_db(request, tmp_path_factory) -> Path:
+    """A private copy of the cached synthetic database."""
+    cache_dir = Path(request.config.cache.mkdir("benchmark-datasets"))
+    today = time.strftime("%Y%m%d", time.gmtime())
+    template = cache_dir / f"records-{RECORDS}-{today}-{_schema_fingerprint()}.db"
+    if not template.exists():
+        for old in cache_dir.glob(f"records-{RECORDS}-*.db"):
+            old.unlink()
+        _build_dataset(template)
+    db_path = tmp_path_factory.mktemp("benchmark") / "bench.db"
+    shutil.copyfile(template, db_path)
+    return db_path
+
+
+@pytest.fixture(scope="session")
+def bench_app(bench_db):
+    app = create_app(_bench_config(bench_db))
+    yield app
+    _dispose(app)
+
+
+@pytest.fixture(scope="session")
+def bench_client(bench_app):
+    return bench_app.test_client()
+
+
+@pytest.fixture(scope="session")
+def bench_credentials() -> dict:
+    return {"username": USERNAME, "password": PASSWORD}
+
+
+@pytest.fixture(scope="module")
+def bench_headers(bench_client):
+    # Per module: access tokens expire and a 1M-record session runs long.
+    res = bench_client.post(
+        "/api/auth/login", json={"username": USERNAME, "password": PASSWORD}
+    )
+    assert res.status_code == 200, res.get_json()
+    return {"Authorization": f"Bearer {res.get_json()['token']}"}
+
+
+@pytest.fixture()
+def get_ok(bench_client, bench_headers):
+    """``GET path`` as the benchmark user, asserting a 200.
+
+    The whole body is read, so streamed responses are timed to the end,
+    and the response is closed to end the request's app context.
+    """
+
+    def get(path: str):
+        res = bench_client.get(path, headers=bench_headers)
+        body = res.get_data()
+        res.close()
+        assert res.status_code == 200, body[:200]
+        return res
+
+    return get
@@ -0,0 +1,365 @@
+"""Drive a local app with a mix of realistic multi-user traffic.
+
+Builds an app on a fresh database holding ``--users`` users, each with
+``--seed-records`` synthetic records (see ``synthetic.py``), then has
+``--threads`` Flask test clients act for randomly picked users for
+``--seconds``. Every step draws one action from the scenario mix:
+
+    register   sign up a new user, who joins the pool
+    login      log an existing user in again (a full bcrypt check)
+    create     log a record for now
+    list       open the first page of the record list
+    dashboard  poll the dashboard, revalidating the user's last ETag
+    export     download the CSV export
+
+The mix is given as relative weights. Reports throughput and p50/p95/p99
+latency per endpoint.
+
+    cd backend
+    python -m benchmarks.load_generator --users 1000 --threads 32 --seconds 60
+    python -m benchmarks.load_generator --mix dashboard=10,create=3,export=0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import rollups
+from app import create_app
+from auth import create_token_for_user, hash_password
+from benchmarks.synthetic import INSERT_SQL, generate_records
+from config import Config
+from models import FartType, User, db
+
+
+PASSWORD = "Test123!"
+
+DEFAULT_MIX = {
+    "dashboard": 40,
+    "create": 25,
+    "list": 20,
+    "login": 8,
+    "register": 2,
+    "export": 1,
+}
+
+DASHBOARD_PATH = "/api/analytics/dashboard?days=30&weeks=12"
+
+
+@dataclass
+class VirtualUser:
+    username: str
+    token: str | None = None
+    dashboard_etag: str | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@dataclass
+class Samples:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    # 503 SERVER_BUSY answers, e.g. from password hashing admission control.
+    busy: int = 0
+
+    def merge(self, other: Samples) -> None:
+        self.latencies.extend(other.latencies)
+        self.errors += other.errors
+        self.busy += other.busy
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown action {name!r}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {name!r}") from None
+    return mix
+
+
+def _make_app(db_path: Path, bcrypt_rounds: int | None):
+    overrides: dict[str, object] = {
+        "SQLITE_PATH": str(db_path),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+    }
+    if bcrypt_rounds is not None:
+        overrides["BCRYPT_ROUNDS"] = bcrypt_rounds
+    return create_app(type("LoadConfig", (Config,), overrides))
+
+
+def _prepare_users(app, users: int, seed_records: int) -> tuple[list, int]:
+    """Insert users sharing one password hash, plus their records.
+
+    Users start signed in, as returning users with a stored token would.
+    """
+    with app.app_context():
+        password_hash = hash_password(PASSWORD)
+        db.session.execute(
+            User.__table__.insert(),
+            [
+                {"username": f"load{i}", "password_hash": password_hash}
+                for i in range(users)
+            ],
+        )
+        type_ids = [t.id for t in FartType.query.order_by(FartType.id)]
+        user_ids = [u for (u,) in db.session.query(User.id).order_by(User.id)]
+        connection = db.session.connection()
+        for user_id in user_ids:
+            if seed_records:
+                rows = generate_records(
+                    user_id, seed_records, type_ids, days=90, seed=user_id
+                )
+                connection.exec_driver_sql(INSERT_SQL, list(rows))
+        db.session.commit()
+        rollups.rebuild()
+        pool = [
+            VirtualUser(user.username, create_token_for_user(user))
+            for user in User.query.order_by(User.id)
+        ]
+    return pool, type_ids[0]
+
+
+class LoadRun:
+    def __init__(self, app, pool: list[VirtualUser], type_id: int, seed: int):
+        self.app = app
+        self.pool = pool
+        self.type_id = type_id
+        self.seed = seed
+        self.pool_lock = threading.Lock()
+        self.samples: dict[str, Samples] = {}
+        self.stats_lock = threading.Lock()
+        self._registered = 0
+
+    def _timed(self, local, endpoint: str, call, ok_statuses=(200,)):
+        start = time.perf_counter()
+        res = call()
+        # Streamed responses count until fully read; closing ends the
+        # request's app context and returns its connection.
+        res.get_data()
+        res.close()
+        samples = local.setdefault(endpoint, Samples())
+        samples.latencies.append(time.perf_counter() - start)
+        if res.status_code == 503:
+            samples.busy += 1
+        elif res.status_code not in ok_statuses:
+            samples.errors += 1
+        return res
+
+    def _login(self, client, local, user: VirtualUser) -> None:
+        res = self._timed(
+            local,
+            "POST /api/auth/login",
+            lambda: client.post(
+                "/api/auth/login",
+                json={"username": user.username, "password": PASSWORD},
+            ),
+        )
+        if res.status_code == 200:
+            user.token = res.get_json()["token"]
+
+    def _register(self, client, local) -> None:
+        with self.pool_lock:
+            self._registered += 1
+            username = f"load-new-{self.seed}-{self._registered}"
+        res = self._timed(
+            local,
+            "POST /api/auth/register",
+            lambda: client.post(
+                "/api/auth/register",
+                json={"username": username, "password": PASSWORD},
+            ),
+            ok_statuses=(201,),
+        )
+        if res.status_code == 201:
+            with self.pool_lock:
+                self.pool.append(VirtualUser(username, res.get_json()["token"]))
+
+    def _act(self, client, local, action: str, user: VirtualUser) -> None:
+        if action == "login" or user.token is None:
+            self._login(client, local, user)
+            if action == "login" or user.token is None:
+                return
+        headers = {"Authorization": f"Bearer {user.token}"}
+        if action == "create":
+            payload = {
+                "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "duration": "short",
+                "type_id": self.type_id,
+                "smell_level": "mild",
+                "temperature": "hot",
+                "moisture": "dry",
+            }
+            self._timed(
+                local,
+                "POST /api/records",
+                lambda: client.post("/api/records", json=payload, headers=headers),
+                ok_statuses=(201,),
+            )
+        elif action == "list":
+            self._timed(
+                local,
+                "GET /api/records",
+                lambda: client.get("/api/records?per_page=20", headers=headers),
+            )
+        elif action == "dashboard":
+            if user.dashboard_etag:
+                headers["If-None-Match"] = user.dashboard_etag
+            res = self._timed(
+                local,
+                "GET /api/analytics/dashboard",
+                lambda: client.get(DASHBOARD_PATH, headers=headers),
+                ok_statuses=(200, 304),
+            )
+            user.dashboard_etag = res.headers.get("ETag", user.dashboard_etag)
+        elif action == "export":
+            self._timed(
+                local,
+                "GET /api/export/csv",
+                lambda: client.get("/api/export/csv", headers=headers),
+            )
+
+    def worker(self, mix: dict[str, float], deadline: float, rng: random.Random):
+        client = self.app.test_client()
+        actions = list(mix)
+        weights = list(mix.values())
+        local: dict[str, Samples] = {}
+        while time.perf_counter() < deadline:
+            action = rng.choices(actions, weights=weights)[0]
+            if action == "register":
+                self._register(client, local)
+                continue
+            with self.pool_lock:
+                user = rng.choice(self.pool)
+            # One request per user at a time, like a single browser tab.
+            if not user.lock.acquire(blocking=False):
+                continue
+            try:
+                self._act(client, local, action, user)
+            finally:
+                user.lock.release()
+        with self.stats_lock:
+            for endpoint, samples in local.items():
+                self.samples.setdefault(endpoint, Samples()).merge(samples)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    return values[min(int(len(values) * pct), len(values) - 1)] * 1000
+
+
+def _summary_row(samples: Samples, seconds: float) -> dict[str, float]:
+    values = sorted(samples.latencies)
+    return {
+        "requests": len(values),
+        "errors": samples.errors,
+        "busy": samples.busy,
+        "rps": len(values) / seconds,
+        "p50_ms": _percentile(values, 0.50),
+        "p95_ms": _percentile(values, 0.95),
+        "p99_ms": _percentile(values, 0.99),
+    }
+
+
+def summarize(run: LoadRun, seconds: float) -> dict[str, dict[str, float]]:
+    summary = {}
+    total = Samples()
+    for endpoint, samples in sorted(run.samples.items()):
+        summary[endpoint] = _summary_row(samples, seconds)
+        total.merge(samples)
+    if total.latencies:
+        summary["total"] = _summary_row(total, seconds)
+    return summary
+
+
+def run(
+    users: int,
+    threads: int,
+    seconds: float,
+    mix: dict[str, float],
+    seed_records: int,
+    bcrypt_rounds: int | None,
+    seed: int,
+) -> dict[str, dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _make_app(Path(tmp) / "load.db", bcrypt_rounds)
+        pool, type_id = _prepare_users(app, users, seed_records)
+        load = LoadRun(app, pool, type_id, seed)
+        deadline = time.perf_counter() + seconds
+        workers = [
+            threading.Thread(
+                target=load.worker, args=(mix, deadline, random.Random(seed + i))
+            )
+            for i in range(threads)
+        ]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return summarize(load, seconds)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=DEFAULT_MIX,
+        help="comma separated action=weight pairs, e.g. dashboard=10,create=3",
+    )
+    parser.add_argument("--seed-records", type=int, default=200)
+    parser.add_argument(
+        "--bcrypt-rounds",
+        type=int,
+        default=None,
+        help="override BCRYPT_ROUNDS (default: the configured cost)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON instead")
+    args = parser.parse_args(argv)
+
+    summary = run(
+        args.users,
+        args.threads,
+        args.seconds,
+        args.mix,
+        args.seed_records,
+        args.bcrypt_rounds,
+        args.seed,
+    )
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    columns = ("requests", "errors", "busy", "rps", "p50_ms", "p95_ms", "p99_ms")
+    print(f"{'endpoint':<30}" + "".join(f"{c:>10}" for c in columns))
+    for endpoint, row in summary.items():
+        print(
+            f"{endpoint:<30}"
+            + "".join(
+                f"{row[c]:>10.0f}"
+                if c in ("requests", "errors", "busy")
+                else f"{row[c]:>10.1f}"
+                for c in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Cheap API latency during a login burst, with and without hash admission.
+
+Runs gunicorn (one worker, ``GUNICORN_THREADS`` threads) twice: once with a
+password hashing pool so large that every login hashes immediately, which
+is what running bcrypt on the request thread amounts to, and once with the
+configured ``PASSWORD_HASH_*`` bounds. Meanwhile a few clients keep calling
+``GET /api/fart-types``.
+
+    cd backend
+    python -m benchmarks.login_burst --login-clients 32 --seconds 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.wsgi_serving import BACKEND_DIR, SERVERS, _request, _wait_ready
+
+
+PROFILES = {
+    "unbounded": {"PASSWORD_HASH_WORKERS": "64", "PASSWORD_HASH_QUEUE_SIZE": "1000"},
+    "bounded": {},
+}
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * pct) - 1, 0)] * 1000 if values else 0.0
+
+
+def run(profile: str, login_clients: int, api_clients: int, seconds: float):
+    port = 5610 + list(PROFILES).index(profile)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        env = {
+            **os.environ,
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "GUNICORN_ACCESS_LOG": "",
+            "WEB_CONCURRENCY": "1",
+            **PROFILES[profile],
+        }
+        command = [part.format(port=port) for part in SERVERS["gunicorn"]]
+        proc = subprocess.Popen(
+            command,
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(port, proc)
+            credentials = {"username": "burst", "password": "Test123!"}
+            status, data = _request(port, "POST", "/api/auth/register", credentials)
+            assert status == 201, data
+            token = json.loads(data)["token"]
+
+            api_latencies: list[float] = []
+            login_latencies: list[float] = []
+            login_status: dict[int, int] = {}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + seconds
+
+            def login_client():
+                local: list[tuple[int, float]] = []
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    status, _ = _request(port, "POST", "/api/auth/login", credentials)
+                    local.append((status, time.perf_counter() - start))
+                    if status == 503:
+                        time.sleep(1)  # Honour Retry-After.
+                with lock:
+                    for status, elapsed in local:
+                        login_status[status] = login_status.get(status, 0) + 1
+                        if status == 200:
+                            login_latencies.append(elapsed)
+
+            def api_client():
+                local: list[float] = []
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    status, _ = _request(port, "GET", "/api/fart-types", token=token)
+                    assert status in (200, 304), status
+                    local.append(time.perf_counter() - start)
+                with lock:
+                    api_latencies.extend(local)
+
+            clients = [
+                threading.Thread(target=login_client) for _ in range(login_clients)
+            ]
+            clients += [threading.Thread(target=api_client) for _ in range(api_clients)]
+            for t in clients:
+                t.start()
+            for t in clients:
+                t.join()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    return {
+        "api_ops_per_sec": len(api_latencies) / seconds,
+        "api_p50_ms": statistics.median(api_latencies) * 1000,
+        "api_p95_ms": _percentile(api_latencies, 0.95),
+        "login_ok": login_status.get(200, 0),
+        "login_503": login_status.get(503, 0),
+        "login_ok_p50_ms": (
+            statistics.median(login_latencies) * 1000 if login_latencies else 0.0
+        ),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--login-clients", type=int, default=32)
+    parser.add_argument("--api-clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    args = parser.parse_args(argv)
+
+    results = {
+        profile: run(profile, args.login_clients, args.api_clients, args.seconds)
+        for profile in PROFILES
+    }
+
+    keys = list(next(iter(results.values())))
+    print(f"{'metric':<18}" + "".join(f"{profile:>12}" for profile in PROFILES))
+    for key in keys:
+        row = [results[profile][key] for profile in PROFILES]
+        print(f"{key:<18}" + "".join(f"{value:>12.1f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
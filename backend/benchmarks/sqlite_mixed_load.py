@@ -0,0 +1,194 @@
+"""Mixed read/write throughput with and without the SQLite profile.
+
+Runs the same workload twice, each against a fresh database file: once with
+every ``SQLITE_*`` setting left at SQLite's defaults (rollback journal, FULL
+sync, default pool) and once with the configured profile (WAL etc.). Each
+thread acts as its own user, mixing record creation with record listing and
+analytics reads.
+
+    cd backend
+    python -m benchmarks.sqlite_mixed_load --threads 8 --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app import create_app
+from config import Config, TestingConfig
+from models import FartType, db
+
+
+PROFILE_SETTINGS = (
+    "SQLITE_JOURNAL_MODE",
+    "SQLITE_SYNCHRONOUS",
+    "SQLITE_CACHE_SIZE",
+    "SQLITE_MMAP_SIZE",
+    "SQLITE_TEMP_STORE",
+    "SQLITE_BUSY_TIMEOUT_MS",
+    "SQLITE_POOL_SIZE",
+    "SQLITE_POOL_MAX_OVERFLOW",
+    "SQLITE_POOL_TIMEOUT",
+)
+
+
+READ_PATHS = (
+    "/api/records?per_page=20",
+    "/api/analytics/daily-count?days=30",
+    "/api/analytics/smell-distribution",
+)
+
+
+def _make_app(db_path: Path, tuned: bool):
+    overrides = {
+        "SQLITE_PATH": str(db_path),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        # Every read should reach the database.
+        "ANALYTICS_CACHE_BACKEND": "none",
+        "SQLITE_CHECKPOINT_INTERVAL": Config.SQLITE_CHECKPOINT_INTERVAL,
+    }
+    if not tuned:
+        # pysqlite's own 5 s lock wait still applies without busy_timeout.
+        overrides.update({key: None for key in PROFILE_SETTINGS})
+    cfg = type("BenchConfig", (TestingConfig,), overrides)
+    return create_app(cfg)
+
+
+def _record_payload(type_id: int, when: datetime) -> dict:
+    return {
+        "timestamp": when.isoformat().replace("+00:00", "Z"),
+        "duration": random.choice(["very_short", "short", "medium", "long"]),
+        "type_id": type_id,
+        "smell_level": random.choice(["mild", "tolerable", "stinky"]),
+        "temperature": random.choice(["hot", "cold"]),
+        "moisture": random.choice(["moist", "dry"]),
+    }
+
+
+def _first_type_id(app) -> int:
+    with app.app_context():
+        fart_type = FartType.query.first()
+        assert fart_type is not None, "preset fart types are seeded at startup"
+        return int(fart_type.id)
+
+
+def _prepare_users(app, users: int, seed_records: int) -> list[str]:
+    type_id = _first_type_id(app)
+    client = app.test_client()
+    now = datetime.now(timezone.utc)
+    tokens = []
+    for i in range(users):
+        res = client.post(
+            "/api/auth/register",
+            json={"username": f"bench{i}", "password": "Test123!"},
+        )
+        token = res.get_json()["token"]
+        tokens.append(token)
+        if seed_records:
+            client.post(
+                "/api/records/batch",
+                json=[
+                    _record_payload(type_id, now - timedelta(minutes=17 * n))
+                    for n in range(seed_records)
+                ],
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    return tokens
+
+
+def run(tuned: bool, threads: int, seconds: float, write_ratio: float, seed: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _make_app(Path(tmp) / "bench.db", tuned)
+        type_id = _first_type_id(app)
+        tokens = _prepare_users(app, threads, seed)
+
+        latencies: dict[str, list[float]] = {"write": [], "read": []}
+        errors = 0
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker(token: str, rng: random.Random):
+            nonlocal errors
+            client = app.test_client()
+            headers = {"Authorization": f"Bearer {token}"}
+            local: dict[str, list[float]] = {"write": [], "read": []}
+            local_errors = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if rng.random() < write_ratio:
+                    kind = "write"
+                    res = client.post(
+                        "/api/records",
+                        json=_record_payload(type_id, datetime.now(timezone.utc)),
+                        headers=headers,
+                    )
+                    ok = res.status_code == 201
+                else:
+                    kind = "read"
+                    path = rng.choice(READ_PATHS)
+                    res = client.get(path, headers=headers)
+                    ok = res.status_code == 200
+                local[kind].append(time.perf_counter() - start)
+                if not ok:
+                    local_errors += 1
+            with lock:
+                for kind, values in local.items():
+                    latencies[kind].extend(values)
+                errors += local_errors
+
+        workers = [
+            threading.Thread(target=worker, args=(token, random.Random(i)))
+            for i, token in enumerate(tokens)
+        ]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        checkpointer = app.extensions.get("sqlite_checkpointer")
+        if checkpointer is not None:
+            checkpointer.stop()
+        with app.app_context():
+            db.engine.dispose()
+
+    total = sum(len(v) for v in latencies.values())
+    summary = {"ops_per_sec": total / seconds, "errors": errors}
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            summary[f"{kind}_ops"] = len(values)
+            summary[f"{kind}_p50_ms"] = statistics.median(values) * 1000
+            summary[f"{kind}_p95_ms"] = values[int(len(values) * 0.95) - 1] * 1000
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--seed-records", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, tuned in (("default", False), ("profile", True)):
+        results[label] = run(
+            tuned, args.threads, args.seconds, args.write_ratio, args.seed_records
+        )
+
+    keys = sorted({key for summary in results.values() for key in summary})
+    print(f"{'metric':<16}{'default':>12}{'profile':>12}")
+    for key in keys:
+        row = [results[label].get(key, 0) for label in ("default", "profile")]
+        print(f"{key:<16}" + "".join(f"{value:>12.1f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
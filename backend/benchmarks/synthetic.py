@@ -0,0 +1,147 @@
+"""Fast synthetic record history for benchmarks.
+
+Rows are written straight into ``fart_records`` with ``executemany`` (no ORM
+objects), already carrying their enum codes and time buckets, and the
+user's rollups are rebuilt once at the end. A million records load in
+well under a minute.
+
+The distributions follow what real users log: most records fall after
+meals and hardly any at night, weekends are a little busier, milder and
+shorter records dominate, a few types account for most records and only
+some records carry notes.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timezone, tzinfo
+from typing import Iterator
+
+import rollups
+from migrations import number_untracked_records
+from models import (
+    DURATION_CODES,
+    MOISTURE_CODES,
+    SMELL_LEVEL_CODES,
+    TEMPERATURE_CODES,
+    db,
+    time_buckets,
+)
+
+
+# Relative frequency of each local hour, 0 to 23.
+HOUR_WEIGHTS = (
+    2, 1, 1, 1, 1, 2, 5, 9, 12, 10, 7, 6,
+    7, 9, 8, 6, 5, 6, 8, 11, 12, 10, 7, 4,
+)  # fmt: skip
+# Relative frequency of each weekday, Monday first.
+WEEKDAY_WEIGHTS = (10, 10, 10, 10, 11, 13, 13)
+
+DURATION_WEIGHTS = {"very_short": 35, "short": 40, "medium": 20, "long": 5}
+SMELL_LEVEL_WEIGHTS = {"mild": 40, "tolerable": 32, "stinky": 20, "extremely_stinky": 8}
+TEMPERATURE_WEIGHTS = {"hot": 65, "cold": 35}
+MOISTURE_WEIGHTS = {"moist": 25, "dry": 75}
+
+NOTES = ("吃了火锅", "早上的咖啡", "开会时忍住了", "健身后", "豆浆", "红薯")
+NOTES_RATIO = 0.08
+
+INSERT_SQL = (
+    "INSERT INTO fart_records (user_id, timestamp, day, week, hour, dow, "
+    "duration, type_id, smell_level, temperature, moisture, notes, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _weighted(rng: random.Random, weights: dict[str, int], codes: dict[str, int]):
+    """A sampler returning the code of a value drawn with ``weights``."""
+    population = [codes[name] for name in weights]
+    cum_weights = []
+    total = 0
+    for weight in weights.values():
+        total += weight
+        cum_weights.append(total)
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def _timestamps(rng: random.Random, count: int, days: int, end: int) -> list[int]:
+    """``count`` epochs over the ``days`` before ``end``, oldest first."""
+    first_day = end // 86400 - days
+    day_numbers = range(first_day, first_day + days)
+    # 1970-01-01 was a Thursday.
+    day_weights = [WEEKDAY_WEIGHTS[(n + 3) % 7] for n in day_numbers]
+    picked_days = rng.choices(day_numbers, weights=day_weights, k=count)
+    hours = rng.choices(range(24), weights=HOUR_WEIGHTS, k=count)
+    epochs = [
+        day * 86400 + hour * 3600 + rng.randrange(3600)
+        for day, hour in zip(picked_days, hours)
+    ]
+    epochs.sort()
+    return epochs
+
+
+def generate_records(
+    user_id: int,
+    count: int,
+    type_ids: list[int],
+    days: int = 730,
+    end: int | None = None,
+    tz: tzinfo = timezone.utc,
+    seed: int = 0,
+) -> Iterator[tuple]:
+    """Rows for ``INSERT_SQL`` spread over ``days`` days up to ``end``.
+
+    ``end`` defaults to the start of the current UTC day; rows come out in
+    time order, like records logged as they happen.
+    """
+    rng = random.Random(seed)
+    if end is None:
+        end = int(time.time()) // 86400 * 86400
+    # Zipf-like: the first types are by far the most common.
+    type_weights = [1 / (rank + 1) for rank in range(len(type_ids))]
+    duration = _weighted(rng, DURATION_WEIGHTS, DURATION_CODES)
+    smell_level = _weighted(rng, SMELL_LEVEL_WEIGHTS, SMELL_LEVEL_CODES)
+    temperature = _weighted(rng, TEMPERATURE_WEIGHTS, TEMPERATURE_CODES)
+    moisture = _weighted(rng, MOISTURE_WEIGHTS, MOISTURE_CODES)
+
+    for epoch in _timestamps(rng, count, days, end):
+        buckets = time_buckets(epoch, tz)
+        yield (
+            user_id,
+            epoch,
+            buckets["day"],
+            buckets["week"],
+            buckets["hour"],
+            buckets["dow"],
+            duration(),
+            rng.choices(type_ids, weights=type_weights)[0],
+            smell_level(),
+            temperature(),
+            moisture(),
+            rng.choice(NOTES) if rng.random() < NOTES_RATIO else None,
+            datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+
+def load_records(
+    user_id: int,
+    count: int,
+    type_ids: list[int],
+    chunk_size: int = 10000,
+    **options,
+) -> None:
+    """Insert ``count`` synthetic records for ``user_id``, number them in the
+    change feed and rebuild rollups.
+
+    Needs an app context; ``options`` go to ``generate_records``.
+    """
+    rows = generate_records(user_id, count, type_ids, **options)
+    connection = db.session.connection()
+    while True:
+        chunk = [row for _, row in zip(range(chunk_size), rows)]
+        if not chunk:
+            break
+        connection.exec_driver_sql(INSERT_SQL, chunk)
+    number_untracked_records(connection)
+    db.session.commit()
+    rollups.rebuild(user_id)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group="analytics")
+
+ANALYTICS_PATHS = (
+    "/api/analytics/daily-count?days=30",
+    "/api/analytics/daily-count?days=365",
+    "/api/analytics/weekly-count?weeks=52",
+    "/api/analytics/type-distribution",
+    "/api/analytics/smell-distribution",
+    "/api/analytics/hourly-heatmap",
+    "/api/analytics/duration-distribution",
+    "/api/analytics/cross-analysis",
+)
+
+
+@pytest.fixture(params=["rollups", "raw"])
+def analytics_source(request, bench_app):
+    bench_app.config["ANALYTICS_USE_ROLLUPS"] = request.param == "rollups"
+    yield request.param
+    bench_app.config["ANALYTICS_USE_ROLLUPS"] = True
+
+
+@pytest.mark.parametrize("path", ANALYTICS_PATHS)
+def test_analytics(benchmark, get_ok, analytics_source, path):
+    benchmark(get_ok, path)
+
+
+def test_dashboard(benchmark, get_ok):
+    res = benchmark(get_ok, "/api/analytics/dashboard?days=30&weeks=12")
+    assert res.get_json()["daily_count"]["dates"]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group="auth")
+
+
+def test_register(benchmark, bench_client):
+    names = (f"bench-register-{n}" for n in itertools.count())
+
+    def register():
+        res = bench_client.post(
+            "/api/auth/register", json={"username": next(names), "password": "Test123!"}
+        )
+        assert res.status_code == 201
+
+    benchmark(register)
+
+
+def test_login(benchmark, bench_client, bench_credentials):
+    def login():
+        res = bench_client.post("/api/auth/login", json=bench_credentials)
+        assert res.status_code == 200
+
+    benchmark(login)
+
+
+def test_me(benchmark, get_ok):
+    benchmark(get_ok, "/api/auth/me")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group="export")
+
+
+def _last_days(days: int) -> str:
+    today = datetime.now(timezone.utc).date()
+    return f"date_from={(today - timedelta(days=days)).isoformat()}"
+
+
+def test_csv_all(benchmark, get_ok):
+    benchmark.pedantic(get_ok, args=("/api/export/csv",), rounds=3)
+
+
+def test_csv_last_90_days(benchmark, get_ok):
+    benchmark(get_ok, f"/api/export/csv?{_last_days(90)}")
+
+
+def test_excel_last_90_days(benchmark, get_ok):
+    benchmark.pedantic(get_ok, args=(f"/api/export/excel?{_last_days(90)}",), rounds=3)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group="fart_types")
+
+
+def test_list(benchmark, get_ok):
+    benchmark(get_ok, "/api/fart-types")
+
+
+def test_list_not_modified(benchmark, bench_client, bench_headers):
+    etag = bench_client.get("/api/fart-types", headers=bench_headers).headers["ETag"]
+    headers = {**bench_headers, "If-None-Match": etag}
+
+    def revalidate():
+        assert bench_client.get("/api/fart-types", headers=headers).status_code == 304
+
+    benchmark(revalidate)
+
+
+def test_create(benchmark, bench_client, bench_headers):
+    names = (f"bench-type-{n}" for n in itertools.count())
+
+    def create():
+        res = bench_client.post(
+            "/api/fart-types", json={"name": next(names)}, headers=bench_headers
+        )
+        assert res.status_code == 201
+
+    benchmark(create)
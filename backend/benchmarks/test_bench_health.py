@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group="health")
+
+
+def test_health(benchmark, bench_client):
+    def health():
+        assert bench_client.get("/api/health").status_code == 200
+
+    benchmark(health)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cache import data_version
+from models import User, db
+
+
+pytestmark = pytest.mark.benchmark(group="records")
+
+DEEP_PAGE = 100
+PER_PAGE = 100
+
+
+def _payload(type_id: int, when: datetime, **overrides) -> dict:
+    payload = {
+        "timestamp": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "hot",
+        "moisture": "dry",
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.fixture(scope="module")
+def latest_record(bench_client, bench_headers) -> dict:
+    res = bench_client.get("/api/records?per_page=1", headers=bench_headers)
+    return res.get_json()["items"][0]
+
+
+@pytest.fixture(scope="module")
+def deep_cursor(bench_client, bench_headers) -> str:
+    """Cursor to the same position as ``page=DEEP_PAGE``."""
+    cursor = ""
+    for _ in range(DEEP_PAGE - 1):
+        res = bench_client.get(
+            f"/api/records?per_page={PER_PAGE}&cursor={cursor}",
+            headers=bench_headers,
+        )
+        cursor = res.get_json()["next_cursor"]
+    return cursor
+
+
+@pytest.fixture(scope="module")
+def synced_cursor(bench_app, bench_credentials) -> int:
+    """The cursor of a client that has every change."""
+    with bench_app.app_context():
+        user_id = (
+            db.session.query(User.id)
+            .filter_by(username=bench_credentials["username"])
+            .scalar()
+        )
+        return data_version(user_id)
+
+
+def test_list_first_page(benchmark, get_ok):
+    benchmark(get_ok, "/api/records?per_page=20")
+
+
+def test_list_date_range(benchmark, get_ok):
+    today = datetime.now(timezone.utc).date()
+    date_from = (today - timedelta(days=90)).isoformat()
+    benchmark(
+        get_ok,
+        f"/api/records?per_page=20&date_from={date_from}&date_to={today.isoformat()}",
+    )
+
+
+@pytest.fixture(scope="module")
+def rare_note(bench_client, bench_headers, latest_record) -> str:
+    """A note only one record has, next to the synthetic ones that many share."""
+    note = "忘了带伞被雨淋"
+    res = bench_client.post(
+        "/api/records",
+        json=_payload(latest_record["type_id"], datetime.now(timezone.utc), notes=note),
+        headers=bench_headers,
+    )
+    assert res.status_code == 201
+    return note
+
+
+def test_search_notes(benchmark, get_ok):
+    # Every synthetic note is shared by about 1.3% of the records.
+    benchmark(get_ok, "/api/records?per_page=20&q=开会时忍住")
+
+
+def test_search_rare_note(benchmark, get_ok, rare_note):
+    benchmark(get_ok, f"/api/records?per_page=20&q={rare_note}")
+
+
+def test_search_notes_date_range(benchmark, get_ok):
+    today = datetime.now(timezone.utc).date()
+    date_from = (today - timedelta(days=90)).isoformat()
+    benchmark(get_ok, f"/api/records?per_page=20&q=吃了火锅&date_from={date_from}")
+
+
+def test_list_deep_offset_page(benchmark, get_ok):
+    benchmark(get_ok, f"/api/records?per_page={PER_PAGE}&page={DEEP_PAGE}")
+
+
+def test_list_deep_cursor_page(benchmark, get_ok, deep_cursor):
+    benchmark(get_ok, f"/api/records?per_page={PER_PAGE}&cursor={deep_cursor}")
+
+
+def test_changes_first_page(benchmark, get_ok):
+    benchmark(get_ok, "/api/records/changes")
+
+
+def test_changes_in_sync(benchmark, get_ok, synced_cursor):
+    benchmark(get_ok, f"/api/records/changes?since={synced_cursor}")
+
+
+def test_get_record(benchmark, get_ok, latest_record):
+    benchmark(get_ok, f"/api/records/{latest_record['id']}")
+
+
+def test_create_record(benchmark, bench_client, bench_headers, latest_record):
+    now = datetime.now(timezone.utc)
+
+    def create():
+        res = bench_client.post(
+            "/api/records",
+            json=_payload(latest_record["type_id"], now),
+            headers=bench_headers,
+        )
+        assert res.status_code == 201
+
+    benchmark(create)
+
+
+def test_update_record(benchmark, bench_client, bench_headers, latest_record):
+    smell_levels = itertools.cycle(["mild", "stinky"])
+
+    def update():
+        res = bench_client.put(
+            f"/api/records/{latest_record['id']}",
+            json={"smell_level": next(smell_levels)},
+            headers=bench_headers,
+        )
+        assert res.status_code == 200
+
+    benchmark(update)
+
+
+def test_create_batch(benchmark, bench_client, bench_headers, latest_record):
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    items = [
+        _payload(latest_record["type_id"], start + timedelta(minutes=17 * n))
+        for n in range(100)
+    ]
+
+    def create_batch():
+        res = bench_client.post("/api/records/batch", json=items, headers=bench_headers)
+        assert res.status_code == 201
+
+    benchmark(create_batch)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from startup import STARTUP_BUDGET_MS
+
+
+pytestmark = pytest.mark.benchmark(group="startup")
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# What the desktop splash screen waits for, in a fresh interpreter.
+COLD_START = """
+from app import create_app
+assert create_app().test_client().get("/api/health").status_code == 200
+"""
+
+
+def test_cold_start_within_budget(benchmark, bench_db):
+    env = {
+        **os.environ,
+        "SQLITE_PATH": str(bench_db),
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{bench_db}",
+    }
+
+    def cold_start():
+        subprocess.run(
+            [sys.executable, "-c", COLD_START], cwd=BACKEND_DIR, env=env, check=True
+        )
+
+    # The warmup round brings the copied dataset's schema up to date.
+    benchmark.pedantic(cold_start, rounds=5, warmup_rounds=1)
+
+    assert benchmark.stats.stats.median * 1000 < STARTUP_BUDGET_MS
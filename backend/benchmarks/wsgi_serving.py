@@ -0,0 +1,230 @@
+"""HTTP throughput of the Flask development server versus gunicorn.
+
+Starts each server as a subprocess on a fresh database, seeds one user per
+client thread, then has every thread mix record creation with record
+listing and analytics reads over real HTTP for a fixed time.
+
+    cd backend
+    python -m benchmarks.wsgi_serving --threads 16 --seconds 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+READ_PATHS = (
+    "/api/records?per_page=20",
+    "/api/analytics/dashboard?days=30&weeks=12",
+    "/api/analytics/daily-count?days=30",
+    "/api/fart-types",
+)
+
+SERVERS = {
+    "dev": [
+        sys.executable,
+        "-m",
+        "flask",
+        "--app",
+        "app:create_app",
+        "run",
+        "--port",
+        "{port}",
+    ],
+    "gunicorn": [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        "gunicorn.conf.py",
+        "--bind",
+        "127.0.0.1:{port}",
+        "wsgi:app",
+    ],
+}
+
+
+def _request(port: int, method: str, path: str, body=None, token: str | None = None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        conn.request(method, path, None if body is None else json.dumps(body), headers)
+        res = conn.getresponse()
+        data = res.read()
+        return res.status, data
+    finally:
+        conn.close()
+
+
+def _wait_ready(port: int, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if _request(port, "GET", "/api/health")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _record_payload(rng: random.Random, type_id: int, when: datetime) -> dict:
+    return {
+        "timestamp": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": rng.choice(["very_short", "short", "medium", "long"]),
+        "type_id": type_id,
+        "smell_level": rng.choice(["mild", "tolerable", "stinky"]),
+        "temperature": rng.choice(["hot", "cold"]),
+        "moisture": rng.choice(["moist", "dry"]),
+    }
+
+
+def _prepare_users(port: int, users: int, seed_records: int) -> tuple[list[str], int]:
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    tokens = []
+    for i in range(users):
+        status, data = _request(
+            port,
+            "POST",
+            "/api/auth/register",
+            {"username": f"bench{i}", "password": "Test123!"},
+        )
+        assert status == 201, data
+        tokens.append(json.loads(data)["token"])
+    status, data = _request(port, "GET", "/api/fart-types", token=tokens[0])
+    type_id = json.loads(data)[0]["id"]
+    for token in tokens:
+        if seed_records:
+            items = [
+                _record_payload(rng, type_id, now - timedelta(minutes=17 * n))
+                for n in range(seed_records)
+            ]
+            status, data = _request(port, "POST", "/api/records/batch", items, token)
+            assert status == 201, data
+    return tokens, type_id
+
+
+def run(server: str, threads: int, seconds: float, write_ratio: float, seed: int):
+    port = 5600 + list(SERVERS).index(server)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        env = {
+            **os.environ,
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            "GUNICORN_ACCESS_LOG": "",
+        }
+        command = [part.format(port=port) for part in SERVERS[server]]
+        proc = subprocess.Popen(
+            command,
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(port, proc)
+            tokens, type_id = _prepare_users(port, threads, seed)
+
+            latencies: dict[str, list[float]] = {"write": [], "read": []}
+            errors = 0
+            lock = threading.Lock()
+            deadline = time.perf_counter() + seconds
+
+            def worker(token: str, rng: random.Random):
+                nonlocal errors
+                local: dict[str, list[float]] = {"write": [], "read": []}
+                local_errors = 0
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        if rng.random() < write_ratio:
+                            kind = "write"
+                            payload = _record_payload(
+                                rng, type_id, datetime.now(timezone.utc)
+                            )
+                            ok = (
+                                _request(port, "POST", "/api/records", payload, token)[
+                                    0
+                                ]
+                                == 201
+                            )
+                        else:
+                            kind = "read"
+                            path = rng.choice(READ_PATHS)
+                            ok = _request(port, "GET", path, token=token)[0] == 200
+                    except OSError:
+                        kind, ok = "read", False
+                    local[kind].append(time.perf_counter() - start)
+                    if not ok:
+                        local_errors += 1
+                with lock:
+                    for kind, values in local.items():
+                        latencies[kind].extend(values)
+                    errors += local_errors
+
+            workers = [
+                threading.Thread(target=worker, args=(token, random.Random(i)))
+                for i, token in enumerate(tokens)
+            ]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    total = sum(len(v) for v in latencies.values())
+    summary = {"ops_per_sec": total / seconds, "errors": errors}
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            summary[f"{kind}_ops"] = len(values)
+            summary[f"{kind}_p50_ms"] = statistics.median(values) * 1000
+            summary[f"{kind}_p95_ms"] = values[int(len(values) * 0.95) - 1] * 1000
+    return summary
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-records", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for server in SERVERS:
+        results[server] = run(
+            server, args.threads, args.seconds, args.write_ratio, args.seed_records
+        )
+
+    keys = sorted({key for summary in results.values() for key in summary})
+    print(f"{'metric':<16}" + "".join(f"{server:>12}" for server in SERVERS))
+    for key in keys:
+        row = [results[server].get(key, 0) for server in SERVERS]
+        print(f"{key:<16}" + "".join(f"{value:>12.1f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
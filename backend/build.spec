@@ -4,7 +4,7 @@
 block_cipher = None
 
 a = Analysis(
-    ['app.py'],
+    ['desktop.py'],
     pathex=[],
     binaries=[],
     datas=[],
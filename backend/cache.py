@@ -0,0 +1,246 @@
+"""Per-user analytics result cache.
+
+Cached responses are keyed by user, endpoint, the user's data version and the
+normalized filter arguments. The data version lives in ``user_data_versions``
+and is bumped in the same transaction as every record write, so a write
+invalidates all of that user's cached results at once and every worker sees
+the new version on its next request, whatever backend holds the entries.
+Results relative to "now" (``days=7``) also key on the current UTC minute,
+matching their ETag, so a sliding window is recomputed at least once a minute.
+
+Two backends are available:
+
+* ``memory`` (default): an in-process LRU with a TTL, an entry cap and a
+  byte cap.
+* ``redis``: any Redis-compatible server shared by all workers; configure
+  ``maxmemory``/``maxmemory-policy allkeys-lru`` on the server for the memory
+  cap. Requires the optional ``redis`` package.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Iterable, Protocol, TypeVar, cast
+
+from flask import current_app, request
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from auth import current_user_id
+from models import UserDataVersion, db
+
+
+T = TypeVar("T", bound=Callable[..., Any])
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> str | None:
+        ...
+
+    def set(self, key: str, value: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with a TTL and entry/byte limits."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(key: str, value: str) -> int:
+        return len(key) + len(value)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _expires_at, value = self._entries.pop(key)
+        self._bytes -= self._size(key, value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class RedisCache:
+    """Cache entries in a Redis-compatible store shared across workers."""
+
+    def __init__(self, client: Any, ttl: float, prefix: str = "fart-steward:"):
+        self.client = client
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+
+    def get(self, key: str) -> str | None:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_cache_backend(config) -> CacheBackend | None:
+    backend = (config.get("ANALYTICS_CACHE_BACKEND") or "none").lower()
+    ttl = float(config.get("ANALYTICS_CACHE_TTL", 300))
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCache(
+            ttl=ttl,
+            max_entries=int(config.get("ANALYTICS_CACHE_MAX_ENTRIES", 2048)),
+            max_bytes=int(config.get("ANALYTICS_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+        )
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "ANALYTICS_CACHE_BACKEND=redis requires the 'redis' package"
+            ) from exc
+        client = redis.Redis.from_url(config["ANALYTICS_CACHE_URL"])
+        return RedisCache(client, ttl=ttl)
+    raise ValueError(f"Unknown ANALYTICS_CACHE_BACKEND: {backend}")
+
+
+def init_cache(app) -> None:
+    app.extensions["analytics_cache"] = create_cache_backend(app.config)
+
+
+def get_cache() -> CacheBackend | None:
+    return current_app.extensions.get("analytics_cache")
+
+
+def data_version(user_id: int) -> int:
+    version = (
+        db.session.query(UserDataVersion.version)
+        .filter(UserDataVersion.user_id == user_id)
+        .scalar()
+    )
+    return int(version or 0)
+
+
+def request_data_version(user_id: int) -> int:
+    """``data_version`` read at most once per request."""
+    versions = request.environ.setdefault("fart_steward.data_versions", {})
+    if user_id not in versions:
+        versions[user_id] = data_version(user_id)
+    return versions[user_id]
+
+
+def bump_data_version(user_id: int, count: int = 1) -> int:
+    """Invalidate the user's cached results; committed with the caller's write.
+
+    Returns the new version. The version doubles as the records change feed
+    sequence: a write of ``count`` records owns the last ``count`` values.
+    """
+    table = UserDataVersion.__table__
+    stmt = sqlite_insert(table).values(user_id=user_id, version=count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": table.c.version + count},
+    )
+    return int(db.session.execute(stmt.returning(table.c.version)).scalar_one())
+
+
+def minute_bucket(time_relative_args: Iterable[str]) -> str | None:
+    """The current UTC minute if the request sets a time-relative argument."""
+    if any(request.args.get(arg) for arg in time_relative_args):
+        return datetime.now(timezone.utc).strftime("%Y%m%d%H%M")
+    return None
+
+
+def cached_per_user(
+    name: str, vary_args: Iterable[str], time_relative_args: Iterable[str] = ()
+) -> Callable[[T], T]:
+    """Cache a view's successful JSON response per user and data version.
+
+    Must sit below ``auth_required``. Only the query arguments listed in
+    ``vary_args`` are part of the key; when one of ``time_relative_args`` is
+    set, so is the current UTC minute.
+    """
+    vary = tuple(sorted(vary_args))
+    relative = tuple(time_relative_args)
+
+    def decorator(fn: T) -> T:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any):
+            cache = get_cache()
+            user_id = current_user_id()
+            if cache is None or user_id is None:
+                return fn(*args, **kwargs)
+
+            filters = "&".join(
+                f"{arg}={request.args[arg].strip()}"
+                for arg in vary
+                if request.args.get(arg, "").strip()
+            )
+            version = request_data_version(user_id)
+            key = f"analytics:{user_id}:{version}:{name}?{filters}"
+            minute = minute_bucket(relative)
+            if minute is not None:
+                key = f"{key}@{minute}"
+
+            body = cache.get(key)
+            if body is not None:
+                response = current_app.response_class(body, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, response.get_data(as_text=True))
+                response.headers["X-Cache"] = "MISS"
+            return response
+
+        return cast(T, wrapper)
+
+    return decorator
@@ -0,0 +1,128 @@
+"""Process-wide catalog of fart types.
+
+``fart_types`` is tiny and almost never changes, so each process keeps the
+whole table in memory and serves id->name and name->id lookups from there.
+The catalog is loaded at startup and reloaded when:
+
+* ``invalidate()`` is called after a type is committed in this process,
+* a lookup misses (the type may have been created by another worker), or
+* it is older than ``FART_TYPE_CATALOG_TTL`` seconds.
+
+A miss reloads at most once per request, so a request full of unknown ids
+(a record batch, an export of deleted types) costs one reload, not one each.
+
+``version`` is a digest of the catalog contents, so every worker holding the
+same types reports the same version (used as the ``/api/fart-types`` ETag).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any
+
+from flask import current_app, g, has_request_context
+
+from models import FartType, db
+
+
+class _Snapshot:
+    __slots__ = ("types", "by_id", "by_name", "version", "loaded_at")
+
+    def __init__(self, types: list[dict[str, Any]]):
+        self.types = types
+        self.by_id = {t["id"]: t for t in types}
+        self.by_name = {t["name"]: t for t in types}
+        self.version = hashlib.blake2b(
+            "\n".join(
+                f"{t['id']}:{t['name']}:{int(t['is_preset'])}" for t in types
+            ).encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        self.loaded_at = time.monotonic()
+
+
+class FartTypeCatalog:
+    """Thread-safe in-memory view of ``fart_types``."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: _Snapshot | None = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> _Snapshot:
+        rows = db.session.query(FartType.id, FartType.name, FartType.is_preset).all()
+        types = [
+            {"id": int(type_id), "name": name, "is_preset": bool(is_preset)}
+            for type_id, name, is_preset in rows
+        ]
+        types.sort(key=lambda t: (not t["is_preset"], t["name"]))
+        return _Snapshot(types)
+
+    def _current(self, refresh: bool = False) -> _Snapshot:
+        snapshot = self._snapshot
+        if (
+            refresh
+            or snapshot is None
+            or time.monotonic() - snapshot.loaded_at >= self.ttl
+        ):
+            with self._lock:
+                if snapshot is self._snapshot:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        assert snapshot is not None
+        return snapshot
+
+    def load(self) -> None:
+        self._current(refresh=True)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def _refresh_on_miss(self) -> _Snapshot | None:
+        """A reloaded snapshot, or ``None`` if this request already reloaded."""
+        if has_request_context():
+            if g.get("fart_type_catalog_refreshed"):
+                return None
+            g.fart_type_catalog_refreshed = True
+        return self._current(refresh=True)
+
+    def listing(self) -> tuple[str, list[dict[str, Any]]]:
+        """``(version, types)`` from one snapshot; presets first, then by name."""
+        snapshot = self._current()
+        return snapshot.version, snapshot.types
+
+    def get(self, type_id: int) -> dict[str, Any] | None:
+        found = self._current().by_id.get(type_id)
+        if found is None and (snapshot := self._refresh_on_miss()) is not None:
+            found = snapshot.by_id.get(type_id)
+        return found
+
+    def find(self, name: str) -> dict[str, Any] | None:
+        found = self._current().by_name.get(name)
+        if found is None and (snapshot := self._refresh_on_miss()) is not None:
+            found = snapshot.by_name.get(name)
+        return found
+
+    def known_ids(self, type_ids: set[int]) -> set[int]:
+        """The subset of ``type_ids`` that exist, reloading at most once."""
+        known = type_ids & self._current().by_id.keys()
+        if known != type_ids and (snapshot := self._refresh_on_miss()) is not None:
+            known = type_ids & snapshot.by_id.keys()
+        return known
+
+    def name_of(self, type_id: int) -> str | None:
+        found = self.get(type_id)
+        return found["name"] if found else None
+
+
+def init_catalog(app) -> None:
+    app.extensions["fart_type_catalog"] = FartTypeCatalog(
+        float(app.config.get("FART_TYPE_CATALOG_TTL", 300))
+    )
+
+
+def get_catalog() -> FartTypeCatalog:
+    return current_app.extensions["fart_type_catalog"]
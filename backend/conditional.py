@@ -0,0 +1,68 @@
+"""Strong ETags for per-user GET endpoints.
+
+The ETag is derived from the user's data version (``user_data_versions``,
+bumped on every record write) plus the endpoint and its query arguments, so
+it costs one primary-key lookup instead of rendering and hashing the body.
+A matching ``If-None-Match`` is answered with ``304 Not Modified`` before the
+view runs any query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+from typing import Any, Callable, Iterable, TypeVar, cast
+
+from flask import current_app, request
+
+from auth import current_user_id
+from cache import minute_bucket, request_data_version
+
+
+T = TypeVar("T", bound=Callable[..., Any])
+
+
+def etag_per_user(
+    name: str, time_relative_args: Iterable[str] = ()
+) -> Callable[[T], T]:
+    """Add a version-derived ETag and honor ``If-None-Match``.
+
+    Responses that depend on "now" through one of ``time_relative_args``
+    (e.g. ``days=7``) also fold the current UTC minute into the tag, so a
+    sliding window is revalidated at least once a minute.
+    Must sit below ``auth_required``.
+    """
+    relative = tuple(time_relative_args)
+
+    def decorator(fn: T) -> T:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any):
+            user_id = current_user_id()
+            if user_id is None:
+                return fn(*args, **kwargs)
+
+            parts = [
+                name,
+                *sorted(f"{k}={v}" for k, v in request.args.items(multi=True)),
+            ]
+            minute = minute_bucket(relative)
+            if minute is not None:
+                parts.append(minute)
+            digest = hashlib.blake2b(
+                "\n".join(parts).encode("utf-8"), digest_size=8
+            ).hexdigest()
+            etag = f"u{user_id}-v{request_data_version(user_id)}-{digest}"
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return cast(T, wrapper)
+
+    return decorator
@@ -15,6 +15,87 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite profile applied to every connection (see sqlite_profile.py);
+    # None leaves a pragma at SQLite's default.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-16384"))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+    SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "10"))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.environ.get("SQLITE_POOL_MAX_OVERFLOW", "20"))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get("SQLITE_POOL_TIMEOUT", "30"))
+    # Seconds between background WAL checkpoints; 0 disables the thread.
+    SQLITE_CHECKPOINT_INTERVAL = int(os.environ.get("SQLITE_CHECKPOINT_INTERVAL", "60"))
+    SQLITE_CHECKPOINT_MODE = os.environ.get("SQLITE_CHECKPOINT_MODE", "PASSIVE")
+
+    # bcrypt cost for new password hashes; older hashes are upgraded on login.
+    BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+    # Password hashing pool per process: hashes run in parallel, further
+    # requests allowed to wait, and the longest wait before answering 503.
+    PASSWORD_HASH_WORKERS = int(
+        os.environ.get("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4)))
+    )
+    PASSWORD_HASH_QUEUE_SIZE = int(
+        os.environ.get("PASSWORD_HASH_QUEUE_SIZE", str(PASSWORD_HASH_WORKERS))
+    )
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10"))
+
+    # Seconds a user id confirmed to exist is trusted without reading
+    # ``users``; 0 checks on every request.
+    AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "60"))
+
+    # Seconds before the in-memory fart-type catalog is reloaded; picks up
+    # types created by other workers.
+    FART_TYPE_CATALOG_TTL = int(os.environ.get("FART_TYPE_CATALOG_TTL", "300"))
+
+    # Records re-bucketed per transaction after a user changes time zone.
+    TIMEZONE_REBUCKET_BATCH_SIZE = int(
+        os.environ.get("TIMEZONE_REBUCKET_BATCH_SIZE", "1000")
+    )
+    # Seconds a re-bucketing job waits before its final pass, so records
+    # other workers bucketed with a cached old zone are caught. Must cover
+    # AUTH_USER_CACHE_TTL when running more than one process.
+    TIMEZONE_REBUCKET_SETTLE_SECONDS = float(
+        os.environ.get("TIMEZONE_REBUCKET_SETTLE_SECONDS", str(AUTH_USER_CACHE_TTL))
+    )
+
+    # Import modules only some endpoints need (startup.DEFERRED_IMPORTS) on
+    # first use instead of in create_app.
+    LAZY_IMPORTS = os.environ.get("LAZY_IMPORTS", "1") != "0"
+
+    # Per-route request and SQL metrics at GET /metrics.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+    # Bearer token a scrape of /metrics must send; unset leaves it open.
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+    # Directory the worker processes share their metrics through, so any
+    # worker's /metrics covers all of them; unset keeps them per process.
+    METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR") or None
+    # Statements running at least this many milliseconds are logged with
+    # their query plan (see slow_queries.py); 0 disables the log.
+    SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+
+    # Serve analytics from the daily_rollups table instead of raw records.
+    ANALYTICS_USE_ROLLUPS = True
+
+    # Analytics result cache: "memory" (per process), "redis" or "none".
+    ANALYTICS_CACHE_BACKEND = os.environ.get("ANALYTICS_CACHE_BACKEND", "memory")
+    ANALYTICS_CACHE_URL = os.environ.get(
+        "ANALYTICS_CACHE_URL", "redis://localhost:6379/0"
+    )
+    ANALYTICS_CACHE_TTL = int(os.environ.get("ANALYTICS_CACHE_TTL", "300"))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(
+        os.environ.get("ANALYTICS_CACHE_MAX_ENTRIES", "2048")
+    )
+    ANALYTICS_CACHE_MAX_BYTES = int(
+        os.environ.get("ANALYTICS_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+    )
+
 
 class TestingConfig(Config):
     TESTING = True
+    BCRYPT_ROUNDS = 4
+    # One process: no other worker can hold a stale zone.
+    TIMEZONE_REBUCKET_SETTLE_SECONDS = 0
+    SQLITE_CHECKPOINT_INTERVAL = 0
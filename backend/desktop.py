@@ -0,0 +1,53 @@
+"""Desktop entry point, frozen into ``backend.exe`` by ``build_exe.py``.
+
+The Electron shell (``electron/main.js``) starts it and polls
+``http://127.0.0.1:5000/api/health`` behind a splash screen, so everything
+before the server listens is waiting time for the user (see ``startup.py``).
+
+    python desktop.py
+    python desktop.py --profile-startup   # print where startup went, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+from startup import StartupProfiler
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print an import-time breakdown and phase timings, then exit",
+    )
+    args = parser.parse_args(argv)
+
+    profiler = StartupProfiler() if args.profile_startup else None
+    if profiler is not None:
+        profiler.start()
+
+    from app import create_app
+
+    if profiler is not None:
+        profiler.phase("imports")
+    app = create_app()
+    if profiler is not None:
+        profiler.phase("create_app")
+        app.test_client().get("/api/health").close()
+        profiler.phase("first request")
+        profiler.stop()
+        print(profiler.report())
+        return
+
+    app.run(
+        host=os.environ.get("HOST", "127.0.0.1"),
+        port=int(os.environ.get("PORT", "5000")),
+        threaded=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
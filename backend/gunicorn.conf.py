@@ -0,0 +1,123 @@
+"""Gunicorn settings for serving ``wsgi:app`` in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each setting below can be overridden from the environment. Running on
+SQLite:
+
+* The app is preloaded once in the master, so schema upgrades and seeding
+  run exactly once before any worker exists; workers are then forked from
+  it. ``pre_fork``/``post_fork`` keep SQLite connections and the WAL
+  checkpointer thread from crossing the fork.
+* A worker forked to replace a killed one resumes any time-zone re-bucketing
+  job left unfinished, so the job does not wait for a master restart.
+* Workers share ``/metrics`` through files in ``METRICS_MULTIPROC_DIR`` (a
+  fresh temporary directory unless set), emptied when the server starts;
+  ``child_exit`` keeps the counts of workers that exited.
+* SQLite serializes writes whatever the worker count. WAL lets readers run
+  during a write and ``SQLITE_BUSY_TIMEOUT_MS`` queues writers, so a few
+  processes with several threads each is enough; more workers mostly add
+  lock contention.
+
+``kill -HUP <master pid>`` replaces the workers gracefully: running requests
+get ``graceful_timeout`` seconds to finish. Preloaded workers are forked from
+the code the master loaded, so deploying new code needs a restart, or
+``GUNICORN_PRELOAD=0`` to have each new worker import it again.
+"""
+
+from __future__ import annotations
+
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+# One process per core runs Python in parallel; threads cover I/O waits.
+workers = _int("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4))
+worker_class = "gthread"
+threads = _int("GUNICORN_THREADS", 8)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+# Import everything before serving: preloaded workers share the modules and
+# no request pays for a first import.
+os.environ.setdefault("LAZY_IMPORTS", "0")
+timeout = _int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+# Recycle workers now and then to bound memory growth; jitter avoids all
+# workers restarting at once.
+max_requests = _int("GUNICORN_MAX_REQUESTS", 10000)
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+# Read by config.py, so it must be set before the app is imported.
+if not os.environ.get("METRICS_MULTIPROC_DIR"):
+    os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+        prefix="fart-steward-metrics-"
+    )
+
+
+def _preloaded_app():
+    module = sys.modules.get("wsgi")
+    return getattr(module, "app", None)
+
+
+def _shared_metrics():
+    app = _preloaded_app()
+    if app is None:
+        return None
+    from metrics import SharedMetrics
+
+    metrics = app.extensions.get("metrics")
+    return metrics if isinstance(metrics, SharedMetrics) else None
+
+
+def on_starting(server):
+    # Counters start again from zero with the server.
+    for path in glob.glob(os.path.join(os.environ["METRICS_MULTIPROC_DIR"], "*.json")):
+        os.remove(path)
+    if preload_app:
+        return
+    # Workers import the app concurrently; run the startup schema work once
+    # here first so they find nothing left to upgrade.
+    from app import create_app
+    from sqlite_profile import before_fork
+
+    before_fork(create_app())
+
+
+def pre_fork(server, worker):
+    app = _preloaded_app()
+    if app is not None:
+        from sqlite_profile import before_fork
+
+        before_fork(app)
+
+
+def post_fork(server, worker):
+    app = _preloaded_app()
+    if app is not None:
+        from sqlite_profile import after_fork
+        from timezones import resume_rebucketing
+
+        after_fork(app)
+        with app.app_context():
+            resume_rebucketing(inline=False)
+
+
+def worker_exit(server, worker):
+    metrics = _shared_metrics()
+    if metrics is not None:
+        metrics.flush()
+
+
+def child_exit(server, worker):
+    from metrics import collect_dead_worker
+
+    collect_dead_worker(os.environ["METRICS_MULTIPROC_DIR"], worker.pid)
@@ -0,0 +1,397 @@
+"""Request metrics in Prometheus text format at ``GET /metrics``.
+
+Per route (the URL rule, so ``/api/records/<int:record_id>`` is one series)
+and method:
+
+* request latency, response size, SQL statements per request and SQL time
+  per request as histograms;
+* requests by status code and unhandled exceptions as counters.
+
+A request is observed once its response is ready. A stream of unknown
+length (the CSV export) is observed when it is closed instead, so it is
+timed and its SQL counted to the last row, but it has no size to record.
+
+The endpoint sits outside ``/api/``, which is all the frontend's nginx
+proxies. When ``METRICS_TOKEN`` is set a scrape must also send it as a
+bearer token.
+
+Recording is a few dict lookups and one short lock per request plus two
+clock reads per SQL statement, cheap enough to leave on.
+
+With ``METRICS_MULTIPROC_DIR`` set (``gunicorn.conf.py`` sets it), each
+process also writes its numbers to ``<pid>.json`` in that directory about
+once a second, and a scrape, whichever worker serves it, adds up every
+file. When a worker exits the master folds its file into ``dead.json``
+(``collect_dead_worker``), so counters never go backwards across worker
+restarts.
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import current_app, got_request_exception, has_request_context, request
+from sqlalchemy import event
+
+from auth import error_response
+from models import db
+
+
+METRICS_PATH = "/metrics"
+PREFIX = "fart_steward"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+_STATS_KEY = "fart_steward.metrics"
+
+# Seconds between writes of a worker's numbers to the shared directory.
+FLUSH_INTERVAL = 1.0
+DEAD_WORKERS_FILE = "dead.json"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; made cumulative when rendered.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def merge(self, counts: list[int], total: float) -> None:
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += total
+
+    def samples(self, name: str, labels: str):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        total += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {total}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {total}"
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "size", "queries", "query_seconds", "exceptions")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_seconds = Histogram(QUERY_TIME_BUCKETS)
+        self.exceptions = 0
+
+    def histograms(self) -> dict[str, list]:
+        """``{attribute: [counts, sum]}`` for every histogram, copied."""
+        return {
+            attr: [list(getattr(self, attr).counts), getattr(self, attr).sum]
+            for attr, _suffix, _help in HISTOGRAMS
+        }
+
+
+class RequestStats:
+    """What one request has done so far; kept in ``request.environ``."""
+
+    __slots__ = ("start", "queries", "query_seconds", "exception")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.exception = False
+
+
+HISTOGRAMS = (
+    (
+        "latency",
+        "http_request_duration_seconds",
+        "Time from the start of the request until its response was ready.",
+    ),
+    ("size", "http_response_size_bytes", "Response body size, when known."),
+    ("queries", "db_queries_per_request", "SQL statements run by a request."),
+    (
+        "query_seconds",
+        "db_query_duration_seconds_per_request",
+        "Time a request spent running SQL statements.",
+    ),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Thread-safe per-route metrics for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[tuple[str, str], RouteMetrics] = {}
+        self._statuses: dict[tuple[str, str, int], int] = {}
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        size: int | None,
+        stats: RequestStats,
+    ) -> None:
+        seconds = time.perf_counter() - stats.start
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics()
+            metrics.latency.observe(seconds)
+            if size is not None:
+                metrics.size.observe(size)
+            metrics.queries.observe(stats.queries)
+            metrics.query_seconds.observe(stats.query_seconds)
+            if stats.exception:
+                metrics.exceptions += 1
+            key = (method, route, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        """Everything observed so far, as JSON-serializable data."""
+        with self._lock:
+            return {
+                "routes": [
+                    [method, route, metrics.histograms(), metrics.exceptions]
+                    for (method, route), metrics in self._routes.items()
+                ],
+                "statuses": [
+                    [method, route, status, count]
+                    for (method, route, status), count in self._statuses.items()
+                ],
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """Add the numbers of a ``snapshot`` to this one's."""
+        with self._lock:
+            for method, route, histograms, exceptions in snapshot["routes"]:
+                metrics = self._routes.get((method, route))
+                if metrics is None:
+                    metrics = self._routes[(method, route)] = RouteMetrics()
+                for attr, (counts, total) in histograms.items():
+                    getattr(metrics, attr).merge(counts, total)
+                metrics.exceptions += exceptions
+            for method, route, status, count in snapshot["statuses"]:
+                key = (method, route, status)
+                self._statuses[key] = self._statuses.get(key, 0) + count
+
+    def render(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            statuses = sorted(self._statuses.items())
+            lines = [
+                f"# HELP {PREFIX}_http_requests_total Requests by route and status.",
+                f"# TYPE {PREFIX}_http_requests_total counter",
+            ]
+            for (method, route, status), count in statuses:
+                lines.append(
+                    f'{PREFIX}_http_requests_total{{method="{method}",'
+                    f'route="{_escape(route)}",status="{status}"}} {count}'
+                )
+            name = f"{PREFIX}_http_request_exceptions_total"
+            lines += [
+                f"# HELP {name} Requests that raised an unhandled exception.",
+                f"# TYPE {name} counter",
+            ]
+            for (method, route), metrics in routes:
+                lines.append(
+                    f'{name}{{method="{method}",route="{_escape(route)}"}} '
+                    f"{metrics.exceptions}"
+                )
+            for attr, suffix, help_text in HISTOGRAMS:
+                name = f"{PREFIX}_{suffix}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), metrics in routes:
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    lines.extend(getattr(metrics, attr).samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def _directory_lock(directory: Path, exclusive: bool):
+    """Keeps a scrape from reading a dead worker's numbers twice."""
+    # Unix only, like gunicorn, the one user of a shared directory.
+    import fcntl
+
+    with open(directory / "lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class SharedMetrics(Metrics):
+    """``Metrics`` of every process sharing ``directory``."""
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._dirty = False
+        # pid the flusher thread runs in; a forked worker starts its own.
+        self._flusher_pid: int | None = None
+        self._flusher_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def observe(self, *args, **kwargs) -> None:
+        super().observe(*args, **kwargs)
+        self._dirty = True
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(
+                target=self._flush_periodically, name="metrics-flush", daemon=True
+            ).start()
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write this process's numbers to ``<pid>.json``."""
+        with self._flush_lock:
+            self._dirty = False
+            _write_json(self.directory / f"{os.getpid()}.json", self.snapshot())
+
+    def render(self) -> str:
+        self.flush()
+        combined = Metrics()
+        with _directory_lock(self.directory, exclusive=False):
+            for path in sorted(self.directory.glob("*.json")):
+                try:
+                    combined.merge(json.loads(path.read_text(encoding="utf-8")))
+                except FileNotFoundError:
+                    continue
+        return combined.render()
+
+
+def collect_dead_worker(directory: str, pid: int) -> None:
+    """Fold an exited worker's numbers into ``dead.json``; run in the master."""
+    path = Path(directory)
+    worker_file = path / f"{pid}.json"
+    if not worker_file.exists():
+        return
+    with _directory_lock(path, exclusive=True):
+        dead = Metrics()
+        for source in (path / DEAD_WORKERS_FILE, worker_file):
+            if source.exists():
+                dead.merge(json.loads(source.read_text(encoding="utf-8")))
+        _write_json(path / DEAD_WORKERS_FILE, dead.snapshot())
+        worker_file.unlink()
+
+
+def _current_stats() -> RequestStats | None:
+    if not has_request_context():
+        return None
+    return request.environ.get(_STATS_KEY)
+
+
+def init_metrics(app) -> None:
+    """Instrument requests and SQL; call after ``db.init_app``."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    directory = app.config.get("METRICS_MULTIPROC_DIR")
+    metrics = app.extensions["metrics"] = (
+        SharedMetrics(directory) if directory else Metrics()
+    )
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, params, context, many):
+        if _current_stats() is not None:
+            conn.info["metrics_query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, params, context, many):
+        stats = _current_stats()
+        start = conn.info.pop("metrics_query_start", None)
+        if stats is not None and start is not None:
+            stats.queries += 1
+            stats.query_seconds += time.perf_counter() - start
+
+    @app.before_request
+    def _start_request():
+        request.environ[_STATS_KEY] = RequestStats()
+
+    def _record_exception(sender, exception, **extra):
+        stats = _current_stats()
+        if stats is not None:
+            stats.exception = True
+
+    got_request_exception.connect(_record_exception, app, weak=False)
+
+    @app.after_request
+    def _observe_on_close(response):
+        stats = request.environ.get(_STATS_KEY)
+        rule = request.url_rule
+        route = rule.rule if rule is not None else "unmatched"
+        if stats is None or route == METRICS_PATH:
+            return response
+        method = request.method
+        status = response.status_code
+        if response.is_streamed and response.content_length is None:
+            response.call_on_close(
+                lambda: metrics.observe(method, route, status, None, stats)
+            )
+        else:
+            metrics.observe(method, route, status, response.content_length, stats)
+        return response
+
+    token = app.config.get("METRICS_TOKEN")
+
+    @app.get(METRICS_PATH)
+    def metrics_endpoint():
+        if token and not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return error_response("Unauthorized", "UNAUTHORIZED", 401)
+        return current_app.response_class(
+            metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    _ = (
+        _before_cursor_execute,
+        _after_cursor_execute,
+        _start_request,
+        _observe_on_close,
+        metrics_endpoint,
+    )
@@ -0,0 +1,444 @@
+"""Versioned schema migrations.
+
+``schema_version`` records every migration applied to the database, one
+row per version. At startup ``migrate`` compares the highest recorded
+version with ``LATEST_VERSION``: when they match (every start after the
+first) that is the only work done, two small reads.
+
+Otherwise the pending migrations run in order on one connection inside a
+single ``BEGIN IMMEDIATE`` transaction. That takes SQLite's write lock, so
+when several workers start at once one of them migrates while the others
+wait (up to ``SQLITE_BUSY_TIMEOUT_MS``), then find the version current and
+skip. SQLite DDL is transactional: a migration that fails leaves the
+database at its previous version.
+
+Databases created before versioning start at version 0, so each early
+migration checks whether its change is already there before making it.
+To change the schema, append a migration with the next version; never
+edit or reorder the ones that have shipped. A migration returns ``True``
+if the file should be vacuumed afterwards (``VACUUM`` cannot run in a
+transaction).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Callable
+
+from models import (
+    DURATION_CODES,
+    MOISTURE_CODES,
+    SMELL_LEVEL_CODES,
+    TEMPERATURE_CODES,
+)
+
+
+logger = logging.getLogger(__name__)
+
+PRESET_FART_TYPES = ["响屁", "闷屁", "连环屁", "无声屁", "喷射屁"]
+
+TIME_BUCKET_FORMATS = {"day": "%Y%m%d", "week": "%Y%W", "hour": "%H", "dow": "%w"}
+
+# The DDL below is written out rather than generated from ``models`` so a
+# shipped migration keeps doing what it did when the models change.
+
+_FART_RECORDS_TABLE = """
+CREATE TABLE fart_records (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    duration SMALLINT NOT NULL,
+    type_id INTEGER NOT NULL,
+    smell_level SMALLINT NOT NULL,
+    temperature SMALLINT NOT NULL,
+    moisture SMALLINT NOT NULL,
+    notes TEXT,
+    created_at TEXT DEFAULT (datetime('now')),
+    day INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    hour SMALLINT NOT NULL,
+    dow SMALLINT NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT ck_fart_records_duration CHECK (duration IN (1,2,3,4)),
+    CONSTRAINT ck_fart_records_smell_level CHECK (smell_level IN (1,2,3,4)),
+    CONSTRAINT ck_fart_records_temperature CHECK (temperature IN (1,2)),
+    CONSTRAINT ck_fart_records_moisture CHECK (moisture IN (1,2)),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY(type_id) REFERENCES fart_types (id)
+)
+"""
+
+_FART_RECORDS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_records_user_ts"
+    " ON fart_records (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_records_user_buckets"
+    " ON fart_records (user_id, timestamp, day, week, hour, dow)",
+)
+
+# Every table as of version 1, with its indexes.
+_INITIAL_TABLES = {
+    "fart_types": (
+        """
+CREATE TABLE fart_types (
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    is_preset BOOLEAN DEFAULT 0 NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (name)
+)
+""",
+    ),
+    "users": (
+        """
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    timezone TEXT DEFAULT 'UTC' NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    UNIQUE (username)
+)
+""",
+    ),
+    "daily_rollups": (
+        """
+CREATE TABLE daily_rollups (
+    user_id INTEGER NOT NULL,
+    dimension TEXT NOT NULL,
+    day TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (user_id, dimension, day, bucket),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+)
+""",
+    ),
+    "fart_records": (_FART_RECORDS_TABLE, *_FART_RECORDS_INDEXES),
+    "user_data_versions": (
+        """
+CREATE TABLE user_data_versions (
+    user_id INTEGER NOT NULL,
+    version INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (user_id),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+)
+""",
+    ),
+}
+
+# ``records_fts`` and its triggers as of version 8.
+_RECORDS_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5("
+    "notes, content='fart_records', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON fart_records"
+    " BEGIN"
+    " INSERT INTO records_fts (rowid, notes) VALUES (new.id, new.notes);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON fart_records"
+    " BEGIN"
+    " INSERT INTO records_fts (records_fts, rowid, notes)"
+    " VALUES ('delete', old.id, old.notes);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS records_fts_update"
+    " AFTER UPDATE OF notes ON fart_records"
+    " BEGIN"
+    " INSERT INTO records_fts (records_fts, rowid, notes)"
+    " VALUES ('delete', old.id, old.notes);"
+    " INSERT INTO records_fts (rowid, notes) VALUES (new.id, new.notes);"
+    " END",
+    "INSERT INTO records_fts (records_fts) VALUES ('rebuild')",
+)
+
+_RECORD_TOMBSTONES_TABLE = """
+CREATE TABLE IF NOT EXISTS record_tombstones (
+    user_id INTEGER NOT NULL,
+    change_seq INTEGER NOT NULL,
+    record_id INTEGER NOT NULL,
+    deleted_at INTEGER NOT NULL,
+    PRIMARY KEY (user_id, change_seq),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+)
+"""
+
+
+def _columns(connection, table: str) -> dict[str, str]:
+    return {
+        row[1]: row[2].upper()
+        for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")
+    }
+
+
+def _code_case(column: str, codes: dict) -> str:
+    whens = " ".join(f"WHEN '{name}' THEN {code}" for name, code in codes.items())
+    return f"CASE {column} {whens} END"
+
+
+def _name_case(column: str, codes: dict) -> str:
+    whens = " ".join(f"WHEN {code} THEN '{name}'" for name, code in codes.items())
+    return f"CASE {column} {whens} END"
+
+
+def _bucket_expressions(timestamp: str) -> dict[str, str]:
+    """SQL computing each bucket column from ``timestamp`` (any strftime input)."""
+    return {
+        name: f"CAST(strftime('{fmt}', {timestamp}) AS INTEGER)"
+        for name, fmt in TIME_BUCKET_FORMATS.items()
+    }
+
+
+def _create_tables(connection) -> None:
+    """Create the tables missing from the database (all of them when new)."""
+    existing = set(
+        connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).scalars()
+    )
+    for name, statements in _INITIAL_TABLES.items():
+        if name not in existing:
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+
+
+def _compact_fart_records(connection) -> bool:
+    """Convert a pre-existing TEXT ``fart_records`` table to the compact schema.
+
+    Timestamps become epoch seconds and enums their integer codes. The table
+    is rebuilt, as SQLite cannot change column types.
+    """
+    if _columns(connection, "fart_records").get("timestamp") != "TEXT":
+        return False
+
+    statements = [
+        "ALTER TABLE fart_records RENAME TO fart_records_legacy",
+        "DROP INDEX IF EXISTS idx_records_user_ts",
+        "DROP INDEX IF EXISTS idx_records_user_buckets",
+        _FART_RECORDS_TABLE,
+        *_FART_RECORDS_INDEXES,
+        "INSERT INTO fart_records (id, user_id, timestamp, day, week, hour, dow,"
+        " duration, type_id, smell_level, temperature, moisture, notes, created_at)"
+        " SELECT id, user_id, CAST(strftime('%s', timestamp) AS INTEGER),"
+        f" {', '.join(_bucket_expressions('timestamp').values())},"
+        f" {_code_case('duration', DURATION_CODES)}, type_id,"
+        f" {_code_case('smell_level', SMELL_LEVEL_CODES)},"
+        f" {_code_case('temperature', TEMPERATURE_CODES)},"
+        f" {_code_case('moisture', MOISTURE_CODES)},"
+        " notes, created_at FROM fart_records_legacy",
+        "DROP TABLE fart_records_legacy",
+    ]
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    return True
+
+
+def _add_time_bucket_columns(connection) -> None:
+    """Add and backfill the ``day``/``week``/``hour``/``dow`` bucket columns."""
+    if "day" in _columns(connection, "fart_records"):
+        return
+
+    types = {"day": "INTEGER", "week": "INTEGER", "hour": "SMALLINT", "dow": "SMALLINT"}
+    for name, type_ in types.items():
+        connection.exec_driver_sql(
+            f"ALTER TABLE fart_records ADD COLUMN {name} {type_} NOT NULL DEFAULT 0"
+        )
+    assignments = ", ".join(
+        f"{name} = {expression}"
+        for name, expression in _bucket_expressions("timestamp, 'unixepoch'").items()
+    )
+    connection.exec_driver_sql(f"UPDATE fart_records SET {assignments}")
+    for statement in _FART_RECORDS_INDEXES:
+        connection.exec_driver_sql(statement)
+
+
+def _add_user_timezone_column(connection) -> None:
+    if "timezone" in _columns(connection, "users"):
+        return
+    connection.exec_driver_sql(
+        "ALTER TABLE users ADD COLUMN timezone TEXT NOT NULL DEFAULT 'UTC'"
+    )
+
+
+def _seed_preset_fart_types(connection) -> None:
+    for name in PRESET_FART_TYPES:
+        connection.exec_driver_sql(
+            "INSERT INTO fart_types (name, is_preset) VALUES (?, 1)"
+            " ON CONFLICT (name) DO NOTHING",
+            (name,),
+        )
+
+
+def _build_daily_rollups(connection) -> None:
+    """Fill ``daily_rollups`` from the records if it was never populated."""
+    has_rollups = connection.exec_driver_sql(
+        "SELECT 1 FROM daily_rollups LIMIT 1"
+    ).first()
+    has_records = connection.exec_driver_sql(
+        "SELECT 1 FROM fart_records LIMIT 1"
+    ).first()
+    if has_rollups is not None or has_records is None:
+        return
+
+    day = "printf('%04d-%02d-%02d', day / 10000, day / 100 % 100, day % 100)"
+    buckets = {
+        "total": "''",
+        "type": "CAST(type_id AS TEXT)",
+        "smell": _name_case("smell_level", SMELL_LEVEL_CODES),
+        "duration": _name_case("duration", DURATION_CODES),
+        "temperature": _name_case("temperature", TEMPERATURE_CODES),
+        "moisture": _name_case("moisture", MOISTURE_CODES),
+        "hour": "printf('%02d', hour)",
+    }
+    for dimension, bucket in buckets.items():
+        connection.exec_driver_sql(
+            "INSERT INTO daily_rollups (user_id, dimension, day, bucket, count)"
+            f" SELECT user_id, '{dimension}', {day}, {bucket}, count(*)"
+            f" FROM fart_records GROUP BY user_id, {day}, {bucket}"
+        )
+
+
+def number_untracked_records(connection) -> None:
+    """Give records written with ``change_seq = 0`` a place in the change feed.
+
+    Each gets the next of its owner's sequence numbers, in id order, and an
+    ``updated_at`` from ``created_at``. Used here for existing data and by
+    bulk loaders that insert rows directly.
+    """
+    connection.exec_driver_sql(
+        "UPDATE fart_records SET change_seq = numbered.seq,"
+        " updated_at = coalesce(fart_records.updated_at,"
+        " CAST(strftime('%s', fart_records.created_at) AS INTEGER),"
+        " fart_records.timestamp)"
+        " FROM (SELECT r.id, coalesce(v.version, 0)"
+        " + row_number() OVER (PARTITION BY r.user_id ORDER BY r.id) AS seq"
+        " FROM fart_records AS r"
+        " LEFT JOIN user_data_versions AS v ON v.user_id = r.user_id"
+        " WHERE r.change_seq = 0) AS numbered"
+        " WHERE fart_records.id = numbered.id"
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO user_data_versions (user_id, version)"
+        " SELECT user_id, max(change_seq) FROM fart_records"
+        " WHERE change_seq > 0 GROUP BY user_id"
+        " ON CONFLICT (user_id) DO UPDATE"
+        " SET version = max(version, excluded.version)"
+    )
+
+
+def _add_record_change_feed(connection) -> None:
+    """Add the change feed columns, index and tombstones; number old records."""
+    columns = _columns(connection, "fart_records")
+    if "change_seq" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE fart_records ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"
+        )
+    if "updated_at" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE fart_records ADD COLUMN updated_at INTEGER"
+        )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_records_user_change"
+        " ON fart_records (user_id, change_seq)"
+    )
+    connection.exec_driver_sql(_RECORD_TOMBSTONES_TABLE)
+    number_untracked_records(connection)
+
+
+def _create_records_search_index(connection) -> None:
+    for statement in _RECORDS_FTS_SCHEMA:
+        connection.exec_driver_sql(statement)
+
+
+def _add_user_bucket_timezone_column(connection) -> None:
+    """Track the zone buckets were computed in; existing ones are current."""
+    if "bucket_timezone" in _columns(connection, "users"):
+        return
+    connection.exec_driver_sql(
+        "ALTER TABLE users ADD COLUMN bucket_timezone TEXT NOT NULL DEFAULT 'UTC'"
+    )
+    connection.exec_driver_sql("UPDATE users SET bucket_timezone = timezone")
+
+
+def _merge_records_timestamp_indexes(connection) -> None:
+    """Fold ``idx_records_user_ts`` into ``idx_records_user_buckets``.
+
+    The bucket index already starts with ``(user_id, timestamp)``; with ``id``
+    after ``timestamp`` it also gives the record list its order without a sort.
+    """
+    for statement in (
+        "DROP INDEX IF EXISTS idx_records_user_ts",
+        "DROP INDEX IF EXISTS idx_records_user_buckets",
+        "CREATE INDEX idx_records_user_buckets"
+        " ON fart_records (user_id, timestamp, id, day, week, hour, dow)",
+    ):
+        connection.exec_driver_sql(statement)
+
+
+MIGRATIONS: list[tuple[int, str, Callable]] = [
+    (1, "create_tables", _create_tables),
+    (2, "compact_fart_records", _compact_fart_records),
+    (3, "time_bucket_columns", _add_time_bucket_columns),
+    (4, "user_timezone_column", _add_user_timezone_column),
+    (5, "seed_preset_fart_types", _seed_preset_fart_types),
+    (6, "build_daily_rollups", _build_daily_rollups),
+    (7, "record_change_feed", _add_record_change_feed),
+    (8, "records_search_index", _create_records_search_index),
+    (9, "user_bucket_timezone_column", _add_user_bucket_timezone_column),
+    (10, "merge_records_timestamp_indexes", _merge_records_timestamp_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+)
+"""
+
+
+def current_version(connection) -> int:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).first()
+    if exists is None:
+        return 0
+    return (
+        connection.exec_driver_sql("SELECT max(version) FROM schema_version").scalar()
+        or 0
+    )
+
+
+def migrate(engine) -> list[int]:
+    """Apply pending migrations under SQLite's write lock; returns their versions."""
+    with engine.connect() as connection:
+        # Transactions are issued by hand so the whole run, DDL included,
+        # is one BEGIN IMMEDIATE ... COMMIT.
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+        if current_version(connection) >= LATEST_VERSION:
+            return []
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        applied = []
+        vacuum = False
+        try:
+            connection.exec_driver_sql(_VERSION_TABLE)
+            version = current_version(connection)
+            for number, name, step in MIGRATIONS:
+                if number <= version:
+                    continue
+                logger.info("Applying schema migration %d (%s)", number, name)
+                if step(connection):
+                    vacuum = True
+                connection.exec_driver_sql(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (number, name),
+                )
+                applied.append(number)
+            connection.exec_driver_sql("COMMIT")
+        except BaseException:
+            if connection.connection.driver_connection.in_transaction:
+                connection.exec_driver_sql("ROLLBACK")
+            raise
+        if vacuum:
+            connection.exec_driver_sql("VACUUM")
+    return applied
@@ -1,22 +1,141 @@
-from sqlalchemy import CheckConstraint, Index, ForeignKey, text
+import calendar
+from datetime import date, datetime, time, timezone, tzinfo
+from typing import ClassVar
+
+from sqlalchemy import CheckConstraint, Index, ForeignKey, Table, text
+from sqlalchemy.types import Integer, SmallInteger, TypeDecorator
 
 from flask_sqlalchemy import SQLAlchemy
 
 
 db = SQLAlchemy()
 
+# Stored codes for the record enums. Append new values; never renumber.
+DURATION_CODES = {"very_short": 1, "short": 2, "medium": 3, "long": 4}
+SMELL_LEVEL_CODES = {"mild": 1, "tolerable": 2, "stinky": 3, "extremely_stinky": 4}
+TEMPERATURE_CODES = {"hot": 1, "cold": 2}
+MOISTURE_CODES = {"moist": 1, "dry": 2}
+
+
+def parse_timestamp(value: str) -> int:
+    """Epoch seconds for an ISO 8601 timestamp; naive values are UTC."""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return calendar.timegm(dt.utctimetuple())
+
+
+def format_utc(dt: datetime) -> str:
+    """``YYYY-MM-DDTHH:MM:SSZ`` in UTC, the API's timestamp format.
+
+    The year is padded by hand: ``strftime("%Y")`` gives ``1`` for year 1.
+    """
+    dt = dt.astimezone(timezone.utc)
+    return f"{dt.year:04d}-{dt:%m-%dT%H:%M:%S}Z"
+
+
+def format_timestamp(epoch: int) -> str:
+    return format_utc(datetime.fromtimestamp(epoch, timezone.utc))
+
+
+def time_buckets(epoch: int, tz: tzinfo = timezone.utc) -> dict[str, int]:
+    """Bucket columns for a timestamp in ``tz``, matching SQLite's ``strftime``.
+
+    ``day`` is YYYYMMDD, ``week`` is YYYYWW as ``strftime('%Y%W')``
+    (Monday-based week of the year), ``dow`` is 0 for Sunday.
+    """
+    dt = datetime.fromtimestamp(epoch, tz)
+    return {
+        "day": dt.year * 10000 + dt.month * 100 + dt.day,
+        "week": dt.year * 100 + int(dt.strftime("%W")),
+        "hour": dt.hour,
+        "dow": dt.isoweekday() % 7,
+    }
+
+
+def local_day_start(day: date, tz: tzinfo = timezone.utc) -> int:
+    """Epoch seconds of the first instant of ``day`` in ``tz``."""
+    return EpochTimestamp.to_epoch(datetime.combine(day, time.min, tzinfo=tz))
+
+
+def format_day(day: int) -> str:
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def format_week(week: int) -> str:
+    return f"{week // 100:04d}-{week % 100:02d}"
+
+
+class EpochTimestamp(TypeDecorator):
+    """UTC ISO string in Python, integer epoch seconds in the database."""
+
+    impl = Integer
+    cache_ok = True
+
+    @staticmethod
+    def to_epoch(value) -> int:
+        if isinstance(value, int):
+            return value
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return calendar.timegm(value.utctimetuple())
+        return parse_timestamp(value)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.to_epoch(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else format_timestamp(value)
+
+
+class EnumCode(TypeDecorator):
+    """Enum name in Python, small integer code in the database."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, codes: dict):
+        super().__init__()
+        # Hashable, so the type can be part of SQLAlchemy's statement cache key.
+        self.codes = tuple(sorted(codes.items()))
+        self._by_name = dict(self.codes)
+        self._by_code = {code: name for name, code in self.codes}
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self._by_name[value]
+        except KeyError:
+            raise ValueError(f"Unknown enum value: {value!r}") from None
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._by_code[value]
+
+
+def _codes_check(column: str, codes: dict) -> str:
+    return f"{column} IN ({','.join(str(code) for code in sorted(codes.values()))})"
+
 
 class User(db.Model):
     __tablename__ = "users"
+    __table__: ClassVar[Table]
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     username = db.Column(db.Text, unique=True, nullable=False)
     password_hash = db.Column(db.Text, nullable=False)
+    # IANA zone the user's record time buckets are computed in.
+    timezone = db.Column(db.Text, server_default=text("'UTC'"), nullable=False)
+    # Zone the buckets were last fully computed in; differs from ``timezone``
+    # while a re-bucketing job is pending (see ``timezones.py``).
+    bucket_timezone = db.Column(db.Text, server_default=text("'UTC'"), nullable=False)
     created_at = db.Column(db.TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
 
 
 class FartType(db.Model):
     __tablename__ = "fart_types"
+    __table__: ClassVar[Table]
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.Text, unique=True, nullable=False)
@@ -25,6 +144,8 @@ class FartType(db.Model):
 
 class FartRecord(db.Model):
     __tablename__ = "fart_records"
+    # Set by the declarative mapping; declared so type checkers know it.
+    __table__: ClassVar[Table]
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(
@@ -32,33 +153,106 @@ class FartRecord(db.Model):
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
     )
-    timestamp = db.Column(db.Text, nullable=False)
-    duration = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(EpochTimestamp, nullable=False)
+    duration = db.Column(EnumCode(DURATION_CODES), nullable=False)
     type_id = db.Column(db.Integer, ForeignKey("fart_types.id"), nullable=False)
-    smell_level = db.Column(db.Text, nullable=False)
-    temperature = db.Column(db.Text, nullable=False)
-    moisture = db.Column(db.Text, nullable=False)
+    smell_level = db.Column(EnumCode(SMELL_LEVEL_CODES), nullable=False)
+    temperature = db.Column(EnumCode(TEMPERATURE_CODES), nullable=False)
+    moisture = db.Column(EnumCode(MOISTURE_CODES), nullable=False)
     notes = db.Column(db.Text)
     created_at = db.Column(db.Text, server_default=text("(datetime('now'))"))
+    # Local to the owner's time zone and maintained with ``timestamp`` (see
+    # ``set_timestamp``) so analytics group on indexed integers instead of
+    # converting every timestamp.
+    day = db.Column(db.Integer, nullable=False)
+    week = db.Column(db.Integer, nullable=False)
+    hour = db.Column(db.SmallInteger, nullable=False)
+    dow = db.Column(db.SmallInteger, nullable=False)
+    # Position in the owner's change feed (GET /api/records/changes), taken
+    # from ``user_data_versions`` on every write; 0 until numbered.
+    change_seq = db.Column(db.Integer, nullable=False, server_default=text("0"))
+    updated_at = db.Column(EpochTimestamp)
 
     fart_type = db.relationship("FartType", backref="records")
 
+    def set_timestamp(self, value, tz: tzinfo = timezone.utc) -> None:
+        """Set ``timestamp`` and its time buckets in the owner's zone ``tz``."""
+        self.timestamp = value
+        for name, bucket in time_buckets(EpochTimestamp.to_epoch(value), tz).items():
+            setattr(self, name, bucket)
+
     __table_args__ = (
         CheckConstraint(
-            "duration IN ('very_short','short','medium','long')",
+            _codes_check("duration", DURATION_CODES),
             name="ck_fart_records_duration",
         ),
         CheckConstraint(
-            "smell_level IN ('mild','tolerable','stinky','extremely_stinky')",
+            _codes_check("smell_level", SMELL_LEVEL_CODES),
             name="ck_fart_records_smell_level",
         ),
         CheckConstraint(
-            "temperature IN ('hot','cold')",
+            _codes_check("temperature", TEMPERATURE_CODES),
             name="ck_fart_records_temperature",
         ),
         CheckConstraint(
-            "moisture IN ('moist','dry')",
+            _codes_check("moisture", MOISTURE_CODES),
             name="ck_fart_records_moisture",
         ),
-        Index("idx_records_user_ts", "user_id", "timestamp"),
+        # Covers the analytics range scans and GROUP BYs without table lookups.
+        # ``id`` follows ``timestamp`` so the record list's (timestamp, id)
+        # order and cursor seeks need no sort either.
+        Index(
+            "idx_records_user_buckets",
+            "user_id",
+            "timestamp",
+            "id",
+            "day",
+            "week",
+            "hour",
+            "dow",
+        ),
+        Index("idx_records_user_change", "user_id", "change_seq"),
+    )
+
+
+class DailyRollup(db.Model):
+    __tablename__ = "daily_rollups"
+    __table__: ClassVar[Table]
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    dimension = db.Column(db.Text, primary_key=True)
+    day = db.Column(db.Text, primary_key=True)
+    bucket = db.Column(db.Text, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, server_default=text("0"))
+
+
+class UserDataVersion(db.Model):
+    __tablename__ = "user_data_versions"
+    __table__: ClassVar[Table]
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    version = db.Column(db.Integer, nullable=False, server_default=text("0"))
+
+
+class RecordTombstone(db.Model):
+    """A deleted record, kept so the change feed can report the deletion."""
+
+    __tablename__ = "record_tombstones"
+    __table__: ClassVar[Table]
+
+    user_id = db.Column(
+        db.Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
     )
+    change_seq = db.Column(db.Integer, primary_key=True)
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(EpochTimestamp, nullable=False)
@@ -0,0 +1,308 @@
+"""Per-user daily rollups of fart records.
+
+``daily_rollups`` holds one counter per ``(user_id, dimension, day, bucket)``,
+e.g. ``(1, "smell", "2026-02-15", "stinky") -> 3``. The ``total`` dimension
+has a single row per day, so a year of daily counts reads about 365 rows no
+matter how many events were logged.
+
+Rollups are adjusted in the same session (and therefore the same commit) as
+the record writes in ``routes/records.py``. ``flask rebuild-rollups`` recomputes
+them from ``fart_records`` to backfill or repair.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Iterable, Mapping
+
+import click
+from sqlalchemy import Text, bindparam, case, cast, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (
+    DURATION_CODES,
+    MOISTURE_CODES,
+    SMELL_LEVEL_CODES,
+    TEMPERATURE_CODES,
+    DailyRollup,
+    FartRecord,
+    db,
+    format_day,
+    local_day_start,
+    parse_timestamp,
+)
+
+
+ROLLUP_FIELDS = (
+    "timestamp",
+    "day",
+    "hour",
+    "type_id",
+    "smell_level",
+    "duration",
+    "temperature",
+    "moisture",
+)
+
+RollupKey = tuple[str, str, str]
+
+# 0001-01-01T00:00:00Z, the earliest timestamp the API accepts.
+MIN_EPOCH = local_day_start(date.min)
+
+
+def snapshot(record: FartRecord) -> dict[str, Any]:
+    """The record fields the rollups depend on, captured before a change."""
+    return {field: getattr(record, field) for field in ROLLUP_FIELDS}
+
+
+def record_keys(record: Mapping[str, Any]) -> list[RollupKey]:
+    day = format_day(record["day"])
+    return [
+        ("total", day, ""),
+        ("type", day, str(record["type_id"])),
+        ("smell", day, record["smell_level"]),
+        ("duration", day, record["duration"]),
+        ("temperature", day, record["temperature"]),
+        ("moisture", day, record["moisture"]),
+        ("hour", day, f"{record['hour']:02d}"),
+    ]
+
+
+def apply_changes(
+    user_id: int,
+    added: Iterable[Mapping[str, Any]] = (),
+    removed: Iterable[Mapping[str, Any]] = (),
+) -> None:
+    """Adjust the user's rollups inside the current transaction.
+
+    The caller commits; nothing here flushes a separate transaction.
+    """
+    deltas: Counter[RollupKey] = Counter()
+    for record in added:
+        deltas.update(record_keys(record))
+    for record in removed:
+        deltas.subtract(record_keys(record))
+
+    changed = [(key, delta) for key, delta in deltas.items() if delta]
+    if not changed:
+        return
+
+    table = DailyRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "dimension", "day", "bucket"],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    db.session.execute(
+        stmt,
+        [
+            {
+                "user_id": user_id,
+                "dimension": dimension,
+                "day": day,
+                "bucket": bucket,
+                "count": delta,
+            }
+            for (dimension, day, bucket), delta in changed
+        ],
+    )
+
+    emptied = [
+        {"user_id": user_id, "dimension": dimension, "day": day, "bucket": bucket}
+        for (dimension, day, bucket), delta in changed
+        if delta < 0
+    ]
+    if emptied:
+        db.session.execute(
+            table.delete().where(
+                table.c.user_id == bindparam("user_id"),
+                table.c.dimension == bindparam("dimension"),
+                table.c.day == bindparam("day"),
+                table.c.bucket == bindparam("bucket"),
+                table.c.count <= 0,
+            ),
+            emptied,
+        )
+
+
+def load_counts(
+    user_id: int,
+    dimension: str,
+    lo: str | None = None,
+    hi: str | None = None,
+    tz: tzinfo = timezone.utc,
+) -> Counter[tuple[str, str]]:
+    """Counts per ``(day, bucket)`` for records with ``lo <= timestamp <= hi``.
+
+    ``lo``/``hi`` are normalized UTC timestamps and ``tz`` is the zone the
+    user's rollup days are local to. Whole days inside the range come from
+    the rollup table; a partially covered first or last day is counted from
+    its raw records so the result matches a raw scan exactly.
+    """
+    counts: Counter[tuple[str, str]] = Counter()
+    lo_epoch = None if lo is None else parse_timestamp(lo)
+    hi_epoch = None if hi is None else parse_timestamp(hi)
+    if lo_epoch is not None and hi_epoch is not None and lo_epoch > hi_epoch:
+        return counts
+
+    one_day = timedelta(days=1)
+    lo_day = hi_day = full_from = full_to = None
+    # Set when an edge day at the end of the calendar leaves no whole day.
+    no_full_days = False
+    if lo_epoch is not None:
+        lo_day = _local_date(lo_epoch, tz)
+        if lo_day is None:
+            if lo_epoch > 0:
+                return counts  # after the last local day: nothing can match
+            lo_epoch = None  # before the first local day: no lower bound
+        elif lo_epoch <= _day_start(lo_day, tz):
+            full_from = lo_day
+        elif lo_day < date.max:
+            full_from = lo_day + one_day
+        else:
+            no_full_days = True
+    if hi_epoch is not None:
+        hi_day = _local_date(hi_epoch, tz)
+        if hi_day is None:
+            if hi_epoch < 0:
+                return counts  # before the first local day: nothing can match
+            hi_epoch = None  # after the last local day: no upper bound
+        elif hi_day < date.max and hi_epoch + 1 >= local_day_start(
+            hi_day + one_day, tz
+        ):
+            full_to = hi_day
+        elif hi_day > date.min:
+            # Partly covered, or the calendar's last day, whose end is not
+            # representable: count it from raw records.
+            full_to = hi_day - one_day
+        else:
+            no_full_days = True
+
+    # (start, end, end_inclusive) epochs for partially covered edge days.
+    raw_ranges: list[tuple[int | None, int | None, bool]] = []
+    if no_full_days or (
+        full_from is not None and full_to is not None and full_from > full_to
+    ):
+        raw_ranges.append((lo_epoch, hi_epoch, True))
+    else:
+        if full_from is not None and full_from != lo_day:
+            raw_ranges.append((lo_epoch, local_day_start(full_from, tz), False))
+        if full_to is not None and hi_day is not None and full_to != hi_day:
+            raw_ranges.append((_day_start(hi_day, tz), hi_epoch, True))
+
+        q = db.session.query(
+            DailyRollup.day, DailyRollup.bucket, DailyRollup.count
+        ).filter(
+            DailyRollup.user_id == user_id,
+            DailyRollup.dimension == dimension,
+        )
+        if full_from is not None:
+            q = q.filter(DailyRollup.day >= full_from.isoformat())
+        if full_to is not None:
+            q = q.filter(DailyRollup.day <= full_to.isoformat())
+        for day, bucket, count in q:
+            counts[(day, bucket)] += count
+
+    for start, end, end_inclusive in raw_ranges:
+        q = db.session.query(
+            *(getattr(FartRecord, field) for field in ROLLUP_FIELDS)
+        ).filter(FartRecord.user_id == user_id)
+        if start is not None:
+            q = q.filter(FartRecord.timestamp >= start)
+        if end is not None:
+            if end_inclusive:
+                q = q.filter(FartRecord.timestamp <= end)
+            else:
+                q = q.filter(FartRecord.timestamp < end)
+        for row in q:
+            record: dict[str, Any] = dict(zip(ROLLUP_FIELDS, row))
+            for dim, day, bucket in record_keys(record):
+                if dim == dimension:
+                    counts[(day, bucket)] += 1
+
+    return counts
+
+
+def _local_date(epoch: int, tz: tzinfo) -> date | None:
+    """The day ``epoch`` falls on in ``tz``; ``None`` outside years 1-9999."""
+    try:
+        return datetime.fromtimestamp(epoch, tz).date()
+    except (OverflowError, ValueError, OSError):
+        return None
+
+
+def _day_start(day: date, tz: tzinfo) -> int:
+    """``local_day_start``, or the earliest instant if that is before year 1."""
+    try:
+        return local_day_start(day, tz)
+    except OverflowError:
+        return MIN_EPOCH
+
+
+def _enum_name(column, codes: Mapping[str, int]):
+    """SQL expression decoding a stored enum code back to its name."""
+    return case({code: name for name, code in codes.items()}, value=column)
+
+
+def _rollup_sources():
+    """``(dimension, bucket expression)`` pairs mirroring ``record_keys``."""
+    return [
+        ("total", literal("")),
+        ("type", cast(FartRecord.type_id, Text)),
+        ("smell", _enum_name(FartRecord.smell_level, SMELL_LEVEL_CODES)),
+        ("duration", _enum_name(FartRecord.duration, DURATION_CODES)),
+        ("temperature", _enum_name(FartRecord.temperature, TEMPERATURE_CODES)),
+        ("moisture", _enum_name(FartRecord.moisture, MOISTURE_CODES)),
+        ("hour", func.printf("%02d", FartRecord.hour)),
+    ]
+
+
+def rebuild(user_id: int | None = None, connection=None) -> None:
+    """Recompute rollups from ``fart_records`` with set-based SQL and commit.
+
+    Given a ``connection``, runs in its transaction and leaves committing
+    to the caller.
+    """
+    execute = db.session.execute if connection is None else connection.execute
+    table = DailyRollup.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    execute(delete)
+
+    day = func.printf(
+        "%04d-%02d-%02d",
+        FartRecord.day / 10000,
+        FartRecord.day / 100 % 100,
+        FartRecord.day % 100,
+    )
+    for dimension, bucket in _rollup_sources():
+        source = select(
+            FartRecord.user_id,
+            literal(dimension),
+            day,
+            bucket,
+            func.count(),
+        ).group_by(FartRecord.user_id, day, bucket)
+        if user_id is not None:
+            source = source.where(FartRecord.user_id == user_id)
+        execute(
+            table.insert().from_select(
+                ["user_id", "dimension", "day", "bucket", "count"], source
+            )
+        )
+
+    if connection is None:
+        db.session.commit()
+
+
+def init_rollups(app) -> None:
+    @app.cli.command("rebuild-rollups")
+    @click.option("--user-id", type=int, default=None, help="Only this user.")
+    def _rebuild_rollups_command(user_id: int | None):
+        """Recompute the daily analytics rollups from fart_records."""
+        rebuild(user_id)
+        click.echo("Rollups rebuilt.")
+
+    _ = _rebuild_rollups_command
@@ -1,250 +1,400 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from typing import Any
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import func
+
+import rollups
+from auth import auth_required, current_user_id, error_response
+from cache import cached_per_user
+from catalog import get_catalog
+from conditional import etag_per_user
+from models import (
+    FartRecord,
+    FartType,
+    db,
+    format_day,
+    format_utc,
+    format_week,
+)
+from timezones import current_zone, request_date_bounds
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func, text
+analytics_bp = Blueprint("analytics", __name__, url_prefix="/analytics")
 
-from auth import error_response, get_jwt_identity, jwt_required
-from models import FartRecord, FartType, User, db
+SMELL_SCORES = {"mild": 1, "tolerable": 2, "stinky": 3, "extremely_stinky": 4}
+DURATION_SCORES = {"very_short": 1, "short": 2, "medium": 3, "long": 4}
 
-analytics_bp = Blueprint("analytics", __name__, url_prefix="/analytics")
+FILTER_ARGS = ("date_from", "date_to", "days", "weeks")
+RELATIVE_ARGS = ("days", "weeks")
 
 
-def _current_user() -> User | None:
-    identity = get_jwt_identity()
-    if not identity:
-        return None
-    try:
-        user_id = int(identity)
-    except (TypeError, ValueError):
-        return None
-    return User.query.get(user_id)
+def _apply_date_range(q):
+    date_from, date_to = request_date_bounds()
+    if date_from:
+        q = q.filter(FartRecord.timestamp >= date_from)
+    if date_to:
+        q = q.filter(FartRecord.timestamp <= date_to)
+    return q
 
 
-def _parse_date_boundary(value: str, end_of_day: bool) -> str | None:
-    raw = (value or "").strip()
+def _relative_cutoff(arg: str) -> str | None:
+    raw = request.args.get(arg)
     if not raw:
         return None
-
-    if len(raw) == 10 and raw[4] == "-" and raw[7] == "-":
-        if end_of_day:
-            raw = raw + "T23:59:59Z"
-        else:
-            raw = raw + "T00:00:00Z"
-
     try:
-        if raw.endswith("Z"):
-            raw = raw[:-1] + "+00:00"
-        dt = datetime.fromisoformat(raw)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
-    except ValueError:
+        amount = int(raw)
+        delta = timedelta(weeks=amount) if arg == "weeks" else timedelta(days=amount)
+        return format_utc(datetime.now(timezone.utc) - delta)
+    except (ValueError, OverflowError):
         return None
 
 
 def _apply_filters(q):
-    date_from = _parse_date_boundary(
-        request.args.get("date_from", ""), end_of_day=False
-    )
-    date_to = _parse_date_boundary(request.args.get("date_to", ""), end_of_day=True)
+    q = _apply_date_range(q)
+    for cutoff in (_relative_cutoff("days"), _relative_cutoff("weeks")):
+        if cutoff:
+            q = q.filter(FartRecord.timestamp >= cutoff)
+    return q
 
-    if date_from:
-        q = q.filter(FartRecord.timestamp >= date_from)
-    if date_to:
-        q = q.filter(FartRecord.timestamp <= date_to)
 
-    days = request.args.get("days")
-    if days:
-        try:
-            days_int = int(days)
-            cutoff = (datetime.now(timezone.utc) - timedelta(days=days_int)).isoformat()
-            q = q.filter(FartRecord.timestamp >= cutoff)
-        except ValueError:
-            pass
-
-    weeks = request.args.get("weeks")
-    if weeks:
-        try:
-            weeks_int = int(weeks)
-            cutoff = (
-                datetime.now(timezone.utc) - timedelta(weeks=weeks_int)
-            ).isoformat()
-            q = q.filter(FartRecord.timestamp >= cutoff)
-        except ValueError:
-            pass
+def _filter_bounds() -> tuple[str | None, str | None]:
+    """The filters from ``_apply_filters`` collapsed into one timestamp range."""
+    date_from, date_to = request_date_bounds()
+    lower = [
+        bound
+        for bound in (date_from, _relative_cutoff("days"), _relative_cutoff("weeks"))
+        if bound
+    ]
+    return (max(lower) if lower else None), date_to
 
-    return q
 
+def _use_rollups() -> bool:
+    return bool(current_app.config.get("ANALYTICS_USE_ROLLUPS"))
 
-@analytics_bp.get("/daily-count")
-@jwt_required()
-def daily_count():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
 
-    q = db.session.query(
-        func.substr(FartRecord.timestamp, 1, 10).label("date"),
-        func.count(FartRecord.id).label("count"),
-    ).filter(FartRecord.user_id == user.id)
+def _rollup_counts(
+    user_id: int, dimension: str, key: Callable[[str, str], Any]
+) -> Counter[Any]:
+    lo, hi = _filter_bounds()
+    counts: Counter[Any] = Counter()
+    for (day, bucket), count in rollups.load_counts(
+        user_id, dimension, lo, hi, current_zone()
+    ).items():
+        if count:
+            counts[key(day, bucket)] += count
+    return counts
 
-    q = _apply_filters(q)
 
-    results = q.group_by(text("date")).order_by(text("date")).all()
+@lru_cache(maxsize=4096)
+def _calendar(day: str) -> tuple[str, int]:
+    """``(strftime('%Y-%W'), strftime('%w'))`` for an ISO date, as SQLite does."""
+    d = date.fromisoformat(day)
+    return d.strftime("%Y-%W"), d.isoweekday() % 7
+
+
+def _cross_point(
+    smell_level: str, duration: str, temperature: str, moisture: str
+) -> dict[str, Any]:
+    return {
+        "value": [DURATION_SCORES.get(duration, 0), SMELL_SCORES.get(smell_level, 0)],
+        "meta": {
+            "smell": smell_level,
+            "duration": duration,
+            "temperature": temperature,
+            "moisture": moisture,
+        },
+    }
+
+
+@analytics_bp.get("/daily-count")
+@auth_required
+@etag_per_user("daily-count", RELATIVE_ARGS)
+@cached_per_user("daily-count", FILTER_ARGS, RELATIVE_ARGS)
+def daily_count():
+    user_id = current_user_id()
+    assert user_id is not None
+
+    if _use_rollups():
+        counts = _rollup_counts(user_id, "total", lambda day, _bucket: day)
+    else:
+        q = db.session.query(FartRecord.day, func.count()).filter(
+            FartRecord.user_id == user_id
+        )
+
+        q = _apply_filters(q)
 
-    dates = [r.date for r in results]
-    counts = [r.count for r in results]
+        counts = {format_day(d): n for d, n in q.group_by(FartRecord.day)}
 
-    return jsonify({"dates": dates, "counts": counts})
+    dates = sorted(counts)
+    return jsonify({"dates": dates, "counts": [counts[d] for d in dates]})
 
 
 @analytics_bp.get("/weekly-count")
-@jwt_required()
+@auth_required
+@etag_per_user("weekly-count", RELATIVE_ARGS)
+@cached_per_user("weekly-count", FILTER_ARGS, RELATIVE_ARGS)
 def weekly_count():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
-
-    q = db.session.query(
-        func.strftime("%Y-%W", FartRecord.timestamp).label("week"),
-        func.count(FartRecord.id).label("count"),
-    ).filter(FartRecord.user_id == user.id)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    q = _apply_filters(q)
+    if _use_rollups():
+        counts = _rollup_counts(
+            user_id, "total", lambda day, _bucket: _calendar(day)[0]
+        )
+    else:
+        q = db.session.query(FartRecord.week, func.count()).filter(
+            FartRecord.user_id == user_id
+        )
 
-    results = q.group_by(text("week")).order_by(text("week")).all()
+        q = _apply_filters(q)
 
-    weeks = [r.week for r in results]
-    counts = [r.count for r in results]
+        counts = {format_week(w): n for w, n in q.group_by(FartRecord.week)}
 
-    return jsonify({"weeks": weeks, "counts": counts})
+    weeks = sorted(counts)
+    return jsonify({"weeks": weeks, "counts": [counts[w] for w in weeks]})
 
 
 @analytics_bp.get("/type-distribution")
-@jwt_required()
+@auth_required
+@etag_per_user("type-distribution", RELATIVE_ARGS)
+@cached_per_user("type-distribution", FILTER_ARGS, RELATIVE_ARGS)
 def type_distribution():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
-
-    q = (
-        db.session.query(FartType.name, func.count(FartRecord.id).label("count"))
-        .join(FartType, FartRecord.type_id == FartType.id)
-        .filter(FartRecord.user_id == user.id)
-    )
+    user_id = current_user_id()
+    assert user_id is not None
+
+    if _use_rollups():
+        by_id = _rollup_counts(user_id, "type", lambda _day, bucket: int(bucket))
+        catalog = get_catalog()
+        counts = {
+            name: n
+            for name, n in ((catalog.name_of(t), n) for t, n in by_id.items())
+            if name is not None
+        }
+    else:
+        q = (
+            db.session.query(FartType.name, func.count(FartRecord.id).label("count"))
+            .join(FartType, FartRecord.type_id == FartType.id)
+            .filter(FartRecord.user_id == user_id)
+        )
 
-    q = _apply_filters(q)
+        q = _apply_filters(q)
 
-    results = q.group_by(FartType.name).all()
+        counts = dict(q.group_by(FartType.name).all())
 
-    data = [{"name": r.name, "value": r.count} for r in results]
+    data = [{"name": name, "value": counts[name]} for name in sorted(counts)]
 
     return jsonify(data)
 
 
 @analytics_bp.get("/smell-distribution")
-@jwt_required()
+@auth_required
+@etag_per_user("smell-distribution", RELATIVE_ARGS)
+@cached_per_user("smell-distribution", FILTER_ARGS, RELATIVE_ARGS)
 def smell_distribution():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    q = db.session.query(
-        FartRecord.smell_level, func.count(FartRecord.id).label("count")
-    ).filter(FartRecord.user_id == user.id)
+    if _use_rollups():
+        counts = _rollup_counts(user_id, "smell", lambda _day, bucket: bucket)
+    else:
+        q = db.session.query(
+            FartRecord.smell_level, func.count(FartRecord.id).label("count")
+        ).filter(FartRecord.user_id == user_id)
 
-    q = _apply_filters(q)
+        q = _apply_filters(q)
 
-    results = q.group_by(FartRecord.smell_level).all()
+        counts = dict(q.group_by(FartRecord.smell_level).all())
 
-    categories = [r.smell_level for r in results]
-    values = [r.count for r in results]
+    categories = sorted(counts)
+    values = [counts[c] for c in categories]
 
     return jsonify({"categories": categories, "values": values})
 
 
 @analytics_bp.get("/hourly-heatmap")
-@jwt_required()
+@auth_required
+@etag_per_user("hourly-heatmap", RELATIVE_ARGS)
+@cached_per_user("hourly-heatmap", FILTER_ARGS, RELATIVE_ARGS)
 def hourly_heatmap():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    q = db.session.query(
-        func.strftime("%w", FartRecord.timestamp).label("dow"),
-        func.strftime("%H", FartRecord.timestamp).label("hour"),
-        func.count(FartRecord.id).label("count"),
-    ).filter(FartRecord.user_id == user.id)
+    if _use_rollups():
+        counts = _rollup_counts(
+            user_id, "hour", lambda day, bucket: (_calendar(day)[1], int(bucket))
+        )
+    else:
+        q = db.session.query(FartRecord.dow, FartRecord.hour, func.count()).filter(
+            FartRecord.user_id == user_id
+        )
 
-    q = _apply_filters(q)
+        q = _apply_filters(q)
 
-    results = q.group_by(text("dow"), text("hour")).all()
+        counts = {
+            (dow, hour): n
+            for dow, hour, n in q.group_by(FartRecord.dow, FartRecord.hour)
+        }
 
-    data = []
-    for r in results:
-        data.append([int(r.hour), int(r.dow), r.count])
+    data = [[hour, dow, counts[(dow, hour)]] for dow, hour in sorted(counts)]
 
     return jsonify(data)
 
 
 @analytics_bp.get("/duration-distribution")
-@jwt_required()
+@auth_required
+@etag_per_user("duration-distribution", RELATIVE_ARGS)
+@cached_per_user("duration-distribution", FILTER_ARGS, RELATIVE_ARGS)
 def duration_distribution():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    q = db.session.query(
-        FartRecord.duration, func.count(FartRecord.id).label("count")
-    ).filter(FartRecord.user_id == user.id)
+    if _use_rollups():
+        counts = _rollup_counts(user_id, "duration", lambda _day, bucket: bucket)
+    else:
+        q = db.session.query(
+            FartRecord.duration, func.count(FartRecord.id).label("count")
+        ).filter(FartRecord.user_id == user_id)
 
-    q = _apply_filters(q)
+        q = _apply_filters(q)
 
-    results = q.group_by(FartRecord.duration).all()
+        counts = dict(q.group_by(FartRecord.duration).all())
 
-    data = [{"name": r.duration, "value": r.count} for r in results]
+    data = [{"name": name, "value": counts[name]} for name in sorted(counts)]
 
     return jsonify(data)
 
 
 @analytics_bp.get("/cross-analysis")
-@jwt_required()
+@auth_required
+@etag_per_user("cross-analysis", RELATIVE_ARGS)
+@cached_per_user("cross-analysis", FILTER_ARGS, RELATIVE_ARGS)
 def cross_analysis():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
-
-    smell_map = {"mild": 1, "tolerable": 2, "stinky": 3, "extremely_stinky": 4}
-    duration_map = {"very_short": 1, "short": 2, "medium": 3, "long": 4}
+    user_id = current_user_id()
+    assert user_id is not None
 
     q = db.session.query(
         FartRecord.smell_level,
         FartRecord.duration,
         FartRecord.temperature,
         FartRecord.moisture,
-    ).filter(FartRecord.user_id == user.id)
+    ).filter(FartRecord.user_id == user_id)
 
     q = _apply_filters(q)
 
     results = q.all()
 
-    data = []
-    for r in results:
-        s_val = smell_map.get(r.smell_level, 0)
-        d_val = duration_map.get(r.duration, 0)
-        data.append(
-            {
-                "value": [d_val, s_val],
-                "meta": {
-                    "smell": r.smell_level,
-                    "duration": r.duration,
-                    "temperature": r.temperature,
-                    "moisture": r.moisture,
-                },
-            }
-        )
+    data = [
+        _cross_point(r.smell_level, r.duration, r.temperature, r.moisture)
+        for r in results
+    ]
 
     return jsonify(data)
+
+
+@analytics_bp.get("/dashboard")
+@auth_required
+@etag_per_user("dashboard", RELATIVE_ARGS)
+@cached_per_user("dashboard", FILTER_ARGS, RELATIVE_ARGS)
+def dashboard():
+    """All seven chart payloads from a single scan of the filtered records.
+
+    ``date_from``/``date_to`` apply to every chart. ``weeks`` only bounds
+    the weekly chart and ``days`` the others (and the weekly chart too when
+    ``weeks`` is absent), matching how the dashboard page queries them: its
+    "All time" view sends ``weeks`` alone.
+    """
+    user_id = current_user_id()
+    assert user_id is not None
+
+    days_cutoff = _relative_cutoff("days")
+    weeks_cutoff = _relative_cutoff("weeks")
+    chart_cutoff = days_cutoff
+    weekly_cutoff = weeks_cutoff or days_cutoff
+    # The scan is bounded only when every chart is.
+    scan_cutoff = (
+        min(chart_cutoff, weekly_cutoff) if chart_cutoff and weekly_cutoff else None
+    )
+
+    q = (
+        db.session.query(
+            FartRecord.timestamp,
+            FartRecord.day,
+            FartRecord.week,
+            FartRecord.dow,
+            FartRecord.hour,
+            FartType.name,
+            FartRecord.smell_level,
+            FartRecord.duration,
+            FartRecord.temperature,
+            FartRecord.moisture,
+        )
+        .join(FartType, FartRecord.type_id == FartType.id)
+        .filter(FartRecord.user_id == user_id)
+    )
+    q = _apply_date_range(q)
+    if scan_cutoff:
+        q = q.filter(FartRecord.timestamp >= scan_cutoff)
+
+    daily: Counter[str] = Counter()
+    weekly: Counter[str] = Counter()
+    types: Counter[str] = Counter()
+    smells: Counter[str] = Counter()
+    heatmap: Counter[tuple[int, int]] = Counter()
+    durations: Counter[str] = Counter()
+    cross: list[dict[str, Any]] = []
+
+    for (
+        ts,
+        day,
+        week,
+        dow,
+        hour,
+        type_name,
+        smell_level,
+        duration,
+        temperature,
+        moisture,
+    ) in q.order_by(FartRecord.timestamp, FartRecord.id):
+        if weekly_cutoff is None or ts >= weekly_cutoff:
+            weekly[format_week(week)] += 1
+        if chart_cutoff is not None and ts < chart_cutoff:
+            continue
+
+        daily[format_day(day)] += 1
+        types[type_name] += 1
+        smells[smell_level] += 1
+        heatmap[(dow, hour)] += 1
+        durations[duration] += 1
+        cross.append(_cross_point(smell_level, duration, temperature, moisture))
+
+    dates = sorted(daily)
+    week_keys = sorted(weekly)
+    smell_keys = sorted(smells)
+
+    return jsonify(
+        {
+            "daily_count": {"dates": dates, "counts": [daily[d] for d in dates]},
+            "weekly_count": {
+                "weeks": week_keys,
+                "counts": [weekly[w] for w in week_keys],
+            },
+            "type_distribution": [
+                {"name": name, "value": types[name]} for name in sorted(types)
+            ],
+            "smell_distribution": {
+                "categories": smell_keys,
+                "values": [smells[k] for k in smell_keys],
+            },
+            "hourly_heatmap": [
+                [hour, dow, heatmap[(dow, hour)]] for dow, hour in sorted(heatmap)
+            ],
+            "duration_distribution": [
+                {"name": name, "value": durations[name]} for name in sorted(durations)
+            ],
+            "cross_analysis": cross,
+        }
+    )
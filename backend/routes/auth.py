@@ -3,25 +3,47 @@ from flask import Blueprint, request, jsonify
 from auth import (
     auth_required,
     create_token_for_user,
+    PasswordHasherBusy,
     error_response,
+    forget_user,
     hash_password,
+    password_needs_rehash,
     verify_password,
     get_current_user,
 )
+from cache import bump_data_version
 from models import User, db
+from timezones import DEFAULT_TIMEZONE, get_rebucketer, get_zone
 
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 
+def _serialize_user(user: User) -> dict:
+    return {"username": user.username, "timezone": user.timezone}
+
+
+def _valid_timezone(name) -> bool:
+    if not isinstance(name, str) or not name:
+        return False
+    try:
+        get_zone(name)
+    except ValueError:
+        return False
+    return True
+
+
 @auth_bp.post("/register")
 def register():
     payload = request.get_json(silent=True) or {}
     username = (payload.get("username") or "").strip()
     password = payload.get("password") or ""
+    tz_name = payload.get("timezone") or DEFAULT_TIMEZONE
 
     if not username or not password:
         return error_response("Missing username or password", "INVALID_REQUEST", 400)
+    if not _valid_timezone(tz_name):
+        return error_response("Invalid timezone", "INVALID_TIMEZONE", 400)
 
     username_lc = username.lower()
     if User.query.filter_by(username=username_lc).first() is not None:
@@ -30,11 +52,13 @@ def register():
     user = User()
     user.username = username_lc
     user.password_hash = hash_password(password)
+    user.timezone = tz_name
+    user.bucket_timezone = tz_name
     db.session.add(user)
     db.session.commit()
 
     token = create_token_for_user(user)
-    return jsonify({"token": token, "user": {"username": user.username}}), 201
+    return jsonify({"token": token, "user": _serialize_user(user)}), 201
 
 
 @auth_bp.post("/login")
@@ -51,8 +75,15 @@ def login():
     if user is None or not verify_password(password, user.password_hash):
         return error_response("Invalid credentials", "INVALID_CREDENTIALS", 401)
 
+    if password_needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass  # Keep the old hash; it is upgraded on a later login.
+
     token = create_token_for_user(user)
-    return jsonify({"token": token, "user": {"username": user.username}})
+    return jsonify({"token": token, "user": _serialize_user(user)})
 
 
 @auth_bp.post("/logout")
@@ -66,4 +97,27 @@ def me():
     user = get_current_user()
     if user is None:
         return error_response("Unauthorized", "UNAUTHORIZED", 401)
-    return jsonify({"user": {"username": user.username}})
+    return jsonify({"user": _serialize_user(user)})
+
+
+@auth_bp.patch("/me")
+@auth_required
+def update_me():
+    user = get_current_user()
+    if user is None:
+        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+
+    payload = request.get_json(silent=True) or {}
+    tz_name = payload.get("timezone")
+    if not _valid_timezone(tz_name):
+        return error_response("Invalid timezone", "INVALID_TIMEZONE", 400)
+
+    if tz_name != user.timezone:
+        user.timezone = tz_name
+        bump_data_version(user.id)
+        db.session.commit()
+        forget_user(user.id)
+        # Existing records keep their old buckets until the job reaches them.
+        get_rebucketer().submit(user.id)
+
+    return jsonify({"user": _serialize_user(user)})
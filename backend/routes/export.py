@@ -1,13 +1,16 @@
-from io import BytesIO, StringIO
+import tempfile
 
-from flask import Blueprint, Response, request
-from openpyxl import Workbook
+from flask import Blueprint, Response, send_file, stream_with_context
 
-from auth import auth_required, get_current_user
-from models import FartRecord, FartType
+from auth import auth_required, current_user_id
+from models import FartRecord, FartType, db
+from timezones import request_date_bounds
 
 export_bp = Blueprint("export", __name__, url_prefix="/export")
 
+# Rows fetched per round trip and written per streamed chunk.
+EXPORT_CHUNK_SIZE = 1000
+
 CSV_HEADERS = ["时间", "时长", "类型", "臭味程度", "温感", "湿感", "备注"]
 
 DURATION_LABELS = {
@@ -35,30 +38,38 @@ MOISTURE_LABELS = {
 }
 
 
-def _get_filtered_records(user_id: int):
-    query = FartRecord.query.filter_by(user_id=user_id)
-
-    date_from = request.args.get("date_from")
-    date_to = request.args.get("date_to")
+def _filtered_records_query(
+    user_id: int, date_from: str | None, date_to: str | None
+):
+    # Type names come from the join, so an export runs one query however many
+    # rows it has.
+    query = (
+        db.session.query(
+            FartRecord.timestamp,
+            FartRecord.duration,
+            FartType.name.label("type_name"),
+            FartRecord.smell_level,
+            FartRecord.temperature,
+            FartRecord.moisture,
+            FartRecord.notes,
+        )
+        .outerjoin(FartType, FartType.id == FartRecord.type_id)
+        .filter(FartRecord.user_id == user_id)
+    )
 
     if date_from:
-        query = query.filter(FartRecord.timestamp >= f"{date_from}T00:00:00Z")
+        query = query.filter(FartRecord.timestamp >= date_from)
     if date_to:
-        query = query.filter(FartRecord.timestamp <= f"{date_to}T23:59:59Z")
-
-    return query.order_by(FartRecord.timestamp.desc()).all()
-
+        query = query.filter(FartRecord.timestamp <= date_to)
 
-def _get_type_name(type_id: int) -> str:
-    ft = FartType.query.get(type_id)
-    return ft.name if ft else "未知"
+    return query.order_by(FartRecord.timestamp.desc())
 
 
-def _record_to_row(record: FartRecord) -> list:
+def _record_to_row(record) -> list:
     return [
         record.timestamp,
         DURATION_LABELS.get(record.duration, record.duration),
-        _get_type_name(record.type_id),
+        record.type_name or "未知",
         SMELL_LABELS.get(record.smell_level, record.smell_level),
         TEMPERATURE_LABELS.get(record.temperature, record.temperature),
         MOISTURE_LABELS.get(record.moisture, record.moisture),
@@ -66,27 +77,36 @@ def _record_to_row(record: FartRecord) -> list:
     ]
 
 
+def _csv_line(row: list) -> str:
+    return ",".join('"' + str(v).replace('"', '""') + '"' for v in row) + "\n"
+
+
 @export_bp.get("/csv")
 @auth_required
 def export_csv():
-    user = get_current_user()
-    assert user is not None
-    records = _get_filtered_records(user.id)
-
-    output = StringIO()
-    output.write("\ufeff")
-
-    output.write(",".join(CSV_HEADERS) + "\n")
-
-    for record in records:
-        row = _record_to_row(record)
-        escaped_row = ['"' + str(v).replace('"', '""') + '"' for v in row]
-        output.write(",".join(escaped_row) + "\n")
-
-    content = output.getvalue()
+    user_id = current_user_id()
+    assert user_id is not None
+    # Parsed before streaming starts, so a bad bound can still be a 400.
+    date_from, date_to = request_date_bounds()
+
+    def generate():
+        yield "\ufeff" + ",".join(CSV_HEADERS) + "\n"
+
+        # Built here, not in the view: the view's session is removed when the
+        # view returns, so a query bound to it would check out a connection
+        # that no teardown returns.
+        query = _filtered_records_query(user_id, date_from, date_to)
+        lines = []
+        for record in query.yield_per(EXPORT_CHUNK_SIZE):
+            lines.append(_csv_line(_record_to_row(record)))
+            if len(lines) >= EXPORT_CHUNK_SIZE:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
 
     return Response(
-        content,
+        stream_with_context(generate()),
         mimetype="text/csv; charset=utf-8",
         headers={"Content-Disposition": "attachment; filename=fart_records.csv"},
     )
@@ -95,29 +115,39 @@ def export_csv():
 @export_bp.get("/excel")
 @auth_required
 def export_excel():
-    user = get_current_user()
-    assert user is not None
-    records = _get_filtered_records(user.id)
-
-    wb = Workbook()
-    ws = wb.active
-    assert ws is not None
-    ws.title = "屁屁记录"
+    # openpyxl is a large share of startup time and only needed here (see
+    # startup.py); it is imported on the first export.
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    user_id = current_user_id()
+    assert user_id is not None
+    query = _filtered_records_query(user_id, *request_date_bounds())
+
+    # Write-only sheets stream rows to disk instead of keeping every cell in
+    # memory; column widths must be set before the first row is appended.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="屁屁记录")
+    for col in range(1, len(CSV_HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 15
 
     ws.append(CSV_HEADERS)
-
-    for record in records:
+    for record in query.yield_per(EXPORT_CHUNK_SIZE):
         ws.append(_record_to_row(record))
 
-    for col in range(1, len(CSV_HEADERS) + 1):
-        ws.column_dimensions[chr(64 + col)].width = 15
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    return Response(
-        output.getvalue(),
+    # The spool file is unlinked on creation and closed by the response once
+    # it has been sent.
+    output = tempfile.TemporaryFile()
+    try:
+        wb.save(output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+
+    return send_file(
+        output,
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=fart_records.xlsx"},
+        as_attachment=True,
+        download_name="fart_records.xlsx",
     )
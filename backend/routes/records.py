@@ -1,33 +1,46 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any
+import base64
+import json
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Iterable, Mapping
 
 from flask import Blueprint, jsonify, request
-from sqlalchemy.orm import joinedload
-
-from auth import error_response, get_jwt_identity, jwt_required
-from models import FartRecord, FartType, User, db
+from sqlalchemy import insert, select, text, tuple_
+
+import rollups
+from auth import auth_required, current_user_id, error_response
+from cache import bump_data_version, data_version
+from catalog import get_catalog
+from conditional import etag_per_user
+from models import (
+    DURATION_CODES,
+    MOISTURE_CODES,
+    SMELL_LEVEL_CODES,
+    TEMPERATURE_CODES,
+    FartRecord,
+    RecordTombstone,
+    db,
+    format_utc,
+    parse_timestamp,
+    time_buckets,
+)
+from search import parse_query, records_fts
+from timezones import current_zone, request_date_bounds
 
 
 records_bp = Blueprint("records", __name__, url_prefix="/records")
 
 
-ALLOWED_DURATION = {"very_short", "short", "medium", "long"}
-ALLOWED_SMELL_LEVEL = {"mild", "tolerable", "stinky", "extremely_stinky"}
-ALLOWED_TEMPERATURE = {"hot", "cold"}
-ALLOWED_MOISTURE = {"moist", "dry"}
+ALLOWED_DURATION = set(DURATION_CODES)
+ALLOWED_SMELL_LEVEL = set(SMELL_LEVEL_CODES)
+ALLOWED_TEMPERATURE = set(TEMPERATURE_CODES)
+ALLOWED_MOISTURE = set(MOISTURE_CODES)
 
+BATCH_MAX_RECORDS = 10000
 
-def _current_user() -> User | None:
-    identity = get_jwt_identity()
-    if not identity:
-        return None
-    try:
-        user_id = int(identity)
-    except (TypeError, ValueError):
-        return None
-    return User.query.get(user_id)
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 1000
 
 
 def _normalize_iso_timestamp(value: str) -> str | None:
@@ -45,12 +58,16 @@ def _normalize_iso_timestamp(value: str) -> str | None:
 
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
-    dt_utc = dt.astimezone(timezone.utc)
-    return dt_utc.isoformat().replace("+00:00", "Z")
+    try:
+        # The owner's local time must exist too, for the time buckets.
+        dt.astimezone(current_zone())
+        return format_utc(dt)
+    except OverflowError:
+        return None
 
 
 def _default_timestamp() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return format_utc(datetime.now(timezone.utc))
 
 
 def _serialize_record(r: FartRecord) -> dict[str, Any]:
@@ -59,7 +76,7 @@ def _serialize_record(r: FartRecord) -> dict[str, Any]:
         "timestamp": r.timestamp,
         "duration": r.duration,
         "type_id": int(r.type_id),
-        "type_name": r.fart_type.name if r.fart_type else None,
+        "type_name": get_catalog().name_of(int(r.type_id)),
         "smell_level": r.smell_level,
         "temperature": r.temperature,
         "moisture": r.moisture,
@@ -83,31 +100,64 @@ def _validate_type_id(type_id: Any):
     except (TypeError, ValueError):
         return None, error_response("Invalid type_id", "INVALID_TYPE", 400)
 
-    if FartType.query.get(type_id_int) is None:
+    if get_catalog().get(type_id_int) is None:
         return None, error_response("Unknown type_id", "INVALID_TYPE", 400)
     return type_id_int, None
 
 
-def _parse_date_boundary(value: str, end_of_day: bool) -> str | None:
-    raw = (value or "").strip()
-    if not raw:
+def _track_changes(
+    user_id: int,
+    added: Iterable[Mapping[str, Any]] = (),
+    removed: Iterable[Mapping[str, Any]] = (),
+    count: int = 1,
+) -> int:
+    """Derived state that must change in the same transaction as a write.
+
+    Returns the last of the ``count`` change sequence numbers the write owns.
+    Pending records are not flushed, so they can still be stamped with them.
+    """
+    with db.session.no_autoflush:
+        rollups.apply_changes(user_id, added=added, removed=removed)
+        return bump_data_version(user_id, count)
+
+
+def _stamp_change(rec: FartRecord, change_seq: int) -> None:
+    rec.change_seq = change_seq
+    rec.updated_at = _default_timestamp()
+
+
+def _encode_cursor(timestamp: str, record_id: int) -> str:
+    raw = json.dumps([timestamp, record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(value: str) -> tuple[str, int] | None:
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(timestamp, str) or not isinstance(record_id, int):
+        return None
+    try:
+        parse_timestamp(timestamp)
+    except (ValueError, OverflowError):
         return None
+    return timestamp, record_id
 
-    if len(raw) == 10 and raw[4] == "-" and raw[7] == "-":
-        if end_of_day:
-            raw = raw + "T23:59:59Z"
-        else:
-            raw = raw + "T00:00:00Z"
 
-    return _normalize_iso_timestamp(raw)
+def _parse_bool_arg(name: str, default: bool) -> bool:
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in {"1", "true", "yes"}
 
 
 @records_bp.post("")
-@jwt_required()
+@auth_required
 def create_record():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
     payload = request.get_json(silent=True) or {}
 
@@ -153,8 +203,8 @@ def create_record():
             return error_response("Invalid timestamp", "INVALID_REQUEST", 400)
 
     rec = FartRecord()
-    rec.user_id = int(user.id)
-    rec.timestamp = timestamp
+    rec.user_id = user_id
+    rec.set_timestamp(timestamp, current_zone())
     rec.duration = duration
     rec.type_id = type_id_int
     rec.smell_level = smell_level
@@ -163,17 +213,147 @@ def create_record():
     rec.notes = notes
 
     db.session.add(rec)
+    _stamp_change(rec, _track_changes(rec.user_id, added=[rollups.snapshot(rec)]))
     db.session.commit()
 
     return jsonify(_serialize_record(rec)), 201
 
 
+def _check_batch_item(
+    item: Any, known_type_ids: set[int], tz: tzinfo
+) -> tuple[dict[str, Any] | None, tuple[str, str] | None]:
+    """Validate one batch item with the same rules as ``create_record``.
+
+    Returns the column values ready for insertion, or ``(message, code)``
+    describing why the item was rejected.
+    """
+    if not isinstance(item, dict):
+        return None, ("Invalid record", "INVALID_REQUEST")
+
+    duration = item.get("duration")
+    type_id = item.get("type_id")
+    smell_level = item.get("smell_level")
+    temperature = item.get("temperature")
+    moisture = item.get("moisture")
+
+    if (
+        not duration
+        or type_id is None
+        or not smell_level
+        or not temperature
+        or not moisture
+    ):
+        return None, ("Missing required fields", "INVALID_REQUEST")
+
+    for field, value, allowed in (
+        ("duration", duration, ALLOWED_DURATION),
+        ("smell_level", smell_level, ALLOWED_SMELL_LEVEL),
+        ("temperature", temperature, ALLOWED_TEMPERATURE),
+        ("moisture", moisture, ALLOWED_MOISTURE),
+    ):
+        if not isinstance(value, str) or value not in allowed:
+            return None, (f"Invalid {field}", "INVALID_ENUM")
+
+    try:
+        type_id_int = int(type_id)
+    except (TypeError, ValueError):
+        return None, ("Invalid type_id", "INVALID_TYPE")
+    if type_id_int not in known_type_ids:
+        return None, ("Unknown type_id", "INVALID_TYPE")
+
+    ts = item.get("timestamp")
+    if ts is None or str(ts).strip() == "":
+        timestamp = _default_timestamp()
+    else:
+        timestamp = _normalize_iso_timestamp(str(ts))
+        if timestamp is None:
+            return None, ("Invalid timestamp", "INVALID_REQUEST")
+
+    return {
+        "timestamp": timestamp,
+        **time_buckets(parse_timestamp(timestamp), tz),
+        "duration": duration,
+        "type_id": type_id_int,
+        "smell_level": smell_level,
+        "temperature": temperature,
+        "moisture": moisture,
+        "notes": item.get("notes"),
+    }, None
+
+
+@records_bp.post("/batch")
+@auth_required
+def create_records_batch():
+    user_id = current_user_id()
+    assert user_id is not None
+
+    payload = request.get_json(silent=True)
+    items = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return error_response("Missing records", "INVALID_REQUEST", 400)
+    if len(items) > BATCH_MAX_RECORDS:
+        return error_response(
+            f"Too many records (max {BATCH_MAX_RECORDS})", "BATCH_TOO_LARGE", 413
+        )
+
+    requested_type_ids: set[int] = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            requested_type_ids.add(int(item["type_id"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    known_type_ids = get_catalog().known_ids(requested_type_ids)
+
+    tz = current_zone()
+    rows: list[dict[str, Any]] = []
+    row_indexes: list[int] = []
+    results: list[dict[str, Any]] = []
+    for index, item in enumerate(items):
+        row, problem = _check_batch_item(item, known_type_ids, tz)
+        if problem is not None:
+            message, code = problem
+            results.append({"index": index, "error": message, "code": code})
+            continue
+        assert row is not None
+        row["user_id"] = user_id
+        rows.append(row)
+        row_indexes.append(index)
+        results.append({"index": index, "id": None})
+
+    if rows:
+        last_seq = _track_changes(user_id, added=rows, count=len(rows))
+        updated_at = _default_timestamp()
+        first_seq = last_seq - len(rows) + 1
+        for offset, row in enumerate(rows):
+            row["change_seq"] = first_seq + offset
+            row["updated_at"] = updated_at
+        # A single executemany holds SQLite's write lock for the whole batch,
+        # so the new rowids are consecutive and end at last_insert_rowid().
+        db.session.execute(insert(FartRecord.__table__), rows)
+        last_id = int(
+            db.session.execute(text("SELECT last_insert_rowid()")).scalar_one()
+        )
+        first_id = last_id - len(rows) + 1
+        for offset, index in enumerate(row_indexes):
+            results[index]["id"] = first_id + offset
+        db.session.commit()
+
+    failed = len(items) - len(rows)
+    body = {"created": len(rows), "failed": failed, "results": results}
+    if not rows:
+        body.update({"error": "No valid records", "code": "INVALID_REQUEST"})
+        return jsonify(body), 400
+    return jsonify(body), 201
+
+
 @records_bp.get("")
-@jwt_required()
+@auth_required
+@etag_per_user("records")
 def list_records():
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
     try:
         page = int(request.args.get("page", 1))
@@ -186,53 +366,196 @@ def list_records():
     if per_page > 100:
         per_page = 100
 
-    date_from = _parse_date_boundary(
-        request.args.get("date_from", ""), end_of_day=False
-    )
-    date_to = _parse_date_boundary(request.args.get("date_to", ""), end_of_day=True)
-    if request.args.get("date_from") and date_from is None:
-        return error_response("Invalid date_from", "INVALID_REQUEST", 400)
-    if request.args.get("date_to") and date_to is None:
-        return error_response("Invalid date_to", "INVALID_REQUEST", 400)
-
-    q = FartRecord.query.options(joinedload(FartRecord.fart_type)).filter_by(
-        user_id=int(user.id)
-    )
+    date_from, date_to = request_date_bounds()
+
+    q = FartRecord.query.filter_by(user_id=user_id)
     if date_from:
         q = q.filter(FartRecord.timestamp >= date_from)
     if date_to:
         q = q.filter(FartRecord.timestamp <= date_to)
 
-    q = q.order_by(FartRecord.timestamp.desc())
+    search_text = request.args.get("q", "").strip()
+    if search_text:
+        if "cursor" in request.args:
+            return error_response(
+                "cursor cannot be combined with q", "INVALID_REQUEST", 400
+            )
+        q, counted = _search_notes(q, search_text)
+    else:
+        counted = q
+        q = q.order_by(FartRecord.timestamp.desc(), FartRecord.id.desc())
+
+    if "cursor" in request.args:
+        return _list_records_by_cursor(q, per_page)
 
-    total = q.count()
+    total = counted.count() if _parse_bool_arg("include_total", True) else None
     items = q.offset((page - 1) * per_page).limit(per_page).all()
 
-    return jsonify(
-        {
-            "items": [_serialize_record(r) for r in items],
-            "total": total,
-            "page": page,
-            "per_page": per_page,
-        }
+    body: dict[str, Any] = {
+        "items": [_serialize_record(r) for r in items],
+        "page": page,
+        "per_page": per_page,
+    }
+    if total is not None:
+        body["total"] = total
+    return jsonify(body)
+
+
+def _search_notes(q, search_text: str):
+    """Restrict ``q`` to records whose notes contain every term.
+
+    Matches are ranked by bm25 through ``records_fts``, newest first among
+    equal ranks. Terms too short for the trigram index become substring
+    filters; a search made only of those is ordered by time. Returns the
+    ordered query and one for counting, which skips the ranking: scoring
+    every match is most of the cost of a search.
+    """
+    match, short_terms = parse_query(search_text)
+    for term in short_terms:
+        q = q.filter(FartRecord.notes.contains(term, autoescape=True))
+    if match is None:
+        return q.order_by(FartRecord.timestamp.desc(), FartRecord.id.desc()), q
+
+    def _matches(*columns):
+        # Materialized so the MATCH runs once: joined directly, SQLite may put
+        # fart_records in the outer loop and search again for every record.
+        return (
+            select(*columns)
+            .where(records_fts.c.records_fts.op("MATCH")(match))
+            .cte("matches")
+            .prefix_with("MATERIALIZED")
+        )
+
+    ranked = _matches(records_fts.c.rowid, records_fts.c.rank)
+    unranked = _matches(records_fts.c.rowid)
+    return (
+        q.join(ranked, ranked.c.rowid == FartRecord.id).order_by(
+            ranked.c.rank, FartRecord.timestamp.desc(), FartRecord.id.desc()
+        ),
+        q.join(unranked, unranked.c.rowid == FartRecord.id),
     )
 
 
-def _get_owned_record_or_404(user: User, record_id: int):
-    rec = FartRecord.query.filter_by(id=record_id, user_id=int(user.id)).first()
+def _list_records_by_cursor(q, per_page: int):
+    """Keyset pagination over ``(timestamp, id)``.
+
+    Each page is a range seek on ``idx_records_user_buckets`` instead of an OFFSET
+    scan, so deep pages cost the same as the first one.
+    """
+    total = q.count() if _parse_bool_arg("include_total", False) else None
+
+    raw_cursor = request.args.get("cursor", "").strip()
+    if raw_cursor:
+        position = _decode_cursor(raw_cursor)
+        if position is None:
+            return error_response("Invalid cursor", "INVALID_REQUEST", 400)
+        q = q.filter(tuple_(FartRecord.timestamp, FartRecord.id) < position)
+
+    rows = q.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = _encode_cursor(last.timestamp, int(last.id))
+
+    body: dict[str, Any] = {
+        "items": [_serialize_record(r) for r in items],
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+    }
+    if total is not None:
+        body["total"] = total
+    return jsonify(body)
+
+
+@records_bp.get("/changes")
+@auth_required
+def record_changes():
+    """Records created, modified or deleted after the ``since`` cursor.
+
+    Changes come in feed order, at most ``limit`` per response; clients pass
+    the returned ``cursor`` back until ``has_more`` is false. Both lookups
+    are range seeks on ``(user_id, change_seq)``.
+    """
+    user_id = current_user_id()
+    assert user_id is not None
+
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        return error_response("Invalid cursor", "INVALID_REQUEST", 400)
+    if since < 0 or limit < 1:
+        return error_response("Invalid cursor", "INVALID_REQUEST", 400)
+    limit = min(limit, CHANGES_MAX_LIMIT)
+
+    # Every change up to this version was committed with it, so reading
+    # only up to it cannot skip a write that commits meanwhile.
+    version = data_version(user_id)
+    if since >= version:
+        return jsonify({"changes": [], "cursor": since, "has_more": False})
+
+    records = (
+        FartRecord.query.filter(
+            FartRecord.user_id == user_id,
+            FartRecord.change_seq > since,
+            FartRecord.change_seq <= version,
+        )
+        .order_by(FartRecord.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    tombstones = (
+        RecordTombstone.query.filter(
+            RecordTombstone.user_id == user_id,
+            RecordTombstone.change_seq > since,
+            RecordTombstone.change_seq <= version,
+        )
+        .order_by(RecordTombstone.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    changes = sorted(records + tombstones, key=lambda change: change.change_seq)
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    items = []
+    for change in changes:
+        if isinstance(change, RecordTombstone):
+            items.append(
+                {
+                    "id": int(change.record_id),
+                    "deleted": True,
+                    "updated_at": change.deleted_at,
+                }
+            )
+        else:
+            items.append(
+                {
+                    **_serialize_record(change),
+                    "deleted": False,
+                    "updated_at": change.updated_at,
+                }
+            )
+
+    cursor = int(changes[-1].change_seq) if has_more else version
+    return jsonify({"changes": items, "cursor": cursor, "has_more": has_more})
+
+
+def _get_owned_record_or_404(user_id: int, record_id: int):
+    rec = FartRecord.query.filter_by(id=record_id, user_id=user_id).first()
     if rec is None:
         return None, error_response("Not found", "NOT_FOUND", 404)
     return rec, None
 
 
 @records_bp.get("/<int:record_id>")
-@jwt_required()
+@auth_required
 def get_record(record_id: int):
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    rec, err = _get_owned_record_or_404(user, record_id)
+    rec, err = _get_owned_record_or_404(user_id, record_id)
     if err is not None:
         return err
     assert rec is not None
@@ -240,16 +563,16 @@ def get_record(record_id: int):
 
 
 @records_bp.put("/<int:record_id>")
-@jwt_required()
+@auth_required
 def update_record(record_id: int):
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    rec, err = _get_owned_record_or_404(user, record_id)
+    rec, err = _get_owned_record_or_404(user_id, record_id)
     if err is not None:
         return err
     assert rec is not None
+    before = rollups.snapshot(rec)
 
     payload = request.get_json(silent=True) or {}
 
@@ -260,7 +583,7 @@ def update_record(record_id: int):
         normalized = _normalize_iso_timestamp(str(ts))
         if normalized is None:
             return error_response("Invalid timestamp", "INVALID_REQUEST", 400)
-        rec.timestamp = normalized
+        rec.set_timestamp(normalized, current_zone())
 
     if "duration" in payload:
         duration = payload.get("duration")
@@ -303,22 +626,31 @@ def update_record(record_id: int):
     if "notes" in payload:
         rec.notes = payload.get("notes")
 
+    _stamp_change(
+        rec,
+        _track_changes(rec.user_id, added=[rollups.snapshot(rec)], removed=[before]),
+    )
     db.session.commit()
     return jsonify(_serialize_record(rec))
 
 
 @records_bp.delete("/<int:record_id>")
-@jwt_required()
+@auth_required
 def delete_record(record_id: int):
-    user = _current_user()
-    if user is None:
-        return error_response("Unauthorized", "UNAUTHORIZED", 401)
+    user_id = current_user_id()
+    assert user_id is not None
 
-    rec, err = _get_owned_record_or_404(user, record_id)
+    rec, err = _get_owned_record_or_404(user_id, record_id)
     if err is not None:
         return err
     assert rec is not None
 
     db.session.delete(rec)
+    tombstone = RecordTombstone()
+    tombstone.user_id = rec.user_id
+    tombstone.change_seq = _track_changes(rec.user_id, removed=[rollups.snapshot(rec)])
+    tombstone.record_id = rec.id
+    tombstone.deleted_at = _default_timestamp()
+    db.session.add(tombstone)
     db.session.commit()
     return jsonify({"status": "ok"})
@@ -0,0 +1,64 @@
+"""Full-text search over record notes.
+
+``records_fts`` is an FTS5 index of ``fart_records.notes`` built with the
+trigram tokenizer, so any run of three or more characters matches, Chinese
+included (the default tokenizer would treat a whole run of CJK characters
+as one word). It is an external-content table: only the index is stored,
+and the notes are read back from ``fart_records``.
+
+Triggers keep the index in step with every write, including bulk inserts
+that bypass the ORM; the table and triggers are created by migration 8
+(``migrations.py``). ``flask rebuild-search-index`` recreates it from
+``fart_records`` to backfill or repair.
+"""
+
+from __future__ import annotations
+
+import click
+from sqlalchemy import column, table, text
+
+from models import db
+
+
+MIN_TERM_LENGTH = 3
+
+# ``records_fts`` doubles as the hidden column MATCH is applied to.
+records_fts = table(
+    "records_fts", column("rowid"), column("rank"), column("records_fts")
+)
+
+
+def parse_query(raw: str) -> tuple[str | None, list[str]]:
+    """Split a search string into an FTS5 expression and the shorter terms.
+
+    Whitespace separates terms and every term must match. Terms of at least
+    ``MIN_TERM_LENGTH`` characters are quoted into a MATCH expression, so
+    FTS5 operators in user input are taken literally; shorter ones have no
+    trigram and are returned for a substring filter instead.
+    """
+    terms = raw.split()
+    phrases = [
+        '"' + term.replace('"', '""') + '"'
+        for term in terms
+        if len(term) >= MIN_TERM_LENGTH
+    ]
+    short = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    return (" ".join(phrases) or None), short
+
+
+def rebuild(connection=None) -> None:
+    """Re-index every note in ``fart_records``."""
+    execute = db.session.execute if connection is None else connection.execute
+    execute(text("INSERT INTO records_fts (records_fts) VALUES ('rebuild')"))
+    if connection is None:
+        db.session.commit()
+
+
+def init_search(app) -> None:
+    @app.cli.command("rebuild-search-index")
+    def _rebuild_search_index_command():
+        """Rebuild the full-text index of record notes."""
+        rebuild()
+        click.echo("Search index rebuilt.")
+
+    _ = _rebuild_search_index_command
@@ -0,0 +1,168 @@
+"""Slow-query log.
+
+Every SQL statement that runs for at least ``SLOW_QUERY_MS`` milliseconds
+is logged as a warning on the ``slow_queries`` logger with:
+
+* the normalized SQL (whitespace collapsed, ``IN (?, ?, ...)`` lists and
+  multi-row ``VALUES`` folded), so repeats of one statement read the same;
+* the shapes of its bound parameters (types only, never values);
+* its duration and the route that ran it (``-`` outside a request);
+* SQLite's ``EXPLAIN QUERY PLAN``, captured the first time a normalized
+  statement is slow and cached after that.
+
+A plan that scans ``fart_records`` (reads every row instead of searching an
+index such as ``idx_records_user_buckets``) is flagged as a full scan. The same
+details are attached to the log record as ``extra`` fields for structured
+handlers. ``SLOW_QUERY_MS = 0`` turns the log off.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from models import FartRecord, db
+
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_SIZE = 512
+
+_RECORDS_TABLE = FartRecord.__tablename__
+_START_KEY = "slow_query_start"
+_EXPLAINABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)+\)", re.I)
+_VALUES_ROWS = re.compile(r"(\((?:\?, )*\?\))(?:, \1)+")
+_RECORDS_ALIAS = re.compile(rf"\b{_RECORDS_TABLE} AS (\w+)", re.I)
+
+
+def normalize_sql(statement: str) -> str:
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _IN_LIST.sub("IN (?, ...)", sql)
+    return _VALUES_ROWS.sub(r"\1, ...", sql)
+
+
+def _shape(params) -> str:
+    if isinstance(params, dict):
+        return (
+            "{"
+            + ", ".join(f"{key}: {type(v).__name__}" for key, v in params.items())
+            + "}"
+        )
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+def parameter_shapes(params, many: bool) -> str:
+    if not params:
+        return "()"
+    if many:
+        return f"{len(params)} x {_shape(params[0])}"
+    return _shape(params)
+
+
+def scans_records(sql: str, plan: list[str]) -> bool:
+    """Whether ``plan`` reads all of ``fart_records`` rather than searching it."""
+    names = {_RECORDS_TABLE, *_RECORDS_ALIAS.findall(sql)}
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in names:
+            return True
+    return False
+
+
+def _current_route() -> str:
+    if not has_request_context():
+        return "-"
+    rule = request.url_rule
+    return f"{request.method} {rule.rule if rule is not None else request.path}"
+
+
+class SlowQueryLog:
+    """Times statements and logs the slow ones; one per app."""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._plans: dict[str, list[str] | None] = {}
+        self._lock = threading.Lock()
+
+    def explain(self, conn, sql: str, statement: str, params, many: bool):
+        """``EXPLAIN QUERY PLAN`` details for ``statement``, cached by ``sql``."""
+        with self._lock:
+            if sql in self._plans:
+                return self._plans[sql]
+        plan = None
+        if _EXPLAINABLE.match(statement):
+            if many:
+                params = params[0] if params else ()
+            # A separate cursor leaves the statement's own results unread.
+            cursor = conn.connection.driver_connection.cursor()
+            try:
+                rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", params or ())
+                plan = [row[-1] for row in rows.fetchall()]
+            except Exception:
+                logger.debug("EXPLAIN QUERY PLAN failed for %s", sql, exc_info=True)
+            finally:
+                cursor.close()
+        with self._lock:
+            if len(self._plans) >= PLAN_CACHE_SIZE:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[sql] = plan
+        return plan
+
+    def record(self, conn, statement: str, params, many: bool, seconds: float):
+        sql = normalize_sql(statement)
+        plan = self.explain(conn, sql, statement, params, many)
+        full_scan = plan is not None and scans_records(sql, plan)
+        route = _current_route()
+        shapes = parameter_shapes(params, many)
+        duration_ms = seconds * 1000
+        logger.warning(
+            "Slow query (%.1f ms) in %s%s\n  SQL: %s\n  params: %s\n  plan:\n%s",
+            duration_ms,
+            route,
+            f" [full scan of {_RECORDS_TABLE}]" if full_scan else "",
+            sql,
+            shapes,
+            "\n".join(f"    {detail}" for detail in plan or ["(unavailable)"]),
+            extra={
+                "sql": sql,
+                "params_shape": shapes,
+                "duration_ms": duration_ms,
+                "route": route,
+                "query_plan": plan,
+                "full_scan": full_scan,
+            },
+        )
+
+
+def init_slow_query_log(app) -> None:
+    """Log slow statements on the app's engine; call after ``db.init_app``."""
+    threshold_ms = float(app.config.get("SLOW_QUERY_MS") or 0)
+    if threshold_ms <= 0:
+        return
+
+    slow_log = app.extensions["slow_query_log"] = SlowQueryLog(threshold_ms / 1000)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, params, context, many):
+        conn.info[_START_KEY] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, params, context, many):
+        start = conn.info.pop(_START_KEY, None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        if seconds >= slow_log.threshold:
+            slow_log.record(conn, statement, params, many, seconds)
+
+    _ = (_before_cursor_execute, _after_cursor_execute)
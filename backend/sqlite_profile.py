@@ -0,0 +1,181 @@
+"""SQLite performance profile.
+
+Every new DBAPI connection gets the pragmas configured by the ``SQLITE_*``
+settings (WAL journal, relaxed ``synchronous``, larger page cache, mmap,
+in-memory temp tables and a busy timeout). A setting of ``None`` leaves that
+pragma at SQLite's default. The connection pool is sized through
+``SQLALCHEMY_ENGINE_OPTIONS`` before the engine is created.
+
+In WAL mode, commits append to the ``-wal`` file and SQLite only copies it
+back into the database when a committing connection hits the autocheckpoint
+threshold and no reader holds an old snapshot. A background thread runs
+``PRAGMA wal_checkpoint`` every ``SQLITE_CHECKPOINT_INTERVAL`` seconds so the
+WAL stays small under steady read traffic.
+
+SQLite connections and threads must not cross a ``fork()``. Servers that
+load the app once and fork workers from it (``gunicorn --preload``) call
+``before_fork`` in the parent and ``after_fork`` in each child; see
+``gunicorn.conf.py``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from sqlalchemy import event
+
+from models import db
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+TEMP_STORES = {"DEFAULT", "FILE", "MEMORY"}
+CHECKPOINT_MODES = {"PASSIVE", "FULL", "RESTART", "TRUNCATE"}
+
+
+def _is_sqlite_file(uri: str) -> bool:
+    return (
+        uri.startswith("sqlite:///") and uri != "sqlite:///" and ":memory:" not in uri
+    )
+
+
+def _choice(config, key: str, allowed: set[str]) -> str | None:
+    value = config.get(key)
+    if value is None:
+        return None
+    value = str(value).upper()
+    if value not in allowed:
+        raise ValueError(f"Unknown {key}: {value}")
+    return value
+
+
+def _integer(config, key: str) -> int | None:
+    value = config.get(key)
+    return None if value is None else int(value)
+
+
+def connection_pragmas(config) -> list[tuple[str, str | int]]:
+    """``(pragma, value)`` pairs to run on each new connection, in order."""
+    pragmas: list[tuple[str, str | int | None]] = [
+        ("busy_timeout", _integer(config, "SQLITE_BUSY_TIMEOUT_MS")),
+        ("journal_mode", _choice(config, "SQLITE_JOURNAL_MODE", JOURNAL_MODES)),
+        ("synchronous", _choice(config, "SQLITE_SYNCHRONOUS", SYNCHRONOUS_LEVELS)),
+        ("cache_size", _integer(config, "SQLITE_CACHE_SIZE")),
+        ("mmap_size", _integer(config, "SQLITE_MMAP_SIZE")),
+        ("temp_store", _choice(config, "SQLITE_TEMP_STORE", TEMP_STORES)),
+    ]
+    return [(name, value) for name, value in pragmas if value is not None]
+
+
+class WalCheckpointer:
+    """Daemon thread that periodically checkpoints the WAL."""
+
+    def __init__(self, app, interval: float, mode: str):
+        self.app = app
+        self.interval = interval
+        self.mode = mode
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def checkpoint(self) -> tuple[int, int, int]:
+        """Run one checkpoint; returns SQLite's ``(busy, log, checkpointed)``."""
+        with self.app.app_context():
+            raw = db.engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                row = cursor.execute(f"PRAGMA wal_checkpoint({self.mode})").fetchone()
+                cursor.close()
+            finally:
+                raw.close()
+        return tuple(row)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception:
+                logger.exception("WAL checkpoint failed")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sqlite-wal-checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def configure_engine_options(app) -> None:
+    """Size the pool for file-backed SQLite; call before ``db.init_app``."""
+    if not _is_sqlite_file(app.config.get("SQLALCHEMY_DATABASE_URI", "")):
+        return
+    options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    for option, key in (
+        ("pool_size", "SQLITE_POOL_SIZE"),
+        ("max_overflow", "SQLITE_POOL_MAX_OVERFLOW"),
+        ("pool_timeout", "SQLITE_POOL_TIMEOUT"),
+    ):
+        if app.config.get(key) is not None:
+            options.setdefault(option, app.config[key])
+
+
+def init_sqlite(app) -> None:
+    """Apply the profile to the app's engine; call after ``db.init_app``."""
+    if not _is_sqlite_file(app.config.get("SQLALCHEMY_DATABASE_URI", "")):
+        return
+
+    pragmas = connection_pragmas(app.config)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    _ = _apply_pragmas
+
+    interval = float(app.config.get("SQLITE_CHECKPOINT_INTERVAL") or 0)
+    checkpointer = None
+    journal_mode = _choice(app.config, "SQLITE_JOURNAL_MODE", JOURNAL_MODES)
+    if interval > 0 and journal_mode == "WAL":
+        checkpointer = WalCheckpointer(
+            app,
+            interval,
+            _choice(app.config, "SQLITE_CHECKPOINT_MODE", CHECKPOINT_MODES)
+            or "PASSIVE",
+        )
+        checkpointer.start()
+    app.extensions["sqlite_checkpointer"] = checkpointer
+
+
+def before_fork(app) -> None:
+    """Stop the checkpointer and close pooled connections before forking."""
+    checkpointer = app.extensions.get("sqlite_checkpointer")
+    if checkpointer is not None:
+        checkpointer.stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def after_fork(app) -> None:
+    """Give a forked worker its own connections and checkpointer thread."""
+    with app.app_context():
+        # Leave any connection inherited from the parent to the parent.
+        db.engine.dispose(close=False)
+    checkpointer = app.extensions.get("sqlite_checkpointer")
+    if checkpointer is not None:
+        checkpointer.start()
@@ -0,0 +1,105 @@
+"""Startup-time budget, deferred imports and a startup profiler.
+
+The desktop shell shows a splash screen until ``/api/health`` answers, so
+the time from interpreter start to the first response is user-visible.
+``STARTUP_BUDGET_MS`` is what that path may cost on a developer machine:
+importing ``app``, ``create_app()`` on an up-to-date database and the first
+health check. ``benchmarks/test_bench_startup.py`` holds the line.
+
+Modules only some endpoints need are imported where they are used (see
+``DEFERRED_IMPORTS``). Servers that fork workers from a preloaded app set
+``LAZY_IMPORTS=0`` so ``create_app`` imports them up front and the workers
+share them.
+
+``StartupProfiler`` times every first import made while it is installed and
+prints where startup went::
+
+    python desktop.py --profile-startup
+
+Only stdlib is imported here, so the profiler sees everything else.
+"""
+
+from __future__ import annotations
+
+import builtins
+import importlib
+import sys
+import time
+from collections import defaultdict
+
+
+STARTUP_BUDGET_MS = 1000
+
+# Heavy modules imported on first use rather than at startup.
+DEFERRED_IMPORTS = ("openpyxl",)
+
+
+def import_deferred() -> None:
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+
+
+class StartupProfiler:
+    """Records import times by wrapping ``builtins.__import__``.
+
+    An import is timed only the first time it loads a module; its self time
+    excludes the imports it triggered.
+    """
+
+    def __init__(self):
+        self.imports: list[tuple[str, float, float]] = []
+        self.phases: list[tuple[str, float]] = []
+        self._original = None
+        self._children: list[float] = []
+        self._phase_start = 0.0
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original
+        assert original is not None, "installed only between start() and stop()"
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            self.imports.append((name, elapsed, elapsed - nested))
+
+    def start(self) -> None:
+        self._original = builtins.__import__
+        builtins.__import__ = self._import
+        self._phase_start = time.perf_counter()
+
+    def phase(self, name: str) -> None:
+        """End the current phase, naming it ``name``."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._phase_start))
+        self._phase_start = now
+
+    def stop(self) -> None:
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def by_package(self) -> list[tuple[str, float]]:
+        """Import self time per top-level package, slowest first."""
+        totals: dict[str, float] = defaultdict(float)
+        for name, _, self_time in self.imports:
+            totals[name.partition(".")[0]] += self_time
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def report(self, top: int = 15) -> str:
+        total = sum(seconds for _, seconds in self.phases)
+        lines = [f"Startup: {total * 1000:.1f} ms (budget {STARTUP_BUDGET_MS} ms)"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<16}{seconds * 1000:>9.1f} ms")
+        if total * 1000 > STARTUP_BUDGET_MS:
+            lines.append("  OVER BUDGET")
+        lines.append(f"Import self time by package (top {top}):")
+        for package, seconds in self.by_package()[:top]:
+            lines.append(f"  {package:<24}{seconds * 1000:>9.1f} ms")
+        return "\n".join(lines)
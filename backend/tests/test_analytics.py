@@ -181,3 +181,127 @@ def test_cross_analysis(client, app):
     assert res.status_code == 200
     data = res.get_json()
     assert isinstance(data, list)
+
+
+CHART_ENDPOINTS = {
+    "daily_count": "daily-count",
+    "weekly_count": "weekly-count",
+    "type_distribution": "type-distribution",
+    "smell_distribution": "smell-distribution",
+    "hourly_heatmap": "hourly-heatmap",
+    "duration_distribution": "duration-distribution",
+    "cross_analysis": "cross-analysis",
+}
+
+
+def _seed_varied_records(client, app, token):
+    type1 = _preset_type_id(app, "响屁")
+    type2 = _preset_type_id(app, "无声屁")
+    smells = ["mild", "tolerable", "stinky", "extremely_stinky"]
+    durations = ["very_short", "short", "medium", "long"]
+
+    now = datetime.now(timezone.utc)
+    for i, hours_ago in enumerate([1, 5, 30, 80, 100, 200, 400, 700, 1000]):
+        ts = now - timedelta(hours=hours_ago)
+        _create_record(
+            client,
+            token,
+            type1 if i % 3 else type2,
+            timestamp=ts.isoformat().replace("+00:00", "Z"),
+            smell_level=smells[i % 4],
+            duration=durations[(i + 1) % 4],
+            temperature="hot" if i % 2 else "cold",
+        )
+
+
+def _cross_key(point):
+    return (point["value"], sorted(point["meta"].items()))
+
+
+def test_dashboard_matches_individual_endpoints(client, app):
+    token = _register_and_get_token(client, "user_dashboard")
+    _seed_varied_records(client, app, token)
+
+    date_to = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    date_from = (datetime.now(timezone.utc) - timedelta(days=10)).strftime("%Y-%m-%d")
+    for query in [
+        "",
+        "?days=7",
+        f"?date_from={date_from}&date_to={date_to}",
+    ]:
+        res = client.get(
+            f"/api/analytics/dashboard{query}", headers=_auth_headers(token)
+        )
+        assert res.status_code == 200
+        dashboard = res.get_json()
+        assert set(dashboard) == set(CHART_ENDPOINTS)
+
+        for key, path in CHART_ENDPOINTS.items():
+            single = client.get(
+                f"/api/analytics/{path}{query}", headers=_auth_headers(token)
+            ).get_json()
+            if key == "cross_analysis":
+                assert sorted(map(_cross_key, dashboard[key])) == sorted(
+                    map(_cross_key, single)
+                )
+            elif key in ("type_distribution", "duration_distribution"):
+                assert sorted(dashboard[key], key=lambda d: d["name"]) == sorted(
+                    single, key=lambda d: d["name"]
+                )
+            elif key == "hourly_heatmap":
+                assert sorted(dashboard[key]) == sorted(single)
+            else:
+                assert dashboard[key] == single
+
+
+def test_dashboard_weeks_only_bounds_weekly_chart_when_days_given(client, app):
+    token = _register_and_get_token(client, "user_dashboard_split")
+    _seed_varied_records(client, app, token)
+
+    dashboard = client.get(
+        "/api/analytics/dashboard?days=2&weeks=5", headers=_auth_headers(token)
+    ).get_json()
+
+    weekly = client.get(
+        "/api/analytics/weekly-count?weeks=5", headers=_auth_headers(token)
+    ).get_json()
+    daily = client.get(
+        "/api/analytics/daily-count?days=2", headers=_auth_headers(token)
+    ).get_json()
+    assert dashboard["weekly_count"] == weekly
+    assert dashboard["daily_count"] == daily
+    assert sum(weekly["counts"]) == 8
+    assert sum(daily["counts"]) == 3
+
+
+def test_dashboard_all_time_only_bounds_weekly_chart(client, app):
+    token = _register_and_get_token(client, "user_dashboard_all_time")
+    _seed_varied_records(client, app, token)
+    old = datetime.now(timezone.utc) - timedelta(days=200)
+    _create_record(
+        client,
+        token,
+        _preset_type_id(app, "响屁"),
+        timestamp=old.isoformat().replace("+00:00", "Z"),
+    )
+
+    # The "All time" view sends no ``days``, only the weekly chart's ``weeks``.
+    dashboard = client.get(
+        "/api/analytics/dashboard?weeks=12", headers=_auth_headers(token)
+    ).get_json()
+
+    assert sum(dashboard["daily_count"]["counts"]) == 10
+    assert sum(item["value"] for item in dashboard["type_distribution"]) == 10
+    assert len(dashboard["cross_analysis"]) == 10
+    assert (
+        dashboard["weekly_count"]
+        == client.get(
+            "/api/analytics/weekly-count?weeks=12", headers=_auth_headers(token)
+        ).get_json()
+    )
+    assert sum(dashboard["weekly_count"]["counts"]) == 9
+
+
+def test_dashboard_requires_auth(client):
+    res = client.get("/api/analytics/dashboard")
+    assert res.status_code == 401
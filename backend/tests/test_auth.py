@@ -1,4 +1,10 @@
-from models import User
+import threading
+
+import pytest
+from sqlalchemy import event, text
+
+from auth import PasswordHasher, PasswordHasherBusy, forget_user
+from models import User, db
 
 
 def _register(client, username="testuser", password="Test123!"):
@@ -92,10 +98,178 @@ def test_me_success_returns_current_user(client):
 
     res = client.get("/api/auth/me", headers=_auth_headers(token))
     assert res.status_code == 200
-    assert res.get_json() == {"user": {"username": "testuser"}}
+    assert res.get_json() == {"user": {"username": "testuser", "timezone": "UTC"}}
 
 
 def test_invalid_token_rejected(client):
     res = client.get("/api/auth/me", headers=_auth_headers("not-a-jwt"))
     assert res.status_code == 401
     assert res.get_json()["code"] == "INVALID_TOKEN"
+
+
+def _users_statements(client, app, method, path, token, json=None):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        res = client.open(path, method=method, headers=_auth_headers(token), json=json)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return res, statements
+
+
+def test_user_id_endpoints_skip_users_table_once_cached(app, client):
+    token = _register(client).get_json()["token"]
+
+    res, statements = _users_statements(client, app, "GET", "/api/records", token)
+    assert res.status_code == 200
+    assert len(statements) <= 1
+
+    res, statements = _users_statements(client, app, "GET", "/api/records", token)
+    assert res.status_code == 200
+    assert statements == []
+
+
+def _record_payload(type_id: int) -> dict:
+    return {
+        "timestamp": "2026-02-15T12:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+
+
+def test_zone_dependent_endpoints_skip_users_table_once_cached(app, client):
+    token = _register(client).get_json()["token"]
+    type_id = client.get("/api/fart-types", headers=_auth_headers(token)).get_json()[0][
+        "id"
+    ]
+    record_id = client.post(
+        "/api/records", json=_record_payload(type_id), headers=_auth_headers(token)
+    ).get_json()["id"]
+
+    for method, path, body in [
+        ("POST", "/api/records", _record_payload(type_id)),
+        ("POST", "/api/records/batch", {"records": [_record_payload(type_id)]}),
+        ("PUT", f"/api/records/{record_id}", {"timestamp": "2026-02-16T08:00:00Z"}),
+        ("GET", "/api/records?date_from=2026-02-01", None),
+        ("GET", "/api/analytics/daily-count", None),
+        ("GET", "/api/analytics/daily-count?days=7", None),
+        ("GET", "/api/analytics/dashboard?date_from=2026-02-01", None),
+        ("GET", "/api/export/csv", None),
+    ]:
+        res, statements = _users_statements(client, app, method, path, token, body)
+        assert res.status_code in (200, 201), path
+        assert statements == [], (method, path)
+
+
+def test_timezone_change_reaches_cached_zone(app, client):
+    token = _register(client).get_json()["token"]
+    type_id = client.get("/api/fart-types", headers=_auth_headers(token)).get_json()[0][
+        "id"
+    ]
+    res = client.patch(
+        "/api/auth/me",
+        json={"timezone": "Asia/Shanghai"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    app.extensions["rebucketer"].wait(timeout=10)
+
+    # 2026-02-15T20:00Z is 04:00 the next day in Shanghai.
+    payload = {**_record_payload(type_id), "timestamp": "2026-02-15T20:00:00Z"}
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    with app.app_context():
+        row = db.session.execute(
+            text("SELECT day, hour FROM fart_records WHERE id = :id"),
+            {"id": res.get_json()["id"]},
+        ).one()
+    assert tuple(row) == (20260216, 4)
+
+
+def test_me_loads_user_once_per_request(app, client):
+    token = _register(client).get_json()["token"]
+    with app.app_context():
+        db.session.expire_all()
+
+    res, statements = _users_statements(client, app, "GET", "/api/auth/me", token)
+    assert res.status_code == 200
+    assert res.get_json()["user"]["username"] == "testuser"
+    assert len(statements) == 1
+
+
+def test_deleted_user_rejected_after_forget_user(app, client):
+    token = _register(client).get_json()["token"]
+    assert client.get("/api/records", headers=_auth_headers(token)).status_code == 200
+
+    with app.app_context():
+        user = User.query.filter_by(username="testuser").first()
+        assert user is not None
+        user_id = user.id
+        db.session.delete(user)
+        db.session.commit()
+        forget_user(user_id)
+
+    res = client.get("/api/records", headers=_auth_headers(token))
+    assert res.status_code == 401
+    assert client.get("/api/auth/me", headers=_auth_headers(token)).status_code == 401
+
+
+def _stored_hash(app, username="testuser") -> str:
+    with app.app_context():
+        return User.query.filter_by(username=username).one().password_hash
+
+
+def test_login_rehashes_when_cost_changes(app, client):
+    assert _register(client).status_code == 201
+    old_hash = _stored_hash(app)
+    assert old_hash.startswith("$2b$04$")
+
+    app.extensions["password_hasher"].rounds = 5
+    assert _login(client).status_code == 200
+    new_hash = _stored_hash(app)
+    assert new_hash.startswith("$2b$05$")
+
+    assert _login(client).status_code == 200
+    assert _stored_hash(app) == new_hash
+
+
+def test_saturated_hasher_answers_503(app, client):
+    assert _register(client).status_code == 201
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=0, timeout=5)
+    app.extensions["password_hasher"] = hasher
+    hasher._slots.acquire()
+
+    res = _login(client)
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+    assert res.get_json()["code"] == "SERVER_BUSY"
+    assert _register(client, username="other").status_code == 503
+
+    hasher._slots.release()
+    assert _login(client).status_code == 200
+
+
+def test_hasher_timeout_keeps_slot_until_hash_finishes():
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=0, timeout=0.05)
+    release = threading.Event()
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(release.wait, 5)
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash("pw")
+
+    release.set()
+    # The slot is freed as the blocked call completes on the pool thread.
+    hasher._executor.submit(lambda: None).result(5)
+    hasher.timeout = 5
+    assert hasher.verify("pw", hasher.hash("pw"))
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+import cache as cache_module
+from app import create_app
+from cache import MemoryCache, RedisCache, create_cache_backend
+from config import TestingConfig
+from models import FartType, db
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _create_record(client, token, type_id, **kwargs):
+    payload = {
+        "timestamp": "2026-02-15T12:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+        **kwargs,
+    }
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(ttl=60, max_entries=2, max_bytes=10_000)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_memory_cache_enforces_byte_cap():
+    cache = MemoryCache(ttl=60, max_entries=100, max_bytes=30)
+    cache.set("k1", "x" * 10)
+    cache.set("k2", "y" * 10)
+    cache.set("k3", "z" * 10)
+
+    assert cache.get("k1") is None
+    assert cache.size_bytes <= 30
+    cache.set("huge", "w" * 100)
+    assert cache.get("huge") is None
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = MemoryCache(ttl=5, max_entries=10, max_bytes=1000)
+    cache.set("k", "v")
+    now[0] += 4
+    assert cache.get("k") == "v"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_analytics_responses_are_cached_until_user_writes(client, app):
+    token = _register_and_get_token(client, "cache_user")
+    type_id = _preset_type_id(app)
+    _create_record(client, token, type_id)
+
+    first = client.get("/api/analytics/daily-count", headers=_auth_headers(token))
+    second = client.get("/api/analytics/daily-count", headers=_auth_headers(token))
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert (
+        second.get_json()
+        == first.get_json()
+        == {
+            "dates": ["2026-02-15"],
+            "counts": [1],
+        }
+    )
+
+    filtered = client.get(
+        "/api/analytics/daily-count?date_from=2026-02-16",
+        headers=_auth_headers(token),
+    )
+    assert filtered.headers["X-Cache"] == "MISS"
+    assert filtered.get_json()["dates"] == []
+
+    _create_record(client, token, type_id)
+    after_write = client.get("/api/analytics/daily-count", headers=_auth_headers(token))
+    assert after_write.headers["X-Cache"] == "MISS"
+    assert after_write.get_json()["counts"] == [2]
+
+
+def test_analytics_cache_is_per_user(client, app):
+    token_a = _register_and_get_token(client, "cache_a")
+    token_b = _register_and_get_token(client, "cache_b")
+    _create_record(client, token_a, _preset_type_id(app))
+
+    a = client.get("/api/analytics/daily-count", headers=_auth_headers(token_a))
+    b = client.get("/api/analytics/daily-count", headers=_auth_headers(token_b))
+    assert a.get_json()["counts"] == [1]
+    assert b.headers["X-Cache"] == "MISS"
+    assert b.get_json() == {"dates": [], "counts": []}
+
+
+def test_relative_window_cache_expires_with_the_minute(client, app, monkeypatch):
+    token = _register_and_get_token(client, "cache_minutes")
+    minute = [datetime(2026, 2, 15, 12, 0, tzinfo=timezone.utc)]
+
+    class _FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return minute[0]
+
+    monkeypatch.setattr(cache_module, "datetime", _FrozenDatetime)
+
+    path = "/api/analytics/daily-count?days=7"
+    assert client.get(path, headers=_auth_headers(token)).headers["X-Cache"] == "MISS"
+    assert client.get(path, headers=_auth_headers(token)).headers["X-Cache"] == "HIT"
+
+    minute[0] = datetime(2026, 2, 15, 12, 1, tzinfo=timezone.utc)
+    assert client.get(path, headers=_auth_headers(token)).headers["X-Cache"] == "MISS"
+
+
+def test_cache_backend_none_disables_caching():
+    assert create_cache_backend({"ANALYTICS_CACHE_BACKEND": "none"}) is None
+    with pytest.raises(ValueError):
+        create_cache_backend({"ANALYTICS_CACHE_BACKEND": "bogus"})
+
+
+def test_redis_backend_is_shared_between_workers(app):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    # A second app on the same database stands in for another worker process.
+    other = create_app(
+        type(
+            "OtherWorkerConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": app.config["SQLITE_PATH"],
+                "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"],
+            },
+        )
+    )
+    for worker in (app, other):
+        worker.extensions["analytics_cache"] = RedisCache(
+            fakeredis.FakeRedis(server=server), ttl=60
+        )
+    client_a = app.test_client()
+    client_b = other.test_client()
+
+    token = _register_and_get_token(client_a, "shared")
+    type_id = _preset_type_id(app)
+    _create_record(client_a, token, type_id)
+
+    miss = client_a.get(
+        "/api/analytics/smell-distribution", headers=_auth_headers(token)
+    )
+    hit = client_b.get(
+        "/api/analytics/smell-distribution", headers=_auth_headers(token)
+    )
+    assert miss.headers["X-Cache"] == "MISS"
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.get_json() == {"categories": ["mild"], "values": [1]}
+
+    _create_record(client_b, token, type_id, smell_level="stinky")
+    fresh = client_a.get(
+        "/api/analytics/smell-distribution", headers=_auth_headers(token)
+    )
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert fresh.get_json() == {"categories": ["mild", "stinky"], "values": [1, 1]}
+
+    with other.app_context():
+        db.engine.dispose()
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import sqlite3
+
+from sqlalchemy import text
+
+from app import create_app
+from config import TestingConfig
+from models import FartRecord, db
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE fart_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    is_preset BOOLEAN DEFAULT 0 NOT NULL
+);
+CREATE TABLE fart_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    duration TEXT NOT NULL,
+    type_id INTEGER NOT NULL REFERENCES fart_types (id),
+    smell_level TEXT NOT NULL,
+    temperature TEXT NOT NULL,
+    moisture TEXT NOT NULL,
+    notes TEXT,
+    created_at TEXT DEFAULT (datetime('now')),
+    CONSTRAINT ck_fart_records_duration
+        CHECK (duration IN ('very_short','short','medium','long'))
+);
+CREATE INDEX idx_records_user_ts ON fart_records (user_id, timestamp);
+"""
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def test_records_stored_as_epoch_and_codes(client, app):
+    token = _register_and_get_token(client, "user1")
+    with app.app_context():
+        type_id = db.session.execute(
+            text("SELECT min(id) FROM fart_types")
+        ).scalar_one()
+
+    res = client.post(
+        "/api/records",
+        json={
+            "timestamp": "2026-02-15T20:30:15.250+08:00",
+            "duration": "long",
+            "type_id": type_id,
+            "smell_level": "stinky",
+            "temperature": "hot",
+            "moisture": "dry",
+        },
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    body = res.get_json()
+    assert body["timestamp"] == "2026-02-15T12:30:15Z"
+    assert body["smell_level"] == "stinky"
+
+    with app.app_context():
+        row = db.session.execute(
+            text(
+                "SELECT timestamp, duration, smell_level, temperature, moisture"
+                " FROM fart_records"
+            )
+        ).one()
+        assert tuple(row) == (1771158615, 4, 3, 1, 2)
+        assert FartRecord.query.one().timestamp == "2026-02-15T12:30:15Z"
+
+
+def test_legacy_text_schema_upgraded_in_place(tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('old', 'x')")
+    conn.execute("INSERT INTO fart_types (name, is_preset) VALUES ('响屁', 1)")
+    conn.executemany(
+        "INSERT INTO fart_records (user_id, timestamp, duration, type_id,"
+        " smell_level, temperature, moisture, notes) VALUES (1, ?, ?, 1, ?, ?, ?, ?)",
+        [
+            ("2026-02-15T12:00:00Z", "short", "mild", "cold", "dry", "a"),
+            (
+                "2026-02-16T08:15:30.123456Z",
+                "long",
+                "extremely_stinky",
+                "hot",
+                "moist",
+                None,
+            ),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    cfg = type(
+        "LegacyConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+    app = create_app(cfg)
+
+    with app.app_context():
+        records = FartRecord.query.order_by(FartRecord.id).all()
+        assert [
+            (
+                r.id,
+                r.timestamp,
+                r.duration,
+                r.smell_level,
+                r.temperature,
+                r.moisture,
+                r.notes,
+            )
+            for r in records
+        ] == [
+            (1, "2026-02-15T12:00:00Z", "short", "mild", "cold", "dry", "a"),
+            (
+                2,
+                "2026-02-16T08:15:30Z",
+                "long",
+                "extremely_stinky",
+                "hot",
+                "moist",
+                None,
+            ),
+        ]
+        columns = {
+            row[1]: row[2]
+            for row in db.session.execute(text("PRAGMA table_info(fart_records)"))
+        }
+        assert columns["timestamp"] == "INTEGER"
+        assert columns["smell_level"] == "SMALLINT"
+        indexes = {
+            row[1]
+            for row in db.session.execute(text("PRAGMA index_list(fart_records)"))
+        }
+        assert "idx_records_user_ts" not in indexes
+        assert "idx_records_user_buckets" in indexes
+        assert [
+            tuple(row)
+            for row in db.session.execute(
+                text("SELECT day, week, hour, dow FROM fart_records ORDER BY id")
+            )
+        ] == [(20260215, 202606, 12, 0), (20260216, 202607, 8, 1)]
+        assert (
+            db.session.execute(
+                text("SELECT count(*) FROM daily_rollups WHERE dimension = 'smell'")
+            ).scalar()
+            == 2
+        )
+
+    # A second start leaves the upgraded table alone.
+    create_app(cfg)
+
+
+def _record_payload(type_id: int, timestamp: str) -> dict:
+    return {
+        "timestamp": timestamp,
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "hot",
+        "moisture": "dry",
+    }
+
+
+def _buckets(app):
+    with app.app_context():
+        return [
+            tuple(row)
+            for row in db.session.execute(
+                text("SELECT day, week, hour, dow FROM fart_records ORDER BY id")
+            )
+        ]
+
+
+def test_time_buckets_maintained_on_write(client, app):
+    token = _register_and_get_token(client, "user1")
+    with app.app_context():
+        type_id = db.session.execute(
+            text("SELECT min(id) FROM fart_types")
+        ).scalar_one()
+
+    res = client.post(
+        "/api/records",
+        json=_record_payload(type_id, "2026-01-04T23:59:59Z"),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    record_id = res.get_json()["id"]
+    res = client.post(
+        "/api/records/batch",
+        json=[_record_payload(type_id, "2026-03-02T07:05:00+08:00")],
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    assert _buckets(app) == [(20260104, 202600, 23, 0), (20260301, 202608, 23, 0)]
+
+    res = client.put(
+        f"/api/records/{record_id}",
+        json={"timestamp": "2026-01-05T00:00:00Z"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    assert _buckets(app)[0] == (20260105, 202601, 0, 1)
+
+
+def test_time_bucket_columns_added_to_existing_table(tmp_path):
+    db_path = tmp_path / "compact.db"
+    cfg = type(
+        "CompactConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+    app = create_app(cfg)
+    with app.app_context():
+        db.engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    # Back to a database from before versioned migrations.
+    conn.execute("DROP TABLE schema_version")
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('old', 'x')")
+    conn.execute("DROP INDEX idx_records_user_buckets")
+    for column in ("day", "week", "hour", "dow"):
+        conn.execute(f"ALTER TABLE fart_records DROP COLUMN {column}")
+    conn.execute(
+        "INSERT INTO fart_records (user_id, timestamp, duration, type_id,"
+        " smell_level, temperature, moisture) VALUES (1, 1771158615, 1, 1, 1, 1, 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    app = create_app(cfg)
+    assert _buckets(app) == [(20260215, 202606, 12, 0)]
+    with app.app_context():
+        indexes = {
+            row[1]
+            for row in db.session.execute(text("PRAGMA index_list(fart_records)"))
+        }
+        assert "idx_records_user_buckets" in indexes
+
+
+def test_bucket_grouping_is_covered_by_index(app):
+    with app.app_context():
+        for column in ("day", "week", "hour"):
+            plan = " ".join(
+                row[3]
+                for row in db.session.execute(
+                    text(
+                        f"EXPLAIN QUERY PLAN SELECT {column}, count(*)"
+                        " FROM fart_records WHERE user_id = 1"
+                        f" AND timestamp >= 0 GROUP BY {column}"
+                    )
+                )
+            )
+            assert "COVERING INDEX idx_records_user_buckets" in plan
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+import cache as cache_module
+from models import FartType, db
+
+
+def _auth_headers(token: str, **extra):
+    return {"Authorization": f"Bearer {token}", **extra}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _create_record(client, token, type_id):
+    res = client.post(
+        "/api/records",
+        json={
+            "timestamp": "2026-02-15T12:00:00Z",
+            "duration": "short",
+            "type_id": type_id,
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+        },
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def test_records_list_returns_304_when_unchanged(client, app):
+    token = _register_and_get_token(client, "etag_user")
+    type_id = _preset_type_id(app)
+    _create_record(client, token, type_id)
+
+    first = client.get("/api/records", headers=_auth_headers(token))
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = client.get(
+        "/api/records", headers=_auth_headers(token, **{"If-None-Match": etag})
+    )
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+    other_page = client.get(
+        "/api/records?page=2", headers=_auth_headers(token, **{"If-None-Match": etag})
+    )
+    assert other_page.status_code == 200
+    assert other_page.headers["ETag"] != etag
+
+    _create_record(client, token, type_id)
+    changed = client.get(
+        "/api/records", headers=_auth_headers(token, **{"If-None-Match": etag})
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["total"] == 2
+
+
+def test_not_modified_skips_record_queries(client, app):
+    token = _register_and_get_token(client, "etag_queries")
+    _create_record(client, token, _preset_type_id(app))
+    etag = client.get("/api/analytics/dashboard", headers=_auth_headers(token)).headers[
+        "ETag"
+    ]
+
+    statements = []
+
+    def _record(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        res = client.get(
+            "/api/analytics/dashboard",
+            headers=_auth_headers(token, **{"If-None-Match": etag}),
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert res.status_code == 304
+    assert not any("fart_records" in s for s in statements)
+    assert len(statements) == 1
+
+
+def test_etag_is_not_shared_between_users(client, app):
+    token_a = _register_and_get_token(client, "etag_a")
+    token_b = _register_and_get_token(client, "etag_b")
+
+    etag_a = client.get(
+        "/api/analytics/daily-count", headers=_auth_headers(token_a)
+    ).headers["ETag"]
+    res_b = client.get(
+        "/api/analytics/daily-count",
+        headers=_auth_headers(token_b, **{"If-None-Match": etag_a}),
+    )
+    assert res_b.status_code == 200
+    assert res_b.headers["ETag"] != etag_a
+
+
+def test_relative_window_etag_changes_with_the_minute(client, app, monkeypatch):
+    token = _register_and_get_token(client, "etag_minutes")
+    minute = [datetime(2026, 2, 15, 12, 0, tzinfo=timezone.utc)]
+
+    class _FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return minute[0]
+
+    monkeypatch.setattr(cache_module, "datetime", _FrozenDatetime)
+
+    etag = client.get(
+        "/api/analytics/daily-count?days=7", headers=_auth_headers(token)
+    ).headers["ETag"]
+    same = client.get(
+        "/api/analytics/daily-count?days=7",
+        headers=_auth_headers(token, **{"If-None-Match": etag}),
+    )
+    assert same.status_code == 304
+
+    minute[0] = datetime(2026, 2, 15, 12, 1, tzinfo=timezone.utc)
+    later = client.get(
+        "/api/analytics/daily-count?days=7",
+        headers=_auth_headers(token, **{"If-None-Match": etag}),
+    )
+    assert later.status_code == 200
@@ -1,6 +1,14 @@
 from __future__ import annotations
 
-from models import FartType
+from io import BytesIO
+
+from openpyxl import load_workbook
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from app import create_app
+from config import TestingConfig
+from models import FartType, db
 
 
 def _auth_headers(token: str):
@@ -209,3 +217,128 @@ def test_export_excel_data_isolation(client, app):
     res_a = client.get("/api/export/excel", headers=_auth_headers(token_a))
     assert res_a.status_code == 200
     assert res_a.data[:2] == b"PK"
+
+
+def test_export_csv_streams_rows_in_chunks(client, app, monkeypatch):
+    """CSV export should stream rows chunk by chunk instead of one big body."""
+    from routes import export as export_module
+
+    monkeypatch.setattr(export_module, "EXPORT_CHUNK_SIZE", 10)
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    items = [
+        {
+            "timestamp": f"2026-02-15T12:{i:02d}:00Z",
+            "duration": "short",
+            "type_id": type_id,
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+            "notes": f'say "hi" {i}',
+        }
+        for i in range(25)
+    ]
+    res = client.post("/api/records/batch", json=items, headers=_auth_headers(token))
+    assert res.status_code == 201
+
+    res = client.get("/api/export/csv", headers=_auth_headers(token), buffered=False)
+    assert res.status_code == 200
+    assert res.is_streamed
+    chunks = list(res.response)
+    res.close()
+
+    assert len(chunks) == 4
+    lines = b"".join(chunks).decode("utf-8").strip().split("\n")
+    assert len(lines) == 26
+    assert lines[1].startswith('"2026-02-15T12:24:00Z"')
+    assert lines[1].endswith('"say ""hi"" 24"')
+
+
+def test_export_excel_write_only_contents(client, app):
+    """Excel export should contain the header row and one row per record."""
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    _create_record(client, token, type_id, timestamp="2026-02-15T12:00:00Z")
+    _create_record(
+        client, token, type_id, timestamp="2026-02-16T12:00:00Z", notes="second"
+    )
+
+    res = client.get("/api/export/excel", headers=_auth_headers(token))
+    assert res.status_code == 200
+
+    wb = load_workbook(BytesIO(res.data), read_only=True)
+    ws = wb["屁屁记录"]
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ("时间", "时长", "类型", "臭味程度", "温感", "湿感", "备注")
+    assert len(rows) == 3
+    assert rows[1][6] == "second"
+    assert rows[2][2] == "响屁"
+
+
+def _export_query_count(client, app, token, path):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        res = client.get(path, headers=_auth_headers(token))
+        assert res.status_code == 200
+        _ = res.data
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return len(statements)
+
+
+def test_export_query_count_is_independent_of_row_count(client, app):
+    """Type names are resolved in the export query, not once per row."""
+    token = _register_and_get_token(client, "user1")
+    type_ids = [_preset_type_id(app, "响屁"), _preset_type_id(app, "无声屁")]
+
+    for path in ("/api/export/csv", "/api/export/excel"):
+        _create_record(client, token, type_ids[0], timestamp="2026-02-01T12:00:00Z")
+        small = _export_query_count(client, app, token, path)
+        for i in range(20):
+            _create_record(
+                client,
+                token,
+                type_ids[i % 2],
+                timestamp=f"2026-02-{i + 2:02d}T12:00:00Z",
+            )
+        large = _export_query_count(client, app, token, path)
+        assert large == small
+
+
+def test_export_returns_its_database_connection(tmp_path):
+    # A standalone app: the ``app`` fixture keeps one app context pushed for
+    # the whole test, which would hide a session outliving its request.
+    db_path = tmp_path / "standalone.db"
+    app = create_app(
+        type(
+            "StandaloneConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": str(db_path),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            },
+        )
+    )
+    client = app.test_client()
+    token = _register_and_get_token(client, "user1")
+    _create_record(client, token, _preset_type_id(app))
+    with app.app_context():
+        pool = db.engine.pool
+    assert isinstance(pool, QueuePool)
+
+    for path in ("/api/export/csv", "/api/export/excel"):
+        res = client.get(path, headers=_auth_headers(token))
+        assert res.status_code == 200
+        res.get_data()
+        res.close()
+        assert pool.checkedout() == 0, path
+
+    with app.app_context():
+        db.engine.dispose()
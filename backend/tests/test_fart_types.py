@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from sqlalchemy import event
+
+from models import FartType, db
+
 
 def _auth_headers(token: str):
     return {"Authorization": f"Bearer {token}"}
@@ -65,3 +69,107 @@ def test_create_fart_type_duplicate_name_rejected(client):
     )
     assert dup.status_code == 409
     assert dup.get_json()["code"] == "TYPE_EXISTS"
+
+
+def _fart_types_statements(client, app, method, path, token, **kwargs):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if "fart_types" in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        res = client.open(path, method=method, headers=_auth_headers(token), **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return res, statements
+
+
+def test_list_fart_types_served_from_catalog(client, app):
+    token = _register_and_get_token(client, "user1")
+
+    res, statements = _fart_types_statements(
+        client, app, "GET", "/api/fart-types", token
+    )
+    assert res.status_code == 200
+    assert statements == []
+    assert res.headers["Cache-Control"] == "private, no-cache"
+    assert res.headers.get("ETag")
+
+
+def test_list_fart_types_etag_revalidates_until_type_created(client):
+    token = _register_and_get_token(client, "user1")
+
+    first = client.get("/api/fart-types", headers=_auth_headers(token))
+    etag = first.headers["ETag"]
+
+    cached = client.get(
+        "/api/fart-types",
+        headers={**_auth_headers(token), "If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    client.post("/api/fart-types", json={"name": "震天屁"}, headers=_auth_headers(token))
+    fresh = client.get(
+        "/api/fart-types",
+        headers={**_auth_headers(token), "If-None-Match": etag},
+    )
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert "震天屁" in {it["name"] for it in fresh.get_json()}
+
+
+def test_catalog_reloads_on_miss_for_types_created_elsewhere(client, app):
+    token = _register_and_get_token(client, "user1")
+
+    # Simulate another worker committing a type this process has not seen.
+    with app.app_context():
+        ft = FartType()
+        ft.name = "远程屁"
+        ft.is_preset = False
+        db.session.add(ft)
+        db.session.commit()
+        type_id = int(ft.id)
+
+    res = client.post(
+        "/api/records",
+        json={
+            "duration": "short",
+            "type_id": type_id,
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+        },
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    assert res.get_json()["type_name"] == "远程屁"
+
+    dup = client.post(
+        "/api/fart-types", json={"name": "远程屁"}, headers=_auth_headers(token)
+    )
+    assert dup.status_code == 409
+
+
+def test_batch_of_unknown_types_reloads_catalog_once(client, app):
+    token = _register_and_get_token(client, "user1")
+    items = [
+        {
+            "duration": "short",
+            "type_id": 100000 + i,
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+        }
+        for i in range(50)
+    ]
+
+    res, statements = _fart_types_statements(
+        client, app, "POST", "/api/records/batch", token, json=items
+    )
+    assert res.status_code == 400
+    assert len(statements) == 1
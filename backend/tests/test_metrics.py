@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import json
+import re
+
+from sqlalchemy import event
+
+from app import create_app
+from config import TestingConfig
+from metrics import Metrics, collect_dead_worker
+from models import FartType, db
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _create_record(client, token, type_id) -> int:
+    payload = {
+        "timestamp": "2026-02-15T12:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def _metrics(client) -> str:
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    return res.get_data(as_text=True)
+
+
+def _sample(text: str, name: str, **labels) -> float | None:
+    """Value of the sample ``name`` whose labels include ``labels``."""
+    for line in text.splitlines():
+        match = re.fullmatch(r"(\w+)\{(.*)\} (\S+)", line)
+        if match is None or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2)))
+        if all(found.get(key) == str(value) for key, value in labels.items()):
+            return float(match.group(3))
+    return None
+
+
+def test_metrics_are_prometheus_text(client):
+    client.get("/api/health")
+
+    res = client.get("/metrics")
+
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    assert "# TYPE fart_steward_http_request_duration_seconds histogram" in text
+    route = {"method": "GET", "route": "/api/health"}
+    assert _sample(text, "fart_steward_http_requests_total", status=200, **route) == 1
+    assert (
+        _sample(text, "fart_steward_http_request_duration_seconds_count", **route) == 1
+    )
+    assert (
+        _sample(
+            text,
+            "fart_steward_http_request_duration_seconds_bucket",
+            le="+Inf",
+            **route,
+        )
+        == 1
+    )
+    size = _sample(text, "fart_steward_http_response_size_bytes_sum", **route)
+    assert size is not None and size > 0
+    # Scrapes are not counted.
+    assert 'route="/metrics"' not in text
+
+
+def test_metrics_group_by_url_rule(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    first = _create_record(client, token, type_id)
+    second = _create_record(client, token, type_id)
+
+    for record_id in (first, second):
+        res = client.get(f"/api/records/{record_id}", headers=_auth_headers(token))
+        assert res.status_code == 200
+
+    text = _metrics(client)
+    assert (
+        _sample(
+            text,
+            "fart_steward_http_requests_total",
+            method="GET",
+            route="/api/records/<int:record_id>",
+            status=200,
+        )
+        == 2
+    )
+    assert f"/api/records/{first}" not in text
+
+
+def test_metrics_count_sql_per_request(client, app):
+    token = _register_and_get_token(client, "user1")
+    _create_record(client, token, _preset_type_id(app))
+
+    statements = []
+
+    def _count(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        res = client.get("/api/records", headers=_auth_headers(token))
+        assert res.status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    text = _metrics(client)
+    route = {"method": "GET", "route": "/api/records"}
+    assert statements
+    assert _sample(text, "fart_steward_db_queries_per_request_sum", **route) == len(
+        statements
+    )
+    assert _sample(text, "fart_steward_db_queries_per_request_count", **route) == 1
+    duration = _sample(
+        text, "fart_steward_db_query_duration_seconds_per_request_sum", **route
+    )
+    assert duration is not None and duration > 0
+
+
+def test_metrics_count_errors(client):
+    assert client.get("/api/records").status_code == 401
+    assert client.get("/api/no-such-endpoint").status_code == 404
+
+    text = _metrics(client)
+    assert (
+        _sample(
+            text,
+            "fart_steward_http_requests_total",
+            method="GET",
+            route="/api/records",
+            status=401,
+        )
+        == 1
+    )
+    assert (
+        _sample(
+            text,
+            "fart_steward_http_requests_total",
+            method="GET",
+            route="unmatched",
+            status=404,
+        )
+        == 1
+    )
+
+
+def test_metrics_count_unhandled_exceptions(app):
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+
+    @app.get("/api/test-boom")
+    def _boom():
+        raise RuntimeError("boom")
+
+    client = app.test_client()
+    assert client.get("/api/test-boom").status_code == 500
+
+    text = _metrics(client)
+    route = {"method": "GET", "route": "/api/test-boom"}
+    assert _sample(text, "fart_steward_http_request_exceptions_total", **route) == 1
+    assert _sample(text, "fart_steward_http_requests_total", status=500, **route) == 1
+
+
+def test_metrics_observe_streamed_export_when_closed(client, app):
+    token = _register_and_get_token(client, "user1")
+    _create_record(client, token, _preset_type_id(app))
+    route = {"method": "GET", "route": "/api/export/csv"}
+
+    res = client.get("/api/export/csv", headers=_auth_headers(token))
+    assert (
+        _sample(_metrics(client), "fart_steward_http_requests_total", **route) is None
+    )
+
+    res.get_data()
+    res.close()
+
+    text = _metrics(client)
+    assert _sample(text, "fart_steward_http_requests_total", status=200, **route) == 1
+    # The export query runs while streaming and still counts; the user and
+    # zone come from the live-user cache.
+    assert _sample(text, "fart_steward_db_queries_per_request_sum", **route) == 1
+    assert _sample(text, "fart_steward_http_response_size_bytes_count", **route) == 0
+
+
+def test_metrics_not_served_under_api_prefix(client):
+    assert client.get("/api/metrics").status_code == 404
+
+
+def test_metrics_token_required_when_configured(tmp_path):
+    db_path = tmp_path / "standalone.db"
+    app = create_app(
+        type(
+            "TokenMetricsConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": str(db_path),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+                "METRICS_TOKEN": "scrape-secret",
+            },
+        )
+    )
+    client = app.test_client()
+
+    res = client.get("/metrics")
+    assert res.status_code == 401
+    assert res.get_json()["code"] == "UNAUTHORIZED"
+    assert client.get("/metrics", headers=_auth_headers("wrong")).status_code == 401
+    res = client.get("/metrics", headers=_auth_headers("scrape-secret"))
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_metrics_can_be_disabled(tmp_path):
+    db_path = tmp_path / "standalone.db"
+    app = create_app(
+        type(
+            "NoMetricsConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": str(db_path),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+                "METRICS_ENABLED": False,
+            },
+        )
+    )
+
+    assert app.test_client().get("/metrics").status_code == 404
+    assert "metrics" not in app.extensions
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_metrics_shared_between_workers(tmp_path):
+    db_path = tmp_path / "standalone.db"
+    metrics_dir = tmp_path / "metrics"
+    app = create_app(
+        type(
+            "SharedMetricsConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": str(db_path),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+                "METRICS_MULTIPROC_DIR": str(metrics_dir),
+            },
+        )
+    )
+    client = app.test_client()
+    route = {"method": "GET", "route": "/api/health", "status": 200}
+    client.get("/api/health")
+    client.get("/api/health")
+
+    # Another worker's numbers, as it would have written them.
+    other = Metrics()
+    other.merge(app.extensions["metrics"].snapshot())
+    (metrics_dir / "999999.json").write_text(json.dumps(other.snapshot()))
+
+    assert _sample(_metrics(client), "fart_steward_http_requests_total", **route) == 4
+
+    # The other worker exits; its counts stay.
+    collect_dead_worker(str(metrics_dir), 999999)
+    assert not (metrics_dir / "999999.json").exists()
+    assert _sample(_metrics(client), "fart_steward_http_requests_total", **route) == 4
+    client.get("/api/health")
+    assert _sample(_metrics(client), "fart_steward_http_requests_total", **route) == 5
+
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+
+import migrations
+import rollups
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+def _config(db_path):
+    return type(
+        "MigrationConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+
+
+def _dispose(app) -> None:
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _versions(db_path) -> list[tuple[int, str]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT version, name FROM schema_version ORDER BY version"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _preset_count(db_path) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT count(*) FROM fart_types WHERE is_preset = 1"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_migration_versions_are_sequential():
+    assert [number for number, _, _ in migrations.MIGRATIONS] == list(
+        range(1, migrations.LATEST_VERSION + 1)
+    )
+
+
+def test_new_database_records_every_migration(tmp_path):
+    db_path = tmp_path / "new.db"
+    _dispose(create_app(_config(db_path)))
+
+    assert _versions(db_path) == [
+        (number, name) for number, name, _ in migrations.MIGRATIONS
+    ]
+    assert _preset_count(db_path) == len(migrations.PRESET_FART_TYPES)
+
+
+def test_migrated_schema_matches_models(tmp_path):
+    db_path = tmp_path / "new.db"
+    _dispose(create_app(_config(db_path)))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for table in db.metadata.sorted_tables:
+            columns = {
+                row[1]: (row[2], bool(row[3]))
+                for row in conn.execute(f"PRAGMA table_info({table.name})")
+            }
+            assert columns == {
+                column.name: (
+                    column.type.compile(dialect=sqlite.dialect()),
+                    not column.nullable,
+                )
+                for column in table.columns
+            }, table.name
+            indexes = {
+                row[1]: [
+                    info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")
+                ]
+                for row in conn.execute(f"PRAGMA index_list({table.name})")
+                if row[3] == "c"
+            }
+            assert indexes == {
+                index.name: [column.name for column in index.columns]
+                for index in table.indexes
+            }, table.name
+    finally:
+        conn.close()
+
+
+def test_current_database_starts_without_schema_work(tmp_path):
+    db_path = tmp_path / "current.db"
+    _dispose(create_app(_config(db_path)))
+
+    statements = []
+
+    def _capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", _capture)
+    try:
+        app = create_app(_config(db_path))
+    finally:
+        event.remove(Engine, "before_cursor_execute", _capture)
+    _dispose(app)
+
+    assert not any(
+        keyword in statement.upper()
+        for statement in statements
+        for keyword in ("BEGIN", "CREATE", "ALTER", "INSERT", "PRAGMA TABLE_INFO")
+    )
+    assert len(_versions(db_path)) == migrations.LATEST_VERSION
+
+
+def test_concurrent_starts_migrate_once(tmp_path, monkeypatch):
+    db_path = tmp_path / "race.db"
+    errors = []
+    applied = []
+    migrate = migrations.migrate
+
+    def _recording_migrate(engine):
+        applied.append(migrate(engine))
+        return applied[-1]
+
+    def _start():
+        try:
+            _dispose(create_app(_config(db_path)))
+        except Exception as exc:
+            errors.append(exc)
+
+    monkeypatch.setattr("app.migrate", _recording_migrate)
+    threads = [threading.Thread(target=_start) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    # One start ran every migration; the others found nothing left to do.
+    assert sorted(applied) == [[]] * 3 + [list(range(1, migrations.LATEST_VERSION + 1))]
+    assert _preset_count(db_path) == len(migrations.PRESET_FART_TYPES)
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    db_path = tmp_path / "failing.db"
+    _dispose(create_app(_config(db_path)))
+
+    def _broken(connection):
+        connection.exec_driver_sql("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("migration failed")
+
+    monkeypatch.setattr(
+        migrations,
+        "MIGRATIONS",
+        [*migrations.MIGRATIONS, (migrations.LATEST_VERSION + 1, "broken", _broken)],
+    )
+    monkeypatch.setattr(migrations, "LATEST_VERSION", migrations.LATEST_VERSION + 1)
+
+    with pytest.raises(RuntimeError, match="migration failed"):
+        create_app(_config(db_path))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    finally:
+        conn.close()
+    assert "half_done" not in tables
+    assert len(_versions(db_path)) == migrations.LATEST_VERSION - 1
+
+
+def test_rollup_backfill_matches_rebuild(tmp_path):
+    db_path = tmp_path / "rollups.db"
+    app = create_app(_config(db_path))
+    client = app.test_client()
+    res = client.post(
+        "/api/auth/register", json={"username": "user1", "password": "Test123!"}
+    )
+    headers = {"Authorization": f"Bearer {res.get_json()['token']}"}
+    for timestamp, smell in (
+        ("2026-02-15T12:00:00Z", "mild"),
+        ("2026-02-15T23:00:00Z", "stinky"),
+        ("2026-02-16T08:00:00Z", "extremely_stinky"),
+    ):
+        res = client.post(
+            "/api/records",
+            json={
+                "timestamp": timestamp,
+                "duration": "long",
+                "type_id": 1,
+                "smell_level": smell,
+                "temperature": "hot",
+                "moisture": "moist",
+            },
+            headers=headers,
+        )
+        assert res.status_code == 201
+
+    select_rollups = "SELECT * FROM daily_rollups ORDER BY 1, 2, 3, 4"
+    with app.app_context():
+        rollups.rebuild()
+        expected = db.session.execute(text(select_rollups)).all()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DELETE FROM daily_rollups")
+            migrations._build_daily_rollups(connection)
+        assert db.session.execute(text(select_rollups)).all() == expected
+        assert len(expected) == 16
+    _dispose(app)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app import create_app
+from config import TestingConfig
+from models import FartType, db
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _record_payload(type_id: int, **overrides) -> dict:
+    payload = {
+        "timestamp": "2026-02-15T12:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _create_record(client, token, type_id, **overrides) -> int:
+    res = client.post(
+        "/api/records",
+        json=_record_payload(type_id, **overrides),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def _changes(client, token, query: str = "") -> dict:
+    res = client.get(f"/api/records/changes{query}", headers=_auth_headers(token))
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_changes_report_creates_updates_and_deletes(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    kept = _create_record(client, token, type_id, notes="first")
+    deleted = _create_record(client, token, type_id)
+
+    first = _changes(client, token)
+    assert [c["id"] for c in first["changes"]] == [kept, deleted]
+    assert first["changes"][0]["notes"] == "first"
+    assert first["changes"][0]["deleted"] is False
+    assert isinstance(first["changes"][0]["updated_at"], str)
+    assert first["has_more"] is False
+
+    res = client.put(
+        f"/api/records/{kept}",
+        json={"notes": "edited"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    res = client.delete(f"/api/records/{deleted}", headers=_auth_headers(token))
+    assert res.status_code == 200
+
+    second = _changes(client, token, f"?since={first['cursor']}")
+    assert second["changes"][0]["id"] == kept
+    assert second["changes"][0]["notes"] == "edited"
+    assert second["changes"][1]["id"] == deleted
+    assert second["changes"][1]["deleted"] is True
+    assert second["cursor"] > first["cursor"]
+
+    # A record changed twice appears once, at its latest position.
+    everything = _changes(client, token)
+    assert [(c["id"], c["deleted"]) for c in everything["changes"]] == [
+        (kept, False),
+        (deleted, True),
+    ]
+
+
+def test_changes_include_batch_in_order(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    res = client.post(
+        "/api/records/batch",
+        json={"records": [_record_payload(type_id, notes=str(i)) for i in range(3)]},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    ids = [r["id"] for r in res.get_json()["results"]]
+
+    body = _changes(client, token)
+    assert [c["id"] for c in body["changes"]] == ids
+    assert [c["notes"] for c in body["changes"]] == ["0", "1", "2"]
+    assert body["cursor"] == 3
+
+
+def test_changes_page_with_cursor(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    ids = [_create_record(client, token, type_id) for _ in range(5)]
+
+    seen = []
+    cursor = 0
+    pages = 0
+    while True:
+        body = _changes(client, token, f"?since={cursor}&limit=2")
+        seen.extend(c["id"] for c in body["changes"])
+        cursor = body["cursor"]
+        pages += 1
+        if not body["has_more"]:
+            break
+    assert seen == ids
+    assert pages == 3
+
+
+def test_changes_in_sync_client_gets_empty_page(client, app):
+    token = _register_and_get_token(client, "user1")
+    _create_record(client, token, _preset_type_id(app))
+    cursor = _changes(client, token)["cursor"]
+
+    body = _changes(client, token, f"?since={cursor}")
+    assert body == {"changes": [], "cursor": cursor, "has_more": False}
+
+
+def test_changes_are_per_user(client, app):
+    token1 = _register_and_get_token(client, "user1")
+    token2 = _register_and_get_token(client, "user2")
+    type_id = _preset_type_id(app)
+    record_id = _create_record(client, token1, type_id)
+    client.delete(f"/api/records/{record_id}", headers=_auth_headers(token1))
+
+    assert _changes(client, token2) == {"changes": [], "cursor": 0, "has_more": False}
+
+
+def test_changes_reject_invalid_cursor(client):
+    token = _register_and_get_token(client, "user1")
+    for query in ("?since=abc", "?since=-1", "?limit=0"):
+        res = client.get(f"/api/records/changes{query}", headers=_auth_headers(token))
+        assert res.status_code == 400
+        assert res.get_json()["code"] == "INVALID_REQUEST"
+
+
+def test_existing_records_numbered_by_migration(tmp_path):
+    db_path = tmp_path / "untracked.db"
+    cfg = type(
+        "UntrackedConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+    app = create_app(cfg)
+    client = app.test_client()
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    ids = [_create_record(client, token, type_id) for _ in range(3)]
+    with app.app_context():
+        db.engine.dispose()
+
+    # Roll the file back to before the change feed existed.
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        DROP INDEX idx_records_user_change;
+        DROP TABLE record_tombstones;
+        ALTER TABLE fart_records DROP COLUMN change_seq;
+        ALTER TABLE fart_records DROP COLUMN updated_at;
+        DELETE FROM schema_version WHERE version >= 7;
+        """
+    )
+    conn.close()
+
+    app = create_app(cfg)
+    client = app.test_client()
+    body = _changes(client, token)
+    assert [c["id"] for c in body["changes"]] == ids
+    assert all(c["updated_at"] for c in body["changes"])
+    # Numbering continues from the user's version, which records had bumped.
+    assert body["cursor"] == 6
+
+    new_id = _create_record(client, token, type_id)
+    later = _changes(client, token, f"?since={body['cursor']}")
+    assert [c["id"] for c in later["changes"]] == [new_id]
+
+    with app.app_context():
+        db.engine.dispose()
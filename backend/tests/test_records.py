@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import base64
 from datetime import datetime, timezone
 
 from models import FartType
@@ -285,3 +286,242 @@ def test_serialize_record_includes_type_name(client, app):
     list_body = res_list.get_json()
     assert len(list_body["items"]) == 1
     assert list_body["items"][0]["type_name"] == "响屁"
+
+
+def _batch_item(type_id: int, **kwargs):
+    item = {
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+    item.update(kwargs)
+    return item
+
+
+def test_batch_create_records(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+
+    items = [
+        _batch_item(type_id, timestamp=f"2026-02-15T12:{i:02d}:00Z", notes=f"n{i}")
+        for i in range(30)
+    ]
+    res = client.post(
+        "/api/records/batch", json={"records": items}, headers=_auth_headers(token)
+    )
+    assert res.status_code == 201
+    body = res.get_json()
+    assert body["created"] == 30
+    assert body["failed"] == 0
+    assert [r["index"] for r in body["results"]] == list(range(30))
+    ids = [r["id"] for r in body["results"]]
+    assert len(set(ids)) == 30
+
+    listed = client.get("/api/records?per_page=100", headers=_auth_headers(token))
+    assert listed.get_json()["total"] == 30
+
+    single = client.get(f"/api/records/{ids[7]}", headers=_auth_headers(token))
+    assert single.status_code == 200
+    assert single.get_json()["notes"] == "n7"
+    assert single.get_json()["timestamp"] == "2026-02-15T12:07:00Z"
+
+
+def test_batch_create_reports_per_item_errors(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+
+    items = [
+        _batch_item(type_id),
+        _batch_item(type_id, duration="nope"),
+        _batch_item(999999),
+        _batch_item(type_id, timestamp="not-a-date"),
+        "garbage",
+        _batch_item(type_id, smell_level="stinky"),
+    ]
+    res = client.post("/api/records/batch", json=items, headers=_auth_headers(token))
+    assert res.status_code == 201
+    body = res.get_json()
+    assert body["created"] == 2
+    assert body["failed"] == 4
+
+    results = body["results"]
+    assert isinstance(results[0]["id"], int)
+    assert results[1]["code"] == "INVALID_ENUM"
+    assert results[2]["code"] == "INVALID_TYPE"
+    assert results[3]["code"] == "INVALID_REQUEST"
+    assert results[4]["code"] == "INVALID_REQUEST"
+    assert isinstance(results[5]["id"], int)
+
+    created = client.get(
+        f"/api/records/{results[5]['id']}", headers=_auth_headers(token)
+    )
+    assert created.get_json()["smell_level"] == "stinky"
+
+
+def test_batch_create_all_invalid_returns_400(client, app):
+    token = _register_and_get_token(client, "user1")
+
+    res = client.post(
+        "/api/records/batch",
+        json=[{"duration": "short"}],
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 400
+    body = res.get_json()
+    assert body["code"] == "INVALID_REQUEST"
+    assert body["created"] == 0
+
+    empty = client.post("/api/records/batch", json=[], headers=_auth_headers(token))
+    assert empty.status_code == 400
+
+
+def test_batch_create_rejects_oversized_batch(client, app, monkeypatch):
+    from routes import records as records_module
+
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    monkeypatch.setattr(records_module, "BATCH_MAX_RECORDS", 3)
+
+    res = client.post(
+        "/api/records/batch",
+        json=[_batch_item(type_id) for _ in range(4)],
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 413
+    assert res.get_json()["code"] == "BATCH_TOO_LARGE"
+
+
+def test_batch_create_requires_auth(client):
+    res = client.post("/api/records/batch", json=[])
+    assert res.status_code == 401
+
+
+def test_list_records_cursor_pagination_walks_all_pages(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+
+    # Pairs of records share a timestamp so the id tie-breaker is exercised.
+    items = [
+        _batch_item(type_id, timestamp=f"2026-02-15T12:{i // 2:02d}:00Z")
+        for i in range(25)
+    ]
+    res = client.post("/api/records/batch", json=items, headers=_auth_headers(token))
+    assert res.status_code == 201
+
+    seen = []
+    cursor = ""
+    pages = 0
+    while True:
+        res = client.get(
+            f"/api/records?per_page=10&cursor={cursor}",
+            headers=_auth_headers(token),
+        )
+        assert res.status_code == 200
+        body = res.get_json()
+        assert "total" not in body
+        seen.extend(body["items"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == 25
+    assert len({it["id"] for it in seen}) == 25
+    keys = [(it["timestamp"], it["id"]) for it in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_list_records_cursor_with_total_and_date_filter(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+
+    items = [
+        _batch_item(type_id, timestamp=f"2026-02-{day:02d}T12:00:00Z")
+        for day in range(1, 11)
+    ]
+    client.post("/api/records/batch", json=items, headers=_auth_headers(token))
+
+    res = client.get(
+        "/api/records?cursor=&per_page=2&include_total=true"
+        "&date_from=2026-02-03&date_to=2026-02-05",
+        headers=_auth_headers(token),
+    )
+    body = res.get_json()
+    assert body["total"] == 3
+    assert [it["timestamp"][:10] for it in body["items"]] == [
+        "2026-02-05",
+        "2026-02-04",
+    ]
+
+    res2 = client.get(
+        f"/api/records?cursor={body['next_cursor']}&per_page=2"
+        "&date_from=2026-02-03&date_to=2026-02-05",
+        headers=_auth_headers(token),
+    )
+    body2 = res2.get_json()
+    assert [it["timestamp"][:10] for it in body2["items"]] == ["2026-02-03"]
+    assert body2["next_cursor"] is None
+
+
+def test_list_records_rejects_invalid_cursor(client):
+    token = _register_and_get_token(client, "user1")
+
+    res = client.get("/api/records?cursor=not-a-cursor", headers=_auth_headers(token))
+    assert res.status_code == 400
+    assert res.get_json()["code"] == "INVALID_REQUEST"
+
+
+def test_list_records_rejects_cursor_with_bad_timestamp(client):
+    token = _register_and_get_token(client, "user1")
+
+    for position in ('["yesterday",1]', '["0001-01-01T00:00:00+01:00",1]'):
+        cursor = base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+        res = client.get(f"/api/records?cursor={cursor}", headers=_auth_headers(token))
+        assert res.status_code == 400
+        assert res.get_json()["code"] == "INVALID_REQUEST"
+
+
+def test_early_years_round_trip(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    payload = {
+        "timestamp": "0001-01-01T00:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    record = res.get_json()
+    assert record["timestamp"] == "0001-01-01T00:00:00Z"
+    res = client.get(f"/api/records/{record['id']}", headers=_auth_headers(token))
+    assert res.get_json()["timestamp"] == "0001-01-01T00:00:00Z"
+
+    res = client.get(
+        "/api/records?date_from=0001-01-01&date_to=0001-01-01",
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    assert [r["id"] for r in res.get_json()["items"]] == [record["id"]]
+
+    payload["timestamp"] = "0001-01-01T00:00:00+08:00"
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 400
+
+
+def test_list_records_page_mode_can_skip_total(client, app):
+    token = _register_and_get_token(client, "user1")
+
+    res = client.get(
+        "/api/records?page=1&include_total=false", headers=_auth_headers(token)
+    )
+    assert res.status_code == 200
+    body = res.get_json()
+    assert "total" not in body
+    assert body["page"] == 1
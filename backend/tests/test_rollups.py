@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import DailyRollup, FartType, db
+
+
+AGGREGATE_ENDPOINTS = [
+    "daily-count",
+    "weekly-count",
+    "type-distribution",
+    "smell-distribution",
+    "hourly-heatmap",
+    "duration-distribution",
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_result_cache(app):
+    # These tests compare rollup and raw results for identical requests.
+    app.extensions["analytics_cache"] = None
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(
+    client, username: str, password: str = "Test123!", **extra
+) -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password, **extra},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _iso(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _seed(client, app, token) -> list[int]:
+    type1 = _preset_type_id(app, "响屁")
+    type2 = _preset_type_id(app, "闷屁")
+    smells = ["mild", "tolerable", "stinky", "extremely_stinky"]
+    now = datetime.now(timezone.utc)
+    items = [
+        {
+            # Offset so no record sits exactly on a days/weeks window edge.
+            "timestamp": _iso(now - timedelta(hours=7 * i, minutes=1)),
+            "duration": "short" if i % 2 else "long",
+            "type_id": type1 if i % 3 else type2,
+            "smell_level": smells[i % 4],
+            "temperature": "hot",
+            "moisture": "dry" if i % 5 else "moist",
+        }
+        for i in range(40)
+    ]
+    res = client.post("/api/records/batch", json=items, headers=_auth_headers(token))
+    assert res.status_code == 201
+    return [r["id"] for r in res.get_json()["results"]]
+
+
+def _snapshot_endpoints(client, token, query: str):
+    return {
+        path: client.get(
+            f"/api/analytics/{path}{query}", headers=_auth_headers(token)
+        ).get_json()
+        for path in AGGREGATE_ENDPOINTS
+    }
+
+
+def _assert_rollups_match_raw(client, app, token):
+    today = datetime.now(timezone.utc)
+    queries = [
+        "",
+        "?days=3",
+        "?weeks=1",
+        f"?date_from={(today - timedelta(days=4)).strftime('%Y-%m-%d')}",
+        f"?date_from={(today - timedelta(days=9)).strftime('%Y-%m-%d')}"
+        f"&date_to={(today - timedelta(days=2)).strftime('%Y-%m-%d')}",
+        f"?date_to={_iso(today - timedelta(days=1, hours=5))}",
+    ]
+    for query in queries:
+        app.config["ANALYTICS_USE_ROLLUPS"] = True
+        from_rollups = _snapshot_endpoints(client, token, query)
+        app.config["ANALYTICS_USE_ROLLUPS"] = False
+        from_raw = _snapshot_endpoints(client, token, query)
+        app.config["ANALYTICS_USE_ROLLUPS"] = True
+        assert from_rollups == from_raw, query
+
+
+def test_rollups_track_creates_updates_and_deletes(client, app):
+    token = _register_and_get_token(client, "rollup_user")
+    ids = _seed(client, app, token)
+    _assert_rollups_match_raw(client, app, token)
+
+    res = client.put(
+        f"/api/records/{ids[3]}",
+        json={
+            "timestamp": "2025-12-31T23:30:00Z",
+            "smell_level": "mild",
+            "type_id": _preset_type_id(app, "连环屁"),
+        },
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    for record_id in ids[10:15]:
+        res = client.delete(f"/api/records/{record_id}", headers=_auth_headers(token))
+        assert res.status_code == 200
+    res = client.post(
+        "/api/records",
+        json={
+            "duration": "medium",
+            "type_id": _preset_type_id(app),
+            "smell_level": "stinky",
+            "temperature": "cold",
+            "moisture": "moist",
+        },
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+
+    _assert_rollups_match_raw(client, app, token)
+
+
+def test_rollups_match_raw_in_local_time_zone(client, app):
+    token = _register_and_get_token(client, "rollup_tz", timezone="Asia/Kolkata")
+    _seed(client, app, token)
+    _assert_rollups_match_raw(client, app, token)
+
+    res = client.patch(
+        "/api/auth/me",
+        json={"timezone": "America/St_Johns"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    app.extensions["rebucketer"].wait(timeout=10)
+    _assert_rollups_match_raw(client, app, token)
+
+
+@pytest.mark.parametrize("zone", ["UTC", "Asia/Tokyo", "America/New_York"])
+def test_rollups_accept_bounds_at_the_ends_of_the_calendar(client, app, zone):
+    token = _register_and_get_token(client, "rollup_edges", timezone=zone)
+    _seed(client, app, token)
+    queries = [
+        "?date_from=0001-01-01T00:00:00Z",
+        "?date_to=0001-01-01T00:00:00Z",
+        "?date_from=9999-12-31T20:00:00Z",
+        "?date_to=9999-12-31T23:59:59Z",
+        "?date_from=0001-01-01T00:00:00Z&date_to=9999-12-31T23:59:59Z",
+    ]
+    for query in queries:
+        app.config["ANALYTICS_USE_ROLLUPS"] = True
+        from_rollups = _snapshot_endpoints(client, token, query)
+        app.config["ANALYTICS_USE_ROLLUPS"] = False
+        from_raw = _snapshot_endpoints(client, token, query)
+        app.config["ANALYTICS_USE_ROLLUPS"] = True
+        assert from_rollups == from_raw, query
+    everything = _snapshot_endpoints(client, token, "")
+    assert _snapshot_endpoints(client, token, queries[3]) == everything
+    assert _snapshot_endpoints(client, token, queries[4]) == everything
+
+
+def test_daily_rollup_has_one_total_row_per_day(client, app):
+    token = _register_and_get_token(client, "rollup_days")
+    _seed(client, app, token)
+
+    with app.app_context():
+        days = [
+            r.day
+            for r in DailyRollup.query.filter_by(dimension="total").order_by(
+                DailyRollup.day
+            )
+        ]
+    assert len(days) == len(set(days))
+    daily = client.get("/api/analytics/daily-count", headers=_auth_headers(token))
+    assert daily.get_json()["dates"] == days
+
+
+def test_deleting_all_records_of_a_day_removes_its_rollups(client, app):
+    token = _register_and_get_token(client, "rollup_delete")
+    res = client.post(
+        "/api/records",
+        json={
+            "timestamp": "2026-01-05T10:00:00Z",
+            "duration": "short",
+            "type_id": _preset_type_id(app),
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+        },
+        headers=_auth_headers(token),
+    )
+    record_id = res.get_json()["id"]
+    client.delete(f"/api/records/{record_id}", headers=_auth_headers(token))
+
+    with app.app_context():
+        assert DailyRollup.query.count() == 0
+
+
+def test_rebuild_rollups_command_repairs_table(client, app):
+    token = _register_and_get_token(client, "rollup_rebuild")
+    _seed(client, app, token)
+    before = _snapshot_endpoints(client, token, "")
+
+    with app.app_context():
+        DailyRollup.query.delete()
+        db.session.commit()
+    assert _snapshot_endpoints(client, token, "")["daily-count"]["dates"] == []
+
+    result = app.test_cli_runner().invoke(args=["rebuild-rollups"])
+    assert result.exit_code == 0, result.output
+    assert _snapshot_endpoints(client, token, "") == before
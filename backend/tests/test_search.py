@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from models import FartType, db
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _create_record(client, token, type_id, notes, timestamp="2026-02-15T12:00:00Z"):
+    payload = {
+        "timestamp": timestamp,
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+        "notes": notes,
+    }
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def _search(client, token, query: str) -> list[int]:
+    res = client.get(f"/api/records?q={query}", headers=_auth_headers(token))
+    assert res.status_code == 200
+    return [item["id"] for item in res.get_json()["items"]]
+
+
+def test_search_matches_notes_ranked_by_relevance(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    passing = _create_record(
+        client, token, type_id, "had coffee before a very long meeting today"
+    )
+    strong = _create_record(client, token, type_id, "coffee, more coffee")
+    _create_record(client, token, type_id, "tea")
+    _create_record(client, token, type_id, None)
+    hotpot = _create_record(client, token, type_id, "昨晚吃了火锅")
+
+    assert _search(client, token, "COFFEE") == [strong, passing]
+    assert _search(client, token, "吃了火锅") == [hotpot]
+    assert _search(client, token, "coffee meeting") == [passing]
+    assert _search(client, token, "water") == []
+
+    res = client.get("/api/records?q=coffee", headers=_auth_headers(token))
+    assert res.get_json()["total"] == 2
+
+
+def test_search_follows_updates_and_deletes(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    record_id = _create_record(client, token, type_id, "after the gym")
+    other = _create_record(client, token, type_id, "gym again")
+
+    res = client.put(
+        f"/api/records/{record_id}",
+        json={"notes": "after dinner"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    assert _search(client, token, "gym") == [other]
+    assert _search(client, token, "dinner") == [record_id]
+
+    client.delete(f"/api/records/{other}", headers=_auth_headers(token))
+    assert _search(client, token, "gym") == []
+
+
+def test_search_indexes_batch_inserts(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    records = [
+        {
+            "timestamp": "2026-02-15T12:00:00Z",
+            "duration": "short",
+            "type_id": type_id,
+            "smell_level": "mild",
+            "temperature": "cold",
+            "moisture": "dry",
+            "notes": notes,
+        }
+        for notes in ("sweet potato", "soy milk")
+    ]
+    res = client.post(
+        "/api/records/batch", json={"records": records}, headers=_auth_headers(token)
+    )
+    assert res.status_code == 201
+    ids = [r["id"] for r in res.get_json()["results"]]
+
+    assert _search(client, token, "potato") == [ids[0]]
+
+
+def test_search_honors_date_filters_and_owner(client, app):
+    token1 = _register_and_get_token(client, "user1")
+    token2 = _register_and_get_token(client, "user2")
+    type_id = _preset_type_id(app)
+    early = _create_record(client, token1, type_id, "beans", "2026-02-01T12:00:00Z")
+    late = _create_record(client, token1, type_id, "beans", "2026-02-20T12:00:00Z")
+    _create_record(client, token2, type_id, "beans")
+
+    assert sorted(_search(client, token1, "beans")) == [early, late]
+    assert _search(client, token1, "beans&date_from=2026-02-10") == [late]
+    assert _search(client, token1, "beans&date_to=2026-02-10") == [early]
+
+
+def test_search_short_terms_match_substrings(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    soy = _create_record(client, token, type_id, "早上喝了豆浆")
+    _create_record(client, token, type_id, "红薯")
+    both = _create_record(client, token, type_id, "豆浆 and coffee 100%")
+
+    assert sorted(_search(client, token, "豆浆")) == [soy, both]
+    assert _search(client, token, "豆浆 coffee") == [both]
+    assert _search(client, token, "0%25") == [both]
+
+
+def test_search_treats_operators_literally(client, app):
+    token = _register_and_get_token(client, "user1")
+    type_id = _preset_type_id(app)
+    record_id = _create_record(client, token, type_id, 'said "NOT" AND left')
+
+    for query in ('"NOT"', "AND", "NOT", "lef*", "(left"):
+        res = client.get(f"/api/records?q={query}", headers=_auth_headers(token))
+        assert res.status_code == 200
+    assert _search(client, token, '"NOT"') == [record_id]
+    assert _search(client, token, "lef*") == []
+
+
+def test_search_rejects_cursor(client):
+    token = _register_and_get_token(client, "user1")
+    res = client.get("/api/records?q=coffee&cursor=", headers=_auth_headers(token))
+    assert res.status_code == 400
+    assert res.get_json()["code"] == "INVALID_REQUEST"
+
+
+def test_rebuild_search_index_command(client, app):
+    token = _register_and_get_token(client, "user1")
+    record_id = _create_record(client, token, _preset_type_id(app), "red bean soup")
+    with app.app_context():
+        db.session.execute(
+            text("INSERT INTO records_fts (records_fts) VALUES ('delete-all')")
+        )
+        db.session.commit()
+    assert _search(client, token, "bean") == []
+
+    result = app.test_cli_runner().invoke(args=["rebuild-search-index"])
+    assert result.exit_code == 0
+    assert "Search index rebuilt" in result.output
+    assert _search(client, token, "bean") == [record_id]
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from sqlalchemy import select, text
+
+import slow_queries
+from app import create_app
+from config import TestingConfig
+from models import FartRecord, FartType, db
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, password: str = "Test123!") -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": password},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _create_record(client, token, type_id) -> int:
+    payload = {
+        "timestamp": "2026-02-15T12:00:00Z",
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+    res = client.post("/api/records", json=payload, headers=_auth_headers(token))
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def _log_everything(app):
+    app.extensions["slow_query_log"].threshold = 0.0
+
+
+def _slow_records(caplog) -> list[Any]:
+    # Any: the fields arrive as ``extra`` attributes LogRecord does not declare.
+    return [r for r in caplog.records if r.name == "slow_queries"]
+
+
+def test_slow_query_logs_route_params_and_plan(client, app, caplog):
+    token = _register_and_get_token(client, "user1")
+    _create_record(client, token, _preset_type_id(app))
+    _log_everything(app)
+
+    with caplog.at_level(logging.WARNING, logger="slow_queries"):
+        res = client.get(
+            "/api/records?start_date=2026-02-01T00:00:00Z",
+            headers=_auth_headers(token),
+        )
+    assert res.status_code == 200
+
+    listed = [
+        r
+        for r in _slow_records(caplog)
+        if r.sql.startswith("SELECT") and "FROM fart_records" in r.sql
+    ]
+    assert listed
+    record = listed[-1]
+    assert record.route == "GET /api/records"
+    assert record.duration_ms >= 0
+    assert "int" in record.params_shape
+    assert any("idx_records_user_buckets" in detail for detail in record.query_plan)
+    assert not any("TEMP B-TREE" in detail for detail in record.query_plan)
+    assert record.full_scan is False
+    assert "Slow query" in record.getMessage()
+    assert "\n  plan:\n    " in record.getMessage()
+
+
+def test_slow_query_flags_full_scan_of_records(app, caplog):
+    _log_everything(app)
+
+    with app.app_context(), caplog.at_level(logging.WARNING, logger="slow_queries"):
+        db.session.execute(
+            text("SELECT count(*)  FROM fart_records\n WHERE notes = :note"),
+            {"note": "x"},
+        )
+        aliased = FartRecord.__table__.alias()
+        db.session.execute(select(aliased.c.id).where(aliased.c.notes == "x"))
+
+    records = [r for r in _slow_records(caplog) if "notes" in r.sql]
+    assert len(records) == 2
+    assert records[0].sql == "SELECT count(*) FROM fart_records WHERE notes = ?"
+    assert records[0].params_shape == "(str)"
+    assert all(r.full_scan for r in records)
+    assert "[full scan of fart_records]" in records[0].getMessage()
+
+
+def test_slow_query_plan_is_captured_once_per_statement(app, caplog, monkeypatch):
+    _log_everything(app)
+    slow_log = app.extensions["slow_query_log"]
+    explained = []
+    explain = slow_log.explain
+
+    def _counting_explain(conn, sql, *args):
+        result = explain(conn, sql, *args)
+        explained.append((sql, result))
+        return result
+
+    monkeypatch.setattr(slow_log, "explain", _counting_explain)
+
+    with app.app_context(), caplog.at_level(logging.WARNING, logger="slow_queries"):
+        for user_id in (1, 2, 3):
+            db.session.execute(
+                select(FartRecord.id).where(FartRecord.user_id == user_id)
+            ).all()
+
+    plans = [result for sql, result in explained if "fart_records" in sql]
+    assert len(plans) == 3
+    # Later calls return the cached list rather than explaining again.
+    assert plans[0] is plans[1] is plans[2]
+    assert sum("fart_records" in sql for sql in slow_log._plans) == 1
+
+
+def test_slow_query_threshold_skips_fast_statements(client, app, caplog):
+    with caplog.at_level(logging.WARNING, logger="slow_queries"):
+        assert client.get("/api/health").status_code == 200
+        token = _register_and_get_token(client, "user1")
+        assert client.get("/api/records", headers=_auth_headers(token)).status_code
+    assert _slow_records(caplog) == []
+
+
+def test_normalize_sql_folds_lists_and_rows():
+    assert (
+        slow_queries.normalize_sql(
+            "SELECT id\n  FROM fart_records WHERE type_id IN (?, ?, ?)"
+        )
+        == "SELECT id FROM fart_records WHERE type_id IN (?, ...)"
+    )
+    assert (
+        slow_queries.normalize_sql("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)")
+        == "INSERT INTO t (a, b) VALUES (?, ?), ..."
+    )
+    assert slow_queries.parameter_shapes([(1, "a"), (2, "b")], many=True) == (
+        "2 x (int, str)"
+    )
+
+
+def test_slow_query_log_can_be_disabled(tmp_path):
+    db_path = tmp_path / "standalone.db"
+    app = create_app(
+        type(
+            "NoSlowQueryConfig",
+            (TestingConfig,),
+            {
+                "SQLITE_PATH": str(db_path),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+                "SLOW_QUERY_MS": 0,
+            },
+        )
+    )
+
+    assert "slow_query_log" not in app.extensions
+
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from app import create_app
+from config import TestingConfig
+from models import db
+from sqlite_profile import WalCheckpointer, after_fork, before_fork
+
+
+def _config(tmp_path, **overrides):
+    db_path = tmp_path / "profile.db"
+    return type(
+        "ProfileConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+            **overrides,
+        },
+    )
+
+
+def _pragma(app, name):
+    with app.app_context():
+        return db.session.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_connections_get_performance_pragmas(app):
+    assert _pragma(app, "journal_mode") == "wal"
+    assert _pragma(app, "synchronous") == 1
+    assert _pragma(app, "cache_size") == -16384
+    assert _pragma(app, "temp_store") == 2
+    assert _pragma(app, "busy_timeout") == 5000
+    assert _pragma(app, "mmap_size") == 128 * 1024 * 1024
+
+
+def test_pool_settings_applied(app):
+    with app.app_context():
+        pool = db.engine.pool
+        assert isinstance(pool, QueuePool)
+        assert pool.size() == 10
+        assert pool._max_overflow == 20
+
+
+def test_none_leaves_pragma_at_default(tmp_path):
+    app = create_app(_config(tmp_path, SQLITE_JOURNAL_MODE=None, SQLITE_MMAP_SIZE=None))
+    assert _pragma(app, "journal_mode") == "delete"
+    assert _pragma(app, "mmap_size") == 0
+    assert app.extensions["sqlite_checkpointer"] is None
+
+
+def test_unknown_pragma_value_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        create_app(_config(tmp_path, SQLITE_SYNCHRONOUS="SOMETIMES"))
+
+
+def test_wal_checkpoint_runs(app, client):
+    client.post(
+        "/api/auth/register", json={"username": "user1", "password": "Test123!"}
+    )
+    checkpointer = WalCheckpointer(app, interval=3600, mode="TRUNCATE")
+    busy, log_frames, checkpointed = checkpointer.checkpoint()
+    assert busy == 0
+    assert log_frames == checkpointed
+
+
+def test_checkpoint_thread_starts_when_enabled(tmp_path):
+    app = create_app(_config(tmp_path, SQLITE_CHECKPOINT_INTERVAL=3600))
+    checkpointer = app.extensions["sqlite_checkpointer"]
+    assert checkpointer is not None
+    assert checkpointer._thread is not None and checkpointer._thread.is_alive()
+    checkpointer.stop()
+    assert checkpointer._thread is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_worker_gets_own_connections_and_checkpointer(tmp_path):
+    app = create_app(_config(tmp_path, SQLITE_CHECKPOINT_INTERVAL=3600))
+    checkpointer = app.extensions["sqlite_checkpointer"]
+
+    before_fork(app)
+    assert checkpointer._thread is None
+    with app.app_context():
+        pool = db.engine.pool
+        assert isinstance(pool, QueuePool)
+        assert pool.checkedin() == 0
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            after_fork(app)
+            with app.app_context():
+                db.session.execute(
+                    text(
+                        "INSERT INTO users (username,"
+                        " password_hash) VALUES ('child', 'x')"
+                    )
+                )
+                db.session.commit()
+            if checkpointer._thread is not None and checkpointer._thread.is_alive():
+                status = 0
+            checkpointer.stop()
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    after_fork(app)
+    try:
+        with app.app_context():
+            names = db.session.execute(text("SELECT username FROM users")).scalars()
+            assert list(names) == ["child"]
+    finally:
+        checkpointer.stop()
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from config import TestingConfig
+from models import FartType, User, db
+import timezones
+from timezones import rebucket_user, resume_rebucketing
+
+
+def _auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register_and_get_token(client, username: str, **extra) -> str:
+    res = client.post(
+        "/api/auth/register",
+        json={"username": username, "password": "Test123!", **extra},
+    )
+    assert res.status_code == 201
+    return res.get_json()["token"]
+
+
+def _preset_type_id(app, name: str = "响屁") -> int:
+    with app.app_context():
+        ft = FartType.query.filter_by(name=name).first()
+        assert ft is not None
+        return int(ft.id)
+
+
+def _record(type_id: int, timestamp: str) -> dict:
+    return {
+        "timestamp": timestamp,
+        "duration": "short",
+        "type_id": type_id,
+        "smell_level": "mild",
+        "temperature": "cold",
+        "moisture": "dry",
+    }
+
+
+def _get(client, token, path: str):
+    res = client.get(path, headers=_auth_headers(token))
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_register_and_update_timezone(client):
+    res = client.post(
+        "/api/auth/register",
+        json={"username": "tz", "password": "Test123!", "timezone": "Mars/Olympus"},
+    )
+    assert res.status_code == 400
+    assert res.get_json()["code"] == "INVALID_TIMEZONE"
+
+    token = _register_and_get_token(client, "tz", timezone="Asia/Shanghai")
+    me = _get(client, token, "/api/auth/me")
+    assert me == {"user": {"username": "tz", "timezone": "Asia/Shanghai"}}
+
+    res = client.patch(
+        "/api/auth/me", json={"timezone": "../etc"}, headers=_auth_headers(token)
+    )
+    assert res.status_code == 400
+    res = client.patch(
+        "/api/auth/me", json={"timezone": "UTC"}, headers=_auth_headers(token)
+    )
+    assert res.status_code == 200
+    assert res.get_json()["user"]["timezone"] == "UTC"
+
+
+def test_records_bucketed_in_user_local_time(client, app):
+    token = _register_and_get_token(client, "shanghai", timezone="Asia/Shanghai")
+    type_id = _preset_type_id(app)
+
+    # 2026-02-15 20:30 UTC is Monday 2026-02-16 04:30 in Shanghai.
+    res = client.post(
+        "/api/records",
+        json=_record(type_id, "2026-02-15T20:30:00Z"),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    assert res.get_json()["timestamp"] == "2026-02-15T20:30:00Z"
+    res = client.post(
+        "/api/records/batch",
+        json=[_record(type_id, "2026-02-15T15:59:59Z")],
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+
+    with app.app_context():
+        rows = db.session.execute(
+            text("SELECT day, week, hour, dow FROM fart_records ORDER BY id")
+        ).all()
+    assert [tuple(r) for r in rows] == [
+        (20260216, 202607, 4, 1),
+        (20260215, 202606, 23, 0),
+    ]
+
+    for use_rollups in (True, False):
+        app.config["ANALYTICS_USE_ROLLUPS"] = use_rollups
+        app.extensions["analytics_cache"] = None
+        daily = _get(client, token, "/api/analytics/daily-count")
+        assert daily == {"dates": ["2026-02-15", "2026-02-16"], "counts": [1, 1]}
+        heatmap = _get(client, token, "/api/analytics/hourly-heatmap")
+        assert heatmap == [[23, 0, 1], [4, 1, 1]]
+        # Plain dates are local days.
+        one_day = _get(
+            client,
+            token,
+            "/api/analytics/daily-count?date_from=2026-02-16&date_to=2026-02-16",
+        )
+        assert one_day == {"dates": ["2026-02-16"], "counts": [1]}
+
+    listed = _get(client, token, "/api/records?date_from=2026-02-16")
+    assert [r["timestamp"] for r in listed["items"]] == ["2026-02-15T20:30:00Z"]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/records",
+        "/api/analytics/daily-count",
+        "/api/analytics/dashboard",
+        "/api/export/csv",
+        "/api/export/excel",
+    ],
+)
+@pytest.mark.parametrize("zone", ["UTC", "Asia/Tokyo", "America/New_York"])
+def test_date_bounds_validated_alike_everywhere(client, path, zone):
+    token = _register_and_get_token(client, "bounds", timezone=zone)
+    accepted = [
+        "date_from=2026-02-15",
+        "date_from=0001-01-01",
+        "date_to=9999-12-31",
+        "date_from=0001-01-01T00:00:00Z",
+        "date_to=9999-12-31T23:59:59Z",
+    ]
+    rejected = [
+        "date_from=not-a-date",
+        "date_to=2026-13-01",
+        "date_to=2026-02-15T25:00:00Z",
+    ]
+    for query in accepted:
+        res = client.get(f"{path}?{query}", headers=_auth_headers(token))
+        res.get_data()
+        res.close()
+        assert res.status_code == 200, query
+    for query in rejected:
+        res = client.get(f"{path}?{query}", headers=_auth_headers(token))
+        assert res.status_code == 400, query
+        assert res.get_json()["code"] == "INVALID_REQUEST"
+
+
+def test_timezone_change_rebuckets_existing_records(client, app):
+    token = _register_and_get_token(client, "mover")
+    type_id = _preset_type_id(app)
+    res = client.post(
+        "/api/records/batch",
+        json=[_record(type_id, f"2026-02-15T2{i}:00:00Z") for i in range(3)],
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-15"],
+        "counts": [3],
+    }
+
+    app.extensions["rebucketer"].batch_size = 2
+    res = client.patch(
+        "/api/auth/me",
+        json={"timezone": "Asia/Tokyo"},
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 200
+    app.extensions["rebucketer"].wait(timeout=10)
+
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-16"],
+        "counts": [3],
+    }
+    assert _get(client, token, "/api/analytics/hourly-heatmap") == [
+        [5, 1, 1],
+        [6, 1, 1],
+        [7, 1, 1],
+    ]
+    with app.app_context():
+        assert User.query.one().bucket_timezone == "Asia/Tokyo"
+
+
+def test_stale_zone_write_after_first_pass_is_rebucketed(client, app, monkeypatch):
+    token = _register_and_get_token(client, "mover")
+    type_id = _preset_type_id(app)
+    res = client.post(
+        "/api/records",
+        json=_record(type_id, "2026-02-15T22:00:00Z"),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+
+    # The zone is changed through another worker; this one still caches UTC.
+    with app.app_context():
+        db.session.execute(text("UPDATE users SET timezone = 'Asia/Tokyo'"))
+        db.session.commit()
+        user_id = User.query.one().id
+
+    late = []
+
+    def _write_while_settling(_seconds):
+        # Lands after the first pass has gone past every existing record.
+        thread = threading.Thread(
+            target=lambda: late.append(
+                client.post(
+                    "/api/records",
+                    json=_record(type_id, "2026-02-15T23:00:00Z"),
+                    headers=_auth_headers(token),
+                )
+            )
+        )
+        thread.start()
+        thread.join()
+
+    monkeypatch.setattr(timezones.time, "sleep", _write_while_settling)
+    with app.app_context():
+        rebucket_user(user_id, settle_seconds=60)
+        assert User.query.one().bucket_timezone == "Asia/Tokyo"
+
+    assert late[0].status_code == 201
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-16"],
+        "counts": [2],
+    }
+    app.config["ANALYTICS_USE_ROLLUPS"] = False
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-16"],
+        "counts": [2],
+    }
+
+
+def test_interrupted_rebucketing_redone_at_startup(tmp_path):
+    db_path = tmp_path / "interrupted.db"
+    cfg = type(
+        "InterruptedConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+    app = create_app(cfg)
+    client = app.test_client()
+    token = _register_and_get_token(client, "mover")
+    res = client.post(
+        "/api/records",
+        json=_record(_preset_type_id(app), "2026-02-15T22:00:00Z"),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+    with app.app_context():
+        db.engine.dispose()
+
+    # The zone was changed, then the process died before the job finished.
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE users SET timezone = 'Asia/Tokyo'")
+    conn.commit()
+    conn.close()
+
+    app = create_app(cfg)
+    client = app.test_client()
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-16"],
+        "counts": [1],
+    }
+    with app.app_context():
+        assert User.query.one().bucket_timezone == "Asia/Tokyo"
+        db.engine.dispose()
+
+
+def test_forked_worker_resumes_rebucketing_in_background(client, app):
+    token = _register_and_get_token(client, "mover")
+    res = client.post(
+        "/api/records",
+        json=_record(_preset_type_id(app), "2026-02-15T22:00:00Z"),
+        headers=_auth_headers(token),
+    )
+    assert res.status_code == 201
+
+    # A sibling worker was killed after the zone change was committed.
+    with app.app_context():
+        db.session.execute(text("UPDATE users SET timezone = 'Asia/Tokyo'"))
+        db.session.commit()
+        assert resume_rebucketing(inline=False) == [User.query.one().id]
+    app.extensions["rebucketer"].wait(timeout=10)
+
+    with app.app_context():
+        assert User.query.one().bucket_timezone == "Asia/Tokyo"
+    assert _get(client, token, "/api/analytics/daily-count") == {
+        "dates": ["2026-02-16"],
+        "counts": [1],
+    }
+
+
+def test_timezone_column_added_to_existing_users_table(tmp_path):
+    db_path = tmp_path / "old.db"
+    cfg = type(
+        "OldConfig",
+        (TestingConfig,),
+        {
+            "SQLITE_PATH": str(db_path),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        },
+    )
+    app = create_app(cfg)
+    with app.app_context():
+        db.engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    # Back to a database from before versioned migrations.
+    conn.execute("DROP TABLE schema_version")
+    conn.execute("ALTER TABLE users DROP COLUMN timezone")
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('old', 'x')")
+    conn.commit()
+    conn.close()
+
+    app = create_app(cfg)
+    with app.app_context():
+        assert User.query.one().timezone == "UTC"
@@ -0,0 +1,280 @@
+"""Per-user time zones.
+
+Each user has an IANA ``timezone`` (``UTC`` by default). A record's
+``day``/``week``/``hour``/``dow`` buckets are computed in its owner's zone
+when the record is written, so analytics group on local time with no
+per-query conversion, and plain ``YYYY-MM-DD`` filter dates mean local days.
+
+Changing a user's zone queues a job on a single background worker that
+re-buckets the user's existing records in batches and then rebuilds their
+rollups. Records written meanwhile by this worker already use the new zone;
+other workers may bucket them in the old zone for up to
+``AUTH_USER_CACHE_TTL`` seconds after the change, so the job then waits
+``TIMEZONE_REBUCKET_SETTLE_SECONDS`` and re-buckets every record written
+since it started. Until the job finishes, ``users.bucket_timezone`` still
+names the old zone; a job cut short by a restart is redone at the next
+startup (``resume_rebucketing``), and one cut short by a killed gunicorn
+worker is redone in the background by the worker forked to replace it.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app, request
+from sqlalchemy import Integer, bindparam, select, type_coerce
+
+import rollups
+from auth import current_user_id, error_response, user_timezone
+from cache import bump_data_version, data_version
+from models import (
+    FartRecord,
+    User,
+    db,
+    format_timestamp,
+    format_utc,
+    local_day_start,
+    time_buckets,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "UTC"
+
+_ZONE_KEY = "fart_steward.timezone"
+
+
+@lru_cache(maxsize=512)
+def get_zone(name: str) -> tzinfo:
+    """The ``tzinfo`` for an IANA zone name; ``ValueError`` if unknown."""
+    if name == DEFAULT_TIMEZONE:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name!r}") from None
+
+
+def user_zone(user_id: int) -> tzinfo:
+    return get_zone(user_timezone(user_id) or DEFAULT_TIMEZONE)
+
+
+def current_zone() -> tzinfo:
+    """The authenticated user's zone, read at most once per request."""
+    environ = request.environ
+    if _ZONE_KEY not in environ:
+        user_id = current_user_id()
+        environ[_ZONE_KEY] = timezone.utc if user_id is None else user_zone(user_id)
+    return environ[_ZONE_KEY]
+
+
+def local_date_boundary(value: str, end_of_day: bool, tz: tzinfo) -> str | None:
+    """First (or last) second of the local day ``YYYY-MM-DD`` as a UTC timestamp."""
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    try:
+        if not end_of_day:
+            return format_timestamp(local_day_start(day, tz))
+        if day < date.max:
+            return format_timestamp(local_day_start(day + timedelta(days=1), tz) - 1)
+        return format_utc(datetime(day.year, day.month, day.day, 23, 59, 59, tzinfo=tz))
+    except OverflowError:
+        # The first or last local day reaches past year 1 or 9999 in UTC.
+        return "9999-12-31T23:59:59Z" if end_of_day else "0001-01-01T00:00:00Z"
+
+
+class InvalidDateBound(ValueError):
+    """A ``date_from``/``date_to`` query argument that is not a valid bound."""
+
+    def __init__(self, arg: str):
+        super().__init__(f"Invalid {arg}")
+        self.arg = arg
+
+
+def parse_date_bound(value: str, end_of_day: bool, tz: tzinfo) -> str | None:
+    """A date filter bound as a UTC timestamp; ``None`` when blank or invalid.
+
+    ``YYYY-MM-DD`` is a day in ``tz``, anything else an ISO 8601 timestamp
+    (naive values are UTC). Any bound from year 1 to 9999 in UTC is valid.
+    """
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    if len(raw) == 10 and raw[4] == "-" and raw[7] == "-":
+        return local_date_boundary(raw, end_of_day, tz)
+    try:
+        dt = datetime.fromisoformat(raw[:-1] + "+00:00" if raw.endswith("Z") else raw)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return format_utc(dt)
+    except (ValueError, OverflowError):
+        return None
+
+
+def request_date_bounds() -> tuple[str | None, str | None]:
+    """The request's ``date_from``/``date_to`` as UTC timestamps.
+
+    Records, analytics and exports all filter through this, so they accept
+    the same bounds. An invalid one raises ``InvalidDateBound`` (a 400).
+    """
+    bounds = []
+    for arg, end_of_day in (("date_from", False), ("date_to", True)):
+        value = request.args.get(arg, "")
+        bound = parse_date_bound(value, end_of_day, current_zone())
+        if bound is None and value.strip():
+            raise InvalidDateBound(arg)
+        bounds.append(bound)
+    return bounds[0], bounds[1]
+
+
+def _rebucket_records(
+    user_id: int, tz: tzinfo, batch_size: int, since_seq: int = 0
+) -> int:
+    """Recompute buckets of the user's records changed after ``since_seq``.
+
+    Commits after every batch so writers are never blocked for long.
+    Returns the number of records updated.
+    """
+    table = FartRecord.__table__
+    update = (
+        table.update()
+        .where(table.c.id == bindparam("record_id"))
+        .values(
+            day=bindparam("day"),
+            week=bindparam("week"),
+            hour=bindparam("hour"),
+            dow=bindparam("dow"),
+        )
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, type_coerce(table.c.timestamp, Integer))
+            .where(
+                table.c.user_id == user_id,
+                table.c.change_seq > since_seq,
+                table.c.id > last_id,
+            )
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        db.session.execute(
+            update,
+            [
+                {"record_id": record_id, **time_buckets(epoch, tz)}
+                for record_id, epoch in rows
+            ],
+        )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+
+def rebucket_user(
+    user_id: int, batch_size: int = 1000, settle_seconds: float = 0
+) -> None:
+    """Recompute the user's record buckets in their current zone, then rollups.
+
+    After ``settle_seconds`` from the start, records written since then are
+    re-bucketed again: other workers may have used a cached old zone. Only
+    then is the zone recorded as ``bucket_timezone``.
+    """
+    started = time.monotonic()
+    name = db.session.query(User.timezone).filter(User.id == user_id).scalar()
+    if name is None:
+        return
+    tz = get_zone(name)
+    # Writes after this point own higher change sequence numbers.
+    start_seq = data_version(user_id)
+    _rebucket_records(user_id, tz, batch_size)
+    bump_data_version(user_id)
+    rollups.rebuild(user_id)
+
+    if settle_seconds > 0:
+        time.sleep(max(0.0, started + settle_seconds - time.monotonic()))
+        if _rebucket_records(user_id, tz, batch_size, since_seq=start_seq):
+            bump_data_version(user_id)
+            rollups.rebuild(user_id)
+
+    # Only if the zone is still the one used: a newer change queued its own job.
+    db.session.execute(
+        User.__table__.update()
+        .where(User.id == user_id, User.timezone == name)
+        .values(bucket_timezone=name)
+    )
+    db.session.commit()
+
+
+def resume_rebucketing(inline: bool = True) -> list[int]:
+    """Redo re-bucketing jobs a restart interrupted; returns the user ids.
+
+    At startup, before any worker serves requests, the jobs run inline. A
+    freshly forked worker passes ``inline=False`` to queue them on its
+    background worker instead; a job still running in a sibling worker may
+    then be done twice, which is harmless. Needs an app context.
+    """
+    user_ids = list(
+        db.session.scalars(select(User.id).where(User.bucket_timezone != User.timezone))
+    )
+    rebucketer = get_rebucketer()
+    for user_id in user_ids:
+        logger.warning("Resuming interrupted re-bucketing of user %s", user_id)
+        if inline:
+            rebucket_user(user_id, rebucketer.batch_size)
+        else:
+            rebucketer.submit(user_id)
+    return user_ids
+
+
+class Rebucketer:
+    """Runs ``rebucket_user`` jobs one at a time on a background thread."""
+
+    def __init__(self, app, batch_size: int, settle_seconds: float = 0):
+        self.app = app
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="rebucket"
+        )
+
+    def _run(self, user_id: int) -> None:
+        with self.app.app_context():
+            try:
+                rebucket_user(user_id, self.batch_size, self.settle_seconds)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Re-bucketing records of user %s failed", user_id)
+
+    def submit(self, user_id: int) -> Future:
+        return self._executor.submit(self._run, user_id)
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Block until every job queued so far has finished."""
+        self._executor.submit(lambda: None).result(timeout)
+
+
+def init_timezones(app) -> None:
+    app.extensions["rebucketer"] = Rebucketer(
+        app,
+        int(app.config.get("TIMEZONE_REBUCKET_BATCH_SIZE", 1000)),
+        float(app.config.get("TIMEZONE_REBUCKET_SETTLE_SECONDS", 0)),
+    )
+
+    @app.errorhandler(InvalidDateBound)
+    def _invalid_date_bound(error: InvalidDateBound):
+        return error_response(str(error), "INVALID_REQUEST", 400)
+
+
+def get_rebucketer() -> Rebucketer:
+    return current_app.extensions["rebucketer"]
@@ -18,34 +18,23 @@ export const useAnalytics = (days = 30, weeks = 12) => {
     setLoading(true);
     setError(null);
     try {
-      const queryParams = days ? `?days=${days}` : '';
-      
-      const [
-        dailyRes,
-        weeklyRes,
-        typeRes,
-        smellRes,
-        heatmapRes,
-        durationRes,
-        crossRes,
-      ] = await Promise.all([
-        api.get(`/analytics/daily-count${queryParams}`),
-        api.get(weeks ? `/analytics/weekly-count?weeks=${weeks}` : '/analytics/weekly-count'),
-        api.get(`/analytics/type-distribution${queryParams}`),
-        api.get(`/analytics/smell-distribution${queryParams}`),
-        api.get(`/analytics/hourly-heatmap${queryParams}`),
-        api.get(`/analytics/duration-distribution${queryParams}`),
-        api.get(`/analytics/cross-analysis${queryParams}`),
-      ]);
+      const params = new URLSearchParams();
+      if (days) params.set('days', days);
+      if (weeks) params.set('weeks', weeks);
+      const query = params.toString();
+
+      const { data: dashboard } = await api.get(
+        query ? `/analytics/dashboard?${query}` : '/analytics/dashboard'
+      );
 
       setData({
-        dailyCount: dailyRes.data,
-        weeklyCount: weeklyRes.data,
-        typeDistribution: typeRes.data,
-        smellDistribution: smellRes.data,
-        hourlyHeatmap: heatmapRes.data,
-        durationDistribution: durationRes.data,
-        crossAnalysis: crossRes.data,
+        dailyCount: dashboard.daily_count,
+        weeklyCount: dashboard.weekly_count,
+        typeDistribution: dashboard.type_distribution,
+        smellDistribution: dashboard.smell_distribution,
+        hourlyHeatmap: dashboard.hourly_heatmap,
+        durationDistribution: dashboard.duration_distribution,
+        crossAnalysis: dashboard.cross_analysis,
       });
     } catch (err) {
       console.error('Failed to fetch analytics data:', err);